@@ -31,7 +31,10 @@ class design(Elaboratable):
     """
 
     def __init__(self):
-        pass
+
+        # Use behavioral SRAM models instead of OpenRAM instances so that the
+        # design can be simulated by Amaranth
+        self.behavioral_srams = False
 
 
     def verilog_write(self, verilog_path):
@@ -117,7 +120,7 @@ class design(Elaboratable):
         self.stall = cache_signal(reset=1)
 
         # Create a DRAM module
-        self.dram = dram_instance(self.m, self.dram_address_size, self.line_size, OPTS.read_only)
+        self.dram = dram_instance(self.m, self.dram_address_size, self.sector_size, OPTS.read_only)
 
         # Return all port signals
         ports = self.dram.get_signals()
@@ -135,6 +138,9 @@ class design(Elaboratable):
         self.set = cache_signal(self.set_size, is_flop=True)
         if self.offset_size:
             self.offset = cache_signal(self.offset_size, is_flop=True)
+        # Upper offset bits select the sector of the request if lines are
+        # sectored
+        self.sector = self.offset[-self.sector_index_size:] if self.num_sectors > 1 else None
         if not OPTS.read_only:
             self.web_reg = cache_signal(is_flop=True)
         if self.num_masks:
@@ -0,0 +1,75 @@
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2021 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+"""
+Maximal-length Fibonacci LFSRs used by random replacement are defined here.
+An LFSR shifts to the left and shifts in the XOR of its tap bits. Its state is
+never 0; therefore, it is reset to LFSR_SEED.
+"""
+
+# Reset value of LFSRs
+LFSR_SEED = 1
+
+# Tap bits of maximal-length LFSRs for each size (bit 1 is the LSB)
+LFSR_TAPS = {
+    2: (2, 1),
+    3: (3, 2),
+    4: (4, 3),
+    5: (5, 3),
+    6: (6, 5),
+    7: (7, 6),
+    8: (8, 6, 5, 4),
+    9: (9, 5),
+    10: (10, 7),
+    11: (11, 9),
+    12: (12, 6, 4, 1),
+    13: (13, 4, 3, 1),
+    14: (14, 5, 3, 1),
+    15: (15, 14),
+    16: (16, 15, 13, 4),
+    17: (17, 14),
+    18: (18, 11),
+    19: (19, 6, 2, 1),
+    20: (20, 17),
+    21: (21, 19),
+    22: (22, 21),
+    23: (23, 18),
+    24: (24, 23, 22, 17),
+    25: (25, 22),
+    26: (26, 6, 2, 1),
+    27: (27, 5, 2, 1),
+    28: (28, 25),
+    29: (29, 27),
+    30: (30, 6, 4, 1),
+    31: (31, 28),
+    32: (32, 22, 2, 1),
+}
+
+
+def lfsr_feedback(state, size, taps=None):
+    """ Return the XOR of the tap bits of the state. """
+
+    feedback = 0
+    for tap in taps or LFSR_TAPS[size]:
+        feedback ^= (state >> (tap - 1)) & 1
+    return feedback
+
+
+def lfsr_next(state, size):
+    """ Return the next state of an LFSR. """
+
+    return ((state << 1) | lfsr_feedback(state, size)) & ((1 << size) - 1)
+
+
+def lfsr_prev(state, size):
+    """ Return the previous state of an LFSR. """
+
+    # The MSB of the previous state is shifted out. Since it is always a tap,
+    # it is found from the shifted in bit and the other tap bits.
+    prev_state = state >> 1
+    msb = (state & 1) ^ lfsr_feedback(prev_state, size, LFSR_TAPS[size][1:])
+    return prev_state | (msb << (size - 1))
\ No newline at end of file
@@ -10,6 +10,12 @@ Enum classes to represent cache policies are defined here.
 """
 from enum import IntEnum
 
+# Number of bits of re-reference prediction values (RRPV) in RRIP caches
+RRPV_SIZE = 2
+# RRPV of ways predicted to be re-referenced in the distant future
+RRPV_MAX = 2 ** RRPV_SIZE - 1
+# BRRIP inserts a line with a long RRPV once in this many fills
+BRRIP_PERIOD = 32
 
 class associativity(IntEnum):
     """ Enum class to represent associativity. """
@@ -35,6 +41,8 @@ class replacement_policy(IntEnum):
     FIFO = 1
     LRU = 2
     RANDOM = 3
+    SRRIP = 4
+    BRRIP = 5
 
 
     def __str__(self):
@@ -56,6 +64,10 @@ class replacement_policy(IntEnum):
             return "Least Recently Used"
         if self == replacement_policy.RANDOM:
             return "Random"
+        if self == replacement_policy.SRRIP:
+            return "Static Re-Reference Interval Prediction"
+        if self == replacement_policy.BRRIP:
+            return "Bimodal Re-Reference Interval Prediction"
 
 
     def has_sram_array(self):
@@ -70,7 +82,20 @@ class replacement_policy(IntEnum):
     def updated_after_read(self):
         """ Return True if the replacement policy updated its SRAM array after a read. """
 
-        return self == replacement_policy.LRU
+        return self in [
+            replacement_policy.LRU,
+            replacement_policy.SRRIP,
+            replacement_policy.BRRIP
+        ]
+
+
+    def is_rrip(self):
+        """ Return True if the replacement policy is in the RRIP family. """
+
+        return self in [
+            replacement_policy.SRRIP,
+            replacement_policy.BRRIP
+        ]
 
 
     @staticmethod
@@ -82,6 +107,9 @@ class replacement_policy(IntEnum):
         for k, v in replacement_policy.__members__.items():
             if name.upper() == k:
                 return v
+        # Policies of plugins are found by their registered names
+        from policy_plugin import get_policy
+        return get_policy(name)
 
 
 class write_policy(IntEnum):
@@ -0,0 +1,151 @@
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2021 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+"""
+Replacement policy plugins are defined here. A plugin is a replacement policy
+defined outside of the generator. It is registered by its name and selected
+with the replacement_policy option just like built-in policies.
+"""
+import debug
+
+# Registered plugins by their names
+POLICY_PLUGINS = {}
+
+
+def normalize_name(name):
+    """ Return the name of a policy as it is registered. """
+
+    return str(name).lower().replace("-", "_")
+
+
+def register_policy(plugin):
+    """ Register a replacement policy plugin instance. """
+
+    from policy import replacement_policy as rp
+    name = normalize_name(plugin.name)
+    if name.upper() in rp.__members__:
+        debug.error("{} is a built-in replacement policy.".format(name), -1)
+    POLICY_PLUGINS[name] = plugin
+
+
+def get_policy(name):
+    """ Return the registered plugin of the name. """
+
+    return POLICY_PLUGINS.get(normalize_name(name))
+
+
+class policy_plugin:
+    """
+    This is the base class of replacement policy plugins.
+
+    Each set has a use line of use_size() bits in the use array. The cache
+    design reads and writes the use array in the same states as LRU caches;
+    plugins only add the statements below:
+    - add_victim: select the way to evict by assigning c.victim
+    - add_hit: update the use line when a constant way is hit
+    - add_fill: update the use line when c.way is filled from DRAM
+
+    sim_cache models the policy with the same use lines as integers:
+    - way_to_evict: return the way to evict
+    - update: update the use line after a hit or a fill
+
+    Methods of this class can be overridden for specific implementation of each
+    policy.
+    """
+
+    # Name of the policy in config files
+    name = None
+
+
+    def __str__(self):
+        return normalize_name(self.name)
+
+
+    def upper(self):
+        return str(self).upper()
+
+
+    def long_name(self):
+        """ Get the long name of the replacement policy. """
+
+        return str(self)
+
+
+    def has_sram_array(self):
+        """ Return True if the replacement policy needs a separate SRAM array. """
+
+        return True
+
+
+    def updated_after_read(self):
+        """ Return True if the replacement policy updated its SRAM array after a read. """
+
+        return True
+
+
+    def is_rrip(self):
+        """ Return True if the replacement policy is in the RRIP family. """
+
+        return False
+
+
+    def use_size(self, c):
+        """ Return the bit size of use lines. """
+
+        return c.num_ways
+
+
+    def reset_value(self, c):
+        """ Return the reset value for use array lines. """
+
+        return 0
+
+
+    def add_signals(self, c):
+        """ Add internal registers and wires of the policy to cache design. """
+        pass
+
+
+    def add_victim(self, c, m):
+        """ Add statements to select the way to evict. """
+        pass
+
+
+    def add_hit(self, c, m, way):
+        """ Add statements to update the use line when the way is hit. """
+        pass
+
+
+    def add_fill(self, c, m):
+        """ Add statements to update the use line when c.way is filled. """
+        pass
+
+
+    def sim_reset(self, sc):
+        """ Reset the use lines of sim_cache. """
+
+        for i in range(sc.num_rows):
+            sc.sram.write_use(i, self.reset_value(sc))
+
+
+    def way_to_evict(self, sc, set_decimal):
+        """ Return the way to evict in sim_cache. """
+
+        return 0
+
+
+    def update(self, sc, set_decimal, way, is_hit):
+        """ Update the use line of sim_cache after a hit or a fill. """
+        pass
+
+
+    def update_cycles(self, sc, cycles):
+        """
+        Update the state of sim_cache which changes every cycle. Cycles can be
+        negative when sim_cache rolls back its stall calculation.
+        """
+        pass
\ No newline at end of file
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2021 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+"""
+Benchmark of replacement policies.
+Runs a trace on sim_cache for each replacement policy and number of ways with
+the same total size, and reports the miss ratio of the policy, the miss ratio
+of the OPT oracle, and the gap between them. A small gap means that a smarter
+replacement policy isn't worth its area.
+Plugins listed in the policy_plugins option of the config file are included.
+"""
+import sys, os
+from random import Random
+sys.path.append(os.getenv("OPENCACHE_HOME"))
+import globals
+import debug
+
+# Number of requests in the trace
+TRACE_SIZE = 100000
+# Number of ways of the caches
+NUM_WAYS = [2, 4, 8]
+# Traces with and without random requests to a hot region
+TRACES = ["loop", "mixed"]
+# Replacement policies and random generators
+POLICIES = [("fifo", None), ("lru", None), ("random", "counter"), ("random", "lfsr"),
+            ("srrip", None), ("brrip", None)]
+
+
+def make_trace(sc, size, kind, seed=0):
+    """
+    Make a trace which loops over an array slightly larger than the cache. If
+    kind is "mixed", loop requests are mixed with random requests to a hot
+    region.
+    """
+
+    rng = Random(seed)
+    num_lines = sc.num_rows * sc.num_ways
+    loop_size = num_lines + num_lines // 4
+    trace = []
+    for i in range(size):
+        if kind == "loop" or rng.randrange(2):
+            trace.append((num_lines + i % loop_size) << sc.offset_size)
+        else:
+            trace.append(rng.randrange(num_lines // 2) << sc.offset_size)
+    return trace
+
+
+def count_misses(sc, trace):
+    """ Run the trace on sim_cache and return the number of misses. """
+
+    sc.reset()
+    misses = 0
+    for address in trace:
+        address = sc.decode(address)
+        misses += sc.find_way(address) is None
+        sc.read(address)
+    return misses
+
+
+if __name__ == "__main__":
+    (OPTS, args) = globals.parse_args()
+    OPENCACHE_HOME = os.getenv("OPENCACHE_HOME")
+    config_file = args[0] if args else "{}/tests/configs/config.py".format(OPENCACHE_HOME)
+    globals.init_opencache(config_file)
+
+    from policy import replacement_policy as rp
+    from cache_config import cache_config
+    from verify import sim_cache
+    from policy_plugin import POLICY_PLUGINS
+
+    # Policies of plugins imported by the config file are benchmarked as well
+    policies = POLICIES + [(name, None) for name in POLICY_PLUGINS]
+
+    for kind in TRACES:
+        debug.print_raw("Trace: {}".format(kind))
+        for num_ways in NUM_WAYS:
+            OPTS.num_ways = num_ways
+            conf = cache_config(total_size=OPTS.total_size,
+                                word_size=OPTS.word_size,
+                                words_per_line=OPTS.words_per_line,
+                                address_size=OPTS.address_size,
+                                write_size=OPTS.write_size,
+                                num_ways=OPTS.num_ways)
+            trace = None
+            for policy, generator in policies:
+                OPTS.replacement_policy = rp.get_value(policy)
+                if generator:
+                    OPTS.random_generator = generator
+                    policy = "{0} ({1})".format(policy, generator)
+                sc = sim_cache(conf)
+                if trace is None:
+                    trace = make_trace(sc, TRACE_SIZE, kind)
+                    opt_sc = sim_cache(conf)
+                    opt_sc.use_opt(trace)
+                    opt_ratio = count_misses(opt_sc, trace) / TRACE_SIZE
+                ratio = count_misses(sc, trace) / TRACE_SIZE
+                debug.print_raw("{0}-way {1:>16}: {2:>6.2%} misses, {3:>6.2%} OPT misses, {4:>6.2%} gap".format(num_ways,
+                                                                                                               policy,
+                                                                                                               ratio,
+                                                                                                               opt_ratio,
+                                                                                                               ratio - opt_ratio))
+
+    globals.end_opencache()
\ No newline at end of file
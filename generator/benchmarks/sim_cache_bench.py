@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2021 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+"""
+Micro-benchmark of sim_cache.
+Replays a random trace of read/write requests on sim_cache for each
+replacement policy and reports the number of requests per second when requests
+are sent one by one and when they are sent as a batch.
+"""
+import sys, os
+import time
+from random import Random
+sys.path.append(os.getenv("OPENCACHE_HOME"))
+import globals
+import debug
+
+# Number of requests in the trace
+TRACE_SIZE = 1000000
+
+
+def make_trace(sc, size, seed=0):
+    """ Make a random trace of requests for the given sim_cache. """
+
+    rng = Random(seed)
+    mask = "1" * sc.num_masks
+    data_limit = 2 ** (sc.word_size if sc.offset_size else sc.line_size)
+    trace = []
+    for _ in range(size):
+        trace.append((rng.randrange(2),
+                      rng.randrange(2 ** sc.address_size),
+                      mask,
+                      rng.randrange(data_limit)))
+    return trace
+
+
+def run_trace(sc, trace):
+    """ Run the trace on sim_cache and return requests per second. """
+
+    sc.reset()
+    start_time = time.perf_counter()
+    for is_write, address, mask, data in trace:
+        # Decode the address once for all calls below
+        address = sc.decode(address)
+        sc.stall_cycles(address, is_write)
+        if is_write:
+            sc.write(address, mask, data)
+        else:
+            sc.read(address)
+    return len(trace) / (time.perf_counter() - start_time)
+
+
+def run_batch(sc, trace):
+    """ Run the trace on sim_cache as a batch and return requests per second. """
+
+    ops = ["write" if x[0] else "read" for x in trace]
+    addresses = [x[1] for x in trace]
+    masks = [x[2] for x in trace]
+    data = [x[3] for x in trace]
+
+    sc.reset()
+    start_time = time.perf_counter()
+    sc.run_batch(ops, addresses, masks, data)
+    return len(trace) / (time.perf_counter() - start_time)
+
+
+if __name__ == "__main__":
+    (OPTS, args) = globals.parse_args()
+    OPENCACHE_HOME = os.getenv("OPENCACHE_HOME")
+    config_file = args[0] if args else "{}/tests/configs/config.py".format(OPENCACHE_HOME)
+    globals.init_opencache(config_file)
+
+    from policy import replacement_policy as rp
+    from cache_config import cache_config
+    from verify.sim_cache import sim_cache
+
+    for num_ways, policy in [(1, rp.NONE), (4, rp.FIFO), (4, rp.LRU), (4, rp.RANDOM)]:
+        OPTS.num_ways = num_ways
+        OPTS.replacement_policy = policy
+        conf = cache_config(total_size=OPTS.total_size,
+                            word_size=OPTS.word_size,
+                            words_per_line=OPTS.words_per_line,
+                            address_size=OPTS.address_size,
+                            write_size=OPTS.write_size,
+                            num_ways=OPTS.num_ways)
+        sc = sim_cache(conf)
+        trace = make_trace(sc, TRACE_SIZE)
+        rate = run_trace(sc, trace)
+        batch_rate = run_batch(sc, trace)
+        debug.print_raw("{0:>8}: {1:>10.0f} requests/s, {2:>10.0f} requests/s (batch)".format(str(policy),
+                                                                                               rate,
+                                                                                               batch_rate))
+
+    globals.end_opencache()
\ No newline at end of file
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2021 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+"""
+Benchmark of simulation tools.
+Simulates the same cache design with the same test data by using each
+simulation tool and reports the time spent for the simulation, including the
+compilation of the design.
+"""
+import sys, os
+import time
+sys.path.append(os.getenv("OPENCACHE_HOME"))
+import globals
+import debug
+
+# Number of read/write operations in the simulation
+SIM_SIZE = 10000
+
+# Executables of the simulation tools
+SIM_TOOLS = {
+    "icarus": "iverilog",
+    "verilator": "verilator",
+}
+
+
+if __name__ == "__main__":
+    (OPTS, args) = globals.parse_args()
+    OPENCACHE_HOME = os.getenv("OPENCACHE_HOME")
+    config_file = args[0] if args else "{}/tests/configs/config.py".format(OPENCACHE_HOME)
+    OPTS.simulate = True
+    globals.init_opencache(config_file)
+    OPTS.sim_size = SIM_SIZE
+    # Use the same test data for all tools
+    OPTS.seed = 0
+
+    tools = [x for x in SIM_TOOLS if globals.find_exe(SIM_TOOLS[x]) is not None]
+    if not tools:
+        debug.error("No simulation tool is installed.", -1)
+    OPTS.sim_tool = tools[0]
+
+    from cache_config import cache_config
+    from cache import cache
+    from verify import verification
+
+    conf = cache_config(total_size=OPTS.total_size,
+                        word_size=OPTS.word_size,
+                        words_per_line=OPTS.words_per_line,
+                        address_size=OPTS.address_size,
+                        write_size=OPTS.write_size,
+                        num_ways=OPTS.num_ways)
+    c = cache(conf, OPTS.output_name)
+    c.save()
+
+    for tool in tools:
+        OPTS.sim_tool = tool
+        ver = verification(conf, OPTS.output_name)
+        ver.prepare_files()
+        # OpenRAM outputs are reused for the next tools
+        OPTS.run_openram = False
+
+        start_time = time.perf_counter()
+        ver.simulate()
+        debug.print_raw("{0:>10}: {1:>10.3f} s".format(tool, time.perf_counter() - start_time))
+
+    globals.end_opencache()
\ No newline at end of file
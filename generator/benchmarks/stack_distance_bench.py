@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2021 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+"""
+Benchmark of stack distance analysis.
+Finds the miss ratios of LRU caches of all sizes and associativities for a
+random trace in a single pass and by running sim_cache for each cache, and
+reports the time spent for both.
+"""
+import sys, os
+import time
+from random import Random
+sys.path.append(os.getenv("OPENCACHE_HOME"))
+import globals
+import debug
+
+# Number of requests in the trace
+TRACE_SIZE = 100000
+# Largest number of ways of the caches
+MAX_WAYS = 16
+
+
+def make_config(total_size, num_ways):
+    """ Make a cache_config instance with the given size and ways. """
+
+    from cache_config import cache_config
+    return cache_config(total_size=total_size,
+                        word_size=OPTS.word_size,
+                        words_per_line=OPTS.words_per_line,
+                        address_size=OPTS.address_size,
+                        write_size=OPTS.write_size,
+                        num_ways=num_ways)
+
+
+if __name__ == "__main__":
+    (OPTS, args) = globals.parse_args()
+    OPENCACHE_HOME = os.getenv("OPENCACHE_HOME")
+    config_file = args[0] if args else "{}/tests/configs/config.py".format(OPENCACHE_HOME)
+    globals.init_opencache(config_file)
+
+    from policy import replacement_policy as rp
+    from verify import sim_cache
+    from verify import stack_distance
+
+    rng = Random(0)
+    trace = [rng.randrange(2 ** OPTS.address_size) for _ in range(TRACE_SIZE)]
+
+    start_time = time.perf_counter()
+    sd = stack_distance(make_config(OPTS.total_size, OPTS.num_ways))
+    sd.run(trace)
+    curve = sd.miss_ratio_curve(MAX_WAYS)
+    pass_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    for total_size, num_ways in curve:
+        OPTS.replacement_policy = rp.NONE if num_ways == 1 else rp.LRU
+        sc = sim_cache(make_config(total_size, num_ways))
+        for address in trace:
+            sc.read(address)
+    sweep_time = time.perf_counter() - start_time
+
+    debug.print_raw("{0} caches, {1} requests".format(len(curve), TRACE_SIZE))
+    debug.print_raw("{0:>12}: {1:>8.2f} s".format("single pass", pass_time))
+    debug.print_raw("{0:>12}: {1:>8.2f} s".format("sim_cache", sweep_time))
+
+    globals.end_opencache()
\ No newline at end of file
@@ -67,8 +67,15 @@ class cache_config:
         if self.tag_size + self.set_size + self.offset_size != self.address_size:
             debug.error("Calculated address size does not match the given address size.", -1)
 
+        # Lines may be split into sectors which are transferred separately
+        self.num_sectors = OPTS.num_sectors
+        self.words_per_sector = self.words_per_line // self.num_sectors
+        self.sector_size = self.word_size * self.words_per_sector
+        self.sector_index_size = ceil(log2(self.num_sectors))
+
         # Address port size of DRAM
-        self.dram_address_size = self.address_size - self.offset_size
+        # Each row of DRAM is a sector of a line
+        self.dram_address_size = self.address_size - self.offset_size + self.sector_index_size
         # Number of rows in DRAM
         self.dram_num_rows = 2 ** self.dram_address_size
 
@@ -77,10 +84,15 @@ class cache_config:
         if OPTS.read_only or OPTS.write_policy == wp.WRITE_THROUGH:
             OPTS.has_flush = False
 
+        # Whether the set index is hashed with tag bits
+        # Fully associative caches have only one set
+        self.has_set_hash = OPTS.set_hash == "xor" and self.set_size > 0
+
         # Whether the tag word has dirty bit
         self.has_dirty = not (OPTS.read_only or OPTS.write_policy == wp.WRITE_THROUGH)
         # Tag word bit-width of a way
-        self.tag_word_size = self.tag_size + (2 if self.has_dirty else 1)
+        # Each sector has its own valid and dirty bits
+        self.tag_word_size = self.tag_size + self.num_sectors * (2 if self.has_dirty else 1)
 
         # Way size is used in replacement policy
         self.way_size = ceil(log2(self.num_ways))
@@ -98,6 +110,17 @@ class cache_config:
         else:
             self.num_masks = 0
 
+        # Number of DRAM write masks
+        # Write misses are forwarded to DRAM without refilling if the cache
+        # doesn't allocate lines for them. DRAM needs a write mask unless a
+        # write request always covers the whole line.
+        if OPTS.write_allocate or OPTS.read_only:
+            self.dram_num_masks = 0
+        else:
+            self.dram_num_masks = (self.words_per_sector if self.offset_size else 1) * (self.num_masks or 1)
+            if self.dram_num_masks == 1:
+                self.dram_num_masks = 0
+
         # Set the associativity of the cache
         if self.num_ways == 1:
             self.associativity = asc.DIRECT
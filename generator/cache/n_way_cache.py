@@ -9,6 +9,8 @@ from cache_base import cache_base
 from cache_signal import cache_signal
 from sram_instance import sram_instance
 from policy import replacement_policy as rp
+from policy import RRPV_SIZE, BRRIP_PERIOD
+from policy_plugin import policy_plugin
 from globals import OPTS
 
 
@@ -28,6 +30,10 @@ class n_way_cache(cache_base):
                 use_size = self.way_size
             elif OPTS.replacement_policy == rp.LRU:
                 use_size = self.way_size * self.num_ways
+            elif OPTS.replacement_policy.is_rrip():
+                use_size = RRPV_SIZE * self.num_ways
+            else:
+                use_size = OPTS.replacement_policy.use_size(self)
 
             # Use array of the cache
             use_opts = {}
@@ -54,8 +60,26 @@ class n_way_cache(cache_base):
         self.way = cache_signal(self.way_size, is_flop=True)
 
         if OPTS.replacement_policy == rp.RANDOM:
-            # Random counter flop for replacement
-            self.random = cache_signal(self.way_size, is_flop=True)
+            # Random counter or LFSR flop for replacement
+            if OPTS.random_generator == "lfsr":
+                self.random = cache_signal(OPTS.lfsr_size, is_flop=True)
+            else:
+                self.random = cache_signal(self.way_size, is_flop=True)
+
+        if OPTS.replacement_policy.is_rrip():
+            # Victim way and how much the RRPVs of its set need to be aged so
+            # that the victim's RRPV becomes the maximum
+            self.victim = cache_signal(self.way_size)
+            self.rrpv_age = cache_signal(RRPV_SIZE)
+
+        if OPTS.replacement_policy == rp.BRRIP:
+            # Fill counter for bimodal insertion
+            self.brrip_count = cache_signal((BRRIP_PERIOD - 1).bit_length(), is_flop=True)
+
+        if isinstance(OPTS.replacement_policy, policy_plugin):
+            # Victim way selected by the plugin
+            self.victim = cache_signal(self.way_size)
+            OPTS.replacement_policy.add_signals(self)
 
 
     def add_srams(self, m):
@@ -68,6 +92,10 @@ class n_way_cache(cache_base):
                 use_size = self.way_size
             elif OPTS.replacement_policy == rp.LRU:
                 use_size = self.way_size * self.num_ways
+            elif OPTS.replacement_policy.is_rrip():
+                use_size = RRPV_SIZE * self.num_ways
+            else:
+                use_size = OPTS.replacement_policy.use_size(self)
 
             # Use array
             self.use_array = sram_instance(OPTS.use_array_name, use_size, 1, self, m)
\ No newline at end of file
@@ -6,7 +6,9 @@
 # All rights reserved.
 #
 import os
-import inspect
+import json
+import time
+import atexit
 import globals
 import sys
 import pdb
@@ -20,12 +22,7 @@ import pdb
 
 def check(check, str):
     if not check:
-        (frame, filename, line_number, function_name, lines,
-         index) = inspect.getouterframes(inspect.currentframe())[1]
-        sys.stderr.write("ERROR: file {0}: line {1}: {2}\n".format(
-            os.path.basename(filename), line_number, str))
-        log("ERROR: file {0}: line {1}: {2}\n".format(
-            os.path.basename(filename), line_number, str))
+        report("ERROR", sys._getframe(1), str)
 
         if globals.OPTS.debug:
             pdb.set_trace()
@@ -34,12 +31,7 @@ def check(check, str):
 
 
 def error(str, return_value=0):
-    (frame, filename, line_number, function_name, lines,
-     index) = inspect.getouterframes(inspect.currentframe())[1]
-    sys.stderr.write("ERROR: file {0}: line {1}: {2}\n".format(
-        os.path.basename(filename), line_number, str))
-    log("ERROR: file {0}: line {1}: {2}\n".format(
-        os.path.basename(filename), line_number, str))
+    report("ERROR", sys._getframe(1), str)
 
     if globals.OPTS.debug:
         pdb.set_trace()
@@ -48,68 +40,151 @@ def error(str, return_value=0):
 
 
 def warning(str):
-    (frame, filename, line_number, function_name, lines,
-     index) = inspect.getouterframes(inspect.currentframe())[1]
-    sys.stderr.write("WARNING: file {0}: line {1}: {2}\n".format(
-        os.path.basename(filename), line_number, str))
-    log("WARNING: file {0}: line {1}: {2}\n".format(
-        os.path.basename(filename), line_number, str))
+    report("WARNING", sys._getframe(1), str)
 
 
-def print_raw(str):
+def report(level, frame, str):
+    """ Print an error or a warning with the location of the caller. """
+
+    file_name = os.path.basename(frame.f_code.co_filename)
+    message = "{0}: file {1}: line {2}: {3}\n".format(level,
+                                                     file_name,
+                                                     frame.f_lineno,
+                                                     str)
+    sys.stderr.write(message)
+    log(message,
+        level=level.lower(),
+        file=file_name,
+        line=frame.f_lineno,
+        text=str)
+
+    # The log file needs to be complete if the program is going to stop
+    if level == "ERROR":
+        flush_log()
+
+
+def print_raw(str, **fields):
     print(str)
-    log(str)
-
-
-def log(str):
-    if globals.OPTS.output_name != "":
-        if log.create_file:
-            # We may have not yet read the config, so we need to ensure
-            # it ends with a /
-            # This is also done in read_config if we change the path
-            # FIXME: There's actually a bug here. The first few lines
-            # could be in one log file and after read_config it could be
-            # in another log file if the path or name changes.
-            if not globals.OPTS.output_path.endswith("/"):
-                globals.OPTS.output_path += "/"
-            if not os.path.isdir(globals.OPTS.output_path):
-                os.makedirs(globals.OPTS.output_path,
-                            mode=0o750,
-                            exist_ok=True)
-            compile_log = open(globals.OPTS.output_path +
-                               globals.OPTS.output_name + ".log", "w+")
-            log.create_file = 0
-        else:
-            compile_log = open(globals.OPTS.output_path +
-                               globals.OPTS.output_name + ".log", "a")
-
-        if len(log.setup_output) != 0:
-            for line in log.setup_output:
-                compile_log.write(line)
-            log.setup_output = []
-        compile_log.write(str + "\n")
-        compile_log.close()
-    else:
-        log.setup_output.append(str + "\n")
-
-
-# use a static list of strings to store messages until the global paths are set up
+    log(str, **fields)
+
+
+def log(str, **fields):
+    """
+    Write a message to the log file. Fields are only written if the log file
+    is in JSON lines format.
+    """
+
+    # Store messages until the global paths are set up
+    log.setup_output.append((str, fields))
+    if globals.OPTS.output_name == "":
+        return
+
+    # Open the log file once and keep it open until it's closed or the output
+    # path changes
+    file_name = log_file_name()
+    if log.file is None or log.file.name != file_name:
+        close_log()
+        if not os.path.isdir(globals.OPTS.output_path):
+            os.makedirs(globals.OPTS.output_path,
+                        mode=0o750,
+                        exist_ok=True)
+        # The log file is truncated the first time it's opened in this
+        # process. It's always appended to so that messages of forked
+        # children don't overwrite each other.
+        log.file = open(file_name, "a")
+        if file_name not in log.opened_files:
+            log.file.truncate(0)
+        log.opened_files.add(file_name)
+
+    for str, fields in log.setup_output:
+        log.file.write(format_log(str, fields))
+    log.setup_output = []
+
+    # Forked children may exit without running atexit handlers; therefore,
+    # they don't keep messages in the buffer
+    if log.in_child:
+        log.file.flush()
+
+
+def log_file_name():
+    """ Return the path of the log file. """
+
+    # We may have not yet read the config, so we need to ensure it ends with
+    # a /. This is also done in read_config if we change the path.
+    # FIXME: There's actually a bug here. The first few lines could be in one
+    # log file and after read_config it could be in another log file if the
+    # path or name changes.
+    if not globals.OPTS.output_path.endswith("/"):
+        globals.OPTS.output_path += "/"
+
+    extension = "jsonl" if globals.OPTS.log_format == "json" else "log"
+    return "{0}{1}.{2}".format(globals.OPTS.output_path,
+                               globals.OPTS.output_name,
+                               extension)
+
+
+def format_log(str, fields):
+    """ Return a line of the log file for a message. """
+
+    if globals.OPTS.log_format != "json":
+        return str + "\n"
+
+    record = {"time": time.time(), "level": "info"}
+    record.update(fields)
+    record["message"] = record.pop("text", str.rstrip("\n"))
+    return json.dumps(record) + "\n"
+
+
+def flush_log():
+    """ Write buffered messages to the log file. """
+
+    if log.file is not None:
+        log.file.flush()
+
+
+def close_log():
+    """ Close the log file so that the next message reopens it. """
+
+    if log.file is not None:
+        log.file.close()
+        log.file = None
+
+
+def drop_log():
+    """ Drop the log file inherited from the parent process after a fork. """
+
+    # Buffer of the parent is flushed before forking. If it were written by
+    # the child as well, the messages would appear twice in the log file.
+    log.file = None
+    log.in_child = True
+
+
+# use a static list of messages to store them until the global paths are set up
 log.setup_output = []
-log.create_file = True
+# Log file is kept open between messages
+log.file = None
+log.opened_files = set()
+log.in_child = False
+atexit.register(close_log)
+# Forking isn't supported on some platforms
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(before=flush_log, after_in_child=drop_log)
 
 
 def info(lev, str):
     from globals import OPTS
     if (OPTS.verbose_level >= lev):
-        frm = inspect.stack()[1]
-        mod = inspect.getmodule(frm[0])
-        # classname = frm.f_globals["__name__"]
-        if mod.__name__ is None:
-            class_name = ""
-        else:
-            class_name = mod.__name__
+        # Only look up the caller frame instead of inspecting the whole stack
+        frame = sys._getframe(1)
+        class_name = frame.f_globals.get("__name__", "")
         print_raw("[{0}/{1}]: {2}".format(class_name,
-                                          frm[0].f_code.co_name, str))
+                                          frame.f_code.co_name,
+                                          str),
+                  level="info",
+                  module=class_name,
+                  function=frame.f_code.co_name,
+                  verbosity=lev,
+                  text=str)
 
 
 def bp():
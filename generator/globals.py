@@ -19,6 +19,7 @@ import re
 import copy
 import importlib
 import getpass
+import random
 
 VERSION = "0.0.1"
 NAME = "OpenCache v{}".format(VERSION)
@@ -45,11 +46,21 @@ def parse_args():
                              action="count",
                              dest="verbose_level",
                              help="Increase the verbosity level"),
+        optparse.make_option("--log-format",
+                             type="choice",
+                             choices=["text", "json"],
+                             dest="log_format",
+                             metavar="FORMAT",
+                             help="Format of the log file: text or json (default: text)"),
         optparse.make_option("-j", "--threads",
                              action="store",
                              type="int",
                              help="Specify the number of threads (default: 1)",
                              dest="num_threads"),
+        optparse.make_option("--impact",
+                             action="store_true",
+                             dest="test_impact",
+                             help="Only run regression tests affected by changes"),
         optparse.make_option("-k", "--keeptemp",
                              action="store_true",
                              dest="keep_temp",
@@ -58,10 +69,76 @@ def parse_args():
                              action="store_true",
                              dest="simulate",
                              help="Enable verification via simulation"),
+        optparse.make_option("--sim-tool",
+                             type="choice",
+                             choices=["icarus", "verilator", "amaranth"],
+                             dest="sim_tool",
+                             metavar="TOOL",
+                             help="Simulation tool: icarus, verilator, or amaranth (default: icarus)"),
+        optparse.make_option("--sim-size",
+                             type="int",
+                             dest="sim_size",
+                             metavar="N",
+                             help="Number of read/write operations in the simulation"),
+        optparse.make_option("--stimulus",
+                             type="choice",
+                             choices=["directed", "random"],
+                             dest="stimulus",
+                             metavar="TYPE",
+                             help="Stimulus of the simulation: directed or random (default: directed)"),
+        optparse.make_option("--seed",
+                             type="int",
+                             dest="seed",
+                             help="Seed of the random test data (default: random)"),
+        optparse.make_option("--shards",
+                             type="int",
+                             dest="num_shards",
+                             metavar="N",
+                             help="Split the simulation into N shards run in parallel (default: 1)"),
+        optparse.make_option("--lockstep",
+                             action="store_true",
+                             dest="lockstep",
+                             help="Check the design against sim_cache after each operation (Amaranth simulation only)"),
+        optparse.make_option("--sram-model",
+                             type="choice",
+                             choices=["openram", "behavioral"],
+                             dest="sram_model",
+                             metavar="MODEL",
+                             help="SRAM models for verification: openram or behavioral (default: openram)"),
         optparse.make_option("--syn",
                              action="store_true",
                              dest="synthesize",
-                             help="Enable verification via synthesis")
+                             help="Enable verification via synthesis"),
+        optparse.make_option("--no-waves",
+                             action="store_false",
+                             dest="dump_waves",
+                             help="Disable dumping waveforms during simulation"),
+        optparse.make_option("--waves-format",
+                             metavar="FORMAT",
+                             type="choice",
+                             choices=["vcd", "fst"],
+                             dest="dump_format",
+                             help="Waveform format: vcd or fst (default: vcd)"),
+        optparse.make_option("--waves-scope",
+                             action="append",
+                             dest="dump_scopes",
+                             help="Dump waveforms only for the given scope (can be repeated)",
+                             metavar="SCOPE"),
+        optparse.make_option("--waves-depth",
+                             type="int",
+                             dest="dump_depth",
+                             metavar="N",
+                             help="Number of hierarchy levels dumped under each scope (default: 0 for all)"),
+        optparse.make_option("--waves-start",
+                             type="int",
+                             dest="dump_start",
+                             metavar="NS",
+                             help="Time in ns when dumping waveforms starts (default: 0)"),
+        optparse.make_option("--waves-end",
+                             type="int",
+                             dest="dump_end",
+                             metavar="NS",
+                             help="Time in ns when dumping waveforms ends (default: end of simulation)")
         # -h --help is implicit.
     }
 
@@ -200,9 +277,16 @@ def read_config(config_file, is_unit_test=True):
 def fix_config():
     """ Fix and update options from the config file. """
 
+    # Import plugins so that they register their replacement policies
+    for module_name in OPTS.policy_plugins:
+        importlib.import_module(module_name)
+
     # Convert policy strings to enum values
     from policy import replacement_policy as rp
-    OPTS.replacement_policy = rp.get_value(OPTS.replacement_policy)
+    policy_name = OPTS.replacement_policy
+    OPTS.replacement_policy = rp.get_value(policy_name)
+    if OPTS.replacement_policy is None and policy_name is not None:
+        debug.error("{} is not a supported replacement policy.".format(policy_name), -1)
     from policy import write_policy as wp
     OPTS.write_policy = wp.get_value(OPTS.write_policy)
 
@@ -252,10 +336,15 @@ def fix_config():
     if OPTS.temp_path == "":
         OPTS.temp_path = OPTS.output_path + "tmp/"
 
+    # Pick a random seed for the test data if not given
+    if OPTS.seed is None:
+        OPTS.seed = random.SystemRandom().getrandbits(32)
+
 
 def end_opencache():
     """ Clean up OpenCache for a proper exit. """
 
+    debug.close_log()
     cleanup_paths()
 
 
@@ -303,7 +392,9 @@ def setup_paths():
     subdir_list = [item for item in os.listdir(OPENCACHE_HOME) if os.path.isdir(os.path.join(OPENCACHE_HOME, item))]
     for subdir in subdir_list:
         full_path = "{0}/{1}".format(OPENCACHE_HOME, subdir)
-        if "__pycache__" not in full_path:
+        # Paths might already be added by a previous unit test in the same
+        # process
+        if "__pycache__" not in full_path and full_path not in sys.path:
             sys.path.append(full_path)
 
 
@@ -381,8 +472,12 @@ def report_status():
         debug.error("{} is not an integer in config file.".format(OPTS.address_size), -1)
     if type(OPTS.num_ways) is not int:
         debug.error("{} is not an integer in config file.".format(OPTS.num_ways), -1)
+    if type(OPTS.num_sectors) is not int or OPTS.num_sectors < 1:
+        debug.error("{} is not a positive integer in config file.".format(OPTS.num_sectors), -1)
     if OPTS.openram_options and type(OPTS.openram_options) is not dict:
         debug.error("{} is not a dictionary in config file.".format(OPTS.openram_options), -1)
+    if OPTS.set_hash not in [None, "xor"]:
+        debug.error("{} is not a supported set hash.".format(OPTS.set_hash), -1)
 
     # Data array's total size should match the word size
     if OPTS.total_size % OPTS.word_size:
@@ -392,6 +487,30 @@ def report_status():
     if OPTS.write_size is not None and OPTS.word_size % OPTS.write_size:
         debug.error("Word size is not divisible by write size.", -1)
 
+    # Waveforms should be dumped in a non-empty time window
+    if OPTS.dump_depth < 0:
+        debug.error("Waveform dump depth cannot be negative.", -1)
+    if OPTS.dump_start < 0:
+        debug.error("Waveform dump start time cannot be negative.", -1)
+    if OPTS.dump_end is not None and OPTS.dump_end <= OPTS.dump_start:
+        debug.error("Waveform dump end time must be after the start time.", -1)
+    # Amaranth simulator dumps all signals of the whole simulation to a VCD
+    # file
+    if OPTS.simulate and OPTS.sim_tool == "amaranth" and OPTS.dump_waves:
+        if OPTS.dump_format != "vcd":
+            debug.error("Amaranth simulation can only dump waveforms in VCD format.", -1)
+        if OPTS.dump_scopes or OPTS.dump_depth or OPTS.dump_start or OPTS.dump_end is not None:
+            debug.error("Amaranth simulation doesn't support waveform scopes, depth, or time window.", -1)
+
+    # Sectors should divide lines evenly and be selected by offset bits
+    if OPTS.num_sectors > 1:
+        if OPTS.words_per_line % OPTS.num_sectors or OPTS.num_sectors & (OPTS.num_sectors - 1):
+            debug.error("Number of sectors must be a power of 2 dividing words per line.", -1)
+        if OPTS.return_type != "word":
+            debug.error("Sectored lines need word return type.", -1)
+        if not OPTS.write_allocate:
+            debug.error("Sectored lines need write allocate.", -1)
+
     from policy import replacement_policy as rp
     # Direct-mapped cache doesn't have a replacement policy
     if OPTS.num_ways == 1 and OPTS.replacement_policy != rp.NONE:
@@ -400,12 +519,29 @@ def report_status():
     if OPTS.num_ways > 1 and OPTS.replacement_policy == rp.NONE:
         debug.error("N-way Set Associative and Fully Associative caches need replacement policy.", -1)
 
+    # LFSR of random replacement should be supported and wide enough for ways
+    if OPTS.random_generator not in ["counter", "lfsr"]:
+        debug.error("{} is not a supported random generator.".format(OPTS.random_generator), -1)
+    if OPTS.replacement_policy == rp.RANDOM and OPTS.random_generator == "lfsr":
+        from lfsr import LFSR_TAPS
+        if OPTS.lfsr_size not in LFSR_TAPS:
+            debug.error("LFSR size must be between {0} and {1}.".format(min(LFSR_TAPS), max(LFSR_TAPS)), -1)
+        # LFSR is never 0; therefore, it needs more bits than a way index so
+        # that its lower bits can select every way
+        if OPTS.lfsr_size <= (OPTS.num_ways - 1).bit_length():
+            debug.error("LFSR size must be larger than the bit size of a way index.", -1)
+
     # Print cache info
     debug.print_raw("\nCache type: {}".format("Instruction" if OPTS.read_only else "Data"))
     debug.print_raw("Word size: {}".format(OPTS.word_size))
     debug.print_raw("Words per line: {}".format(OPTS.words_per_line))
+    if OPTS.num_sectors > 1:
+        debug.print_raw("Sectors per line: {}".format(OPTS.num_sectors))
     debug.print_raw("Number of ways: {}".format(OPTS.num_ways))
     debug.print_raw("Replacement policy: {}".format(OPTS.replacement_policy.long_name()))
     debug.print_raw("Write policy: {}".format(OPTS.write_policy.long_name() if OPTS.write_policy else "None"))
+    if not OPTS.read_only:
+        debug.print_raw("Write allocate: {}".format(OPTS.write_allocate))
     debug.print_raw("Return type: {}".format(OPTS.return_type.capitalize()))
+    debug.print_raw("Set hash: {}".format(OPTS.set_hash.upper() if OPTS.set_hash else "None"))
     debug.print_raw("Data hazard: {}\n".format(OPTS.data_hazard))
\ No newline at end of file
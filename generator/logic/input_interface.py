@@ -42,7 +42,7 @@ class input_interface(logic_base):
         with m.Case(state.FLUSH):
             # If current set is clean or DRAM is available, increment the set
             # register when all ways in the set are checked
-            with m.If((~c.tag_array.output().dirty(c.way) | ~c.dram.stall()) & (c.way == c.num_ways - 1)):
+            with m.If(self.flush_way_done(c) & (c.way == c.num_ways - 1)):
                 m.d.comb += c.set.eq(c.set + 1)
 
 
@@ -59,6 +59,11 @@ class input_interface(logic_base):
 
         # In the COMPARE state, the request is decoded if current request is hit.
         with m.Case(state.COMPARE):
+            # Take the next request if current request is a write miss which
+            # is forwarded to DRAM and DRAM is available.
+            for _ in c.hit_detector.find_write_miss():
+                with m.If(~c.dram.stall()):
+                    self.store_request(c, m)
             for _ in c.hit_detector.find_hit():
                 # If write policy is write-through, take the next request if
                 # current request is read or DRAM is available.
@@ -72,13 +77,13 @@ class input_interface(logic_base):
     def add_write(self, c, m):
         """ Add statements for the WRITE state. """
 
-        # If write policy is not write-through, don't generate this state.
-        if OPTS.write_policy != wp.WRITE_THROUGH:
+        # If write requests aren't completed in this state, don't generate it.
+        if not self.has_write_done():
             return
 
         # In the WRITE state, the next request is stored.
         with m.Case(state.WRITE):
-            with m.If(~c.dram.stall()):
+            with self.check_write_done(c, m):
                 self.store_request(c, m)
 
 
@@ -106,4 +106,38 @@ class logic_base:
 
     def add_reset_sig(self, c, m):
         """ Add reset signal control. """
-        pass
\ No newline at end of file
+        pass
+
+
+    def check_write_done(self, c, m):
+        """
+        Return Amaranth context manager instance to check if the WRITE state
+        sends the write request of the CPU to DRAM and completes the request.
+        """
+
+        # Write-back caches also use the WRITE state to evict dirty lines for
+        # read misses
+        if OPTS.write_policy == wp.WRITE_THROUGH:
+            return m.If(~c.dram.stall())
+        else:
+            return m.If(~c.dram.stall() & ~c.web_reg)
+
+
+    def has_write_done(self):
+        """ Return True if the WRITE state can complete requests of the CPU. """
+
+        return OPTS.write_policy == wp.WRITE_THROUGH or not OPTS.write_allocate
+
+
+    def flush_way_done(self, c, way=None):
+        """ Return whether the FLUSH state moves on to the next way. """
+
+        if way is None:
+            way = c.way
+
+        # Way is done if it is clean or DRAM is available for its last dirty
+        # sector. Dirty sectors of a way are written back one by one.
+        if c.num_sectors > 1:
+            dirty = c.tag_array.output().dirty_sectors(way)
+            return ~dirty.any() | (~c.dram.stall() & ((dirty & (dirty - 1)) == 0))
+        return ~c.tag_array.output().dirty(way) | ~c.dram.stall()
\ No newline at end of file
@@ -5,7 +5,7 @@
 # (acting for and on behalf of Oklahoma State University)
 # All rights reserved.
 #
-from amaranth import Cat, C
+from amaranth import Cat, C, Mux, Repl
 from logic_base import logic_base
 from state import state
 from policy import write_policy as wp
@@ -53,16 +53,20 @@ class memory_controller(logic_base):
                         # Check if current set is clean or DRAM is available,
                         # and all ways of the set are checked
                         if i == c.num_ways - 1:
-                            with m.If(~c.tag_array.output().dirty(i) | ~c.dram.stall()):
+                            with m.If(self.flush_way_done(c, i)):
                                 # Request the next tag and data lines from SRAMs
                                 c.tag_array.read(c.set + 1)
                                 c.data_array.read(c.set + 1)
                         # Check if current set is dirty and DRAM is available
                         with m.If(c.tag_array.output().dirty(i) & ~c.dram.stall()):
-                            # Update dirty bits in the tag line
-                            c.tag_array.write(c.set, Cat(c.tag_array.output().tag(i), C(2, 2)), i)
-                            # Send the write request to DRAM
-                            c.dram.write(Cat(c.set, c.tag_array.output().tag(i)), c.data_array.output(i))
+                            # Dirty sectors are written back one by one
+                            if c.num_sectors > 1:
+                                self.add_write_back(c, m, i)
+                            else:
+                                # Update dirty bits in the tag line
+                                c.tag_array.write(c.set, Cat(c.tag_array.output().tag(i), C(2, 2)), i)
+                                # Send the write request to DRAM
+                                c.dram.write(c.set.line_address(c.tag_array.output().tag(i)), c.data_array.output(i))
 
 
     def add_idle(self, c, m):
@@ -94,13 +98,16 @@ class memory_controller(logic_base):
                     if is_dirty:
                         # If DRAM is available, switch to WAIT_WRITE and wait for DRAM to
                         # complete writing.
-                        c.dram.write(Cat(c.set, c.tag_array.output().tag(i)), c.data_array.output(i))
+                        # Dirty sectors are written back in the WAIT_WRITE state if lines
+                        # are sectored.
+                        if c.num_sectors == 1:
+                            c.dram.write(c.set.line_address(c.tag_array.output().tag(i)), c.data_array.output(i))
                     # Else, assume that current request is clean miss
                     else:
                         # If DRAM is busy, switch to READ and wait for DRAM to be available
                         # If DRAM is available, switch to WAIT_READ and wait for DRAM to
                         # complete reading
-                        c.dram.read(Cat(c.set, c.tag))
+                        c.dram.read(c.set.line_address(c.tag, c.sector))
                 # Check if there is an empty way. All empty ways need to be filled
                 # before evicting a random way.
                 # NOTE: The line below should only work for some replacement policies where
@@ -109,7 +116,15 @@ class memory_controller(logic_base):
                     # If DRAM is busy, switch to READ and wait for DRAM to be available
                     # If DRAM is available, switch to WAIT_READ and wait for DRAM to
                     # complete reading
-                    c.dram.read(Cat(c.set, c.tag))
+                    c.dram.read(c.set.line_address(c.tag, c.sector))
+                # Check if the line is in the cache without the sector of current
+                # request. Only the sector is read from DRAM.
+                for i in c.hit_detector.find_sector_miss():
+                    c.dram.read(c.set.line_address(c.tag, c.sector))
+                # Check if current request is a write miss which is forwarded to
+                # DRAM without refilling.
+                for _ in c.hit_detector.find_write_miss():
+                    self.add_write_around(c, m)
             # Check if current request is hit
             # Compare all ways' tags to find a hit. Since each way has a different
             # tag, only one of them can match at most.
@@ -122,14 +137,17 @@ class memory_controller(logic_base):
                 if not OPTS.read_only:
                     with m.If(~c.web_reg):
                         # Update dirty bit
-                        if c.has_dirty:
+                        if c.has_dirty and c.num_sectors > 1:
+                            tag_line = c.tag_array.output()
+                            c.tag_array.write(c.set, Cat(c.tag, tag_line.dirty_sectors(i) | self.get_sector_bits(c), tag_line.valid_sectors(i)), i)
+                        elif c.has_dirty:
                             c.tag_array.write(c.set, Cat(c.tag, C(3, 2)), i)
                         # Perform write request
                         c.data_array.write(c.set, c.data_array.output(i), i)
                         c.data_array.write_input(i, c.offset if c.offset_size else None, c.din_reg, c.wmask_reg if c.num_masks else None)
                         # If write policy is write-through, write to the DRAM
                         if OPTS.write_policy == wp.WRITE_THROUGH:
-                            c.dram.write(Cat(c.set, c.tag), c.data_array.output(i))
+                            c.dram.write(c.set.line_address(c.tag, c.sector), self.get_dram_row(c, c.data_array.output(i)))
                             c.dram.write_input(c.offset if c.offset_size else None, c.din_reg, c.wmask_reg if c.num_masks else None)
                 # If write policy is write-through, read next lines if current request
                 # is read or DRAM is available.
@@ -161,7 +179,7 @@ class memory_controller(logic_base):
                 with m.Switch(c.way):
                     for i in range(c.num_ways):
                         with m.Case(i):
-                            c.dram.write(Cat(c.set, c.tag_array.output().tag(c.way)), c.data_array.output(i))
+                            c.dram.write(c.set.line_address(c.tag_array.output().tag(c.way), c.sector), self.get_dram_row(c, c.data_array.output(i)))
                 # If write policy is write-through, write to the DRAM
                 if OPTS.write_policy == wp.WRITE_THROUGH:
                     c.dram.write_input(c.offset if c.offset_size else None, c.din_reg, c.wmask_reg if c.num_masks else None)
@@ -169,6 +187,10 @@ class memory_controller(logic_base):
                     # a new request since read is non-destructive.
                     c.tag_array.read(c.addr.parse_set())
                     c.data_array.read(c.addr.parse_set())
+                # Check if current request is a write miss which is forwarded to
+                # DRAM without refilling.
+                for _ in c.hit_detector.find_write_miss():
+                    self.add_write_around(c, m)
 
 
     def add_wait_write(self, c, m):
@@ -182,8 +204,12 @@ class memory_controller(logic_base):
             # If DRAM is busy, wait in this state.
             # If DRAM completes writing, switch to WAIT_READ and wait for DRAM to
             # complete reading.
+            # If lines are sectored, write the next dirty sector back instead
+            # until no sector is dirty.
             with m.If(~c.dram.stall()):
-                c.dram.read(Cat(c.set, c.tag))
+                c.dram.read(c.set.line_address(c.tag, c.sector))
+                if c.num_sectors > 1:
+                    self.add_write_back(c, m, c.way)
 
 
     def add_read(self, c, m):
@@ -199,7 +225,7 @@ class memory_controller(logic_base):
             # If DRAM completes writing, switch to WAIT_READ and wait for DRAM to
             # complete reading.
             with m.If(~c.dram.stall()):
-                c.dram.read(Cat(c.set, c.tag))
+                c.dram.read(c.set.line_address(c.tag, c.sector))
 
 
     def add_wait_read(self, c, m):
@@ -215,20 +241,24 @@ class memory_controller(logic_base):
             #   IDLE    if CPU isn't sending a new request
             #   COMPARE if CPU is sending a new request
             with m.If(~c.dram.stall()):
-                # Update tag line
-                if c.has_dirty:
-                    c.tag_array.write(c.set, Cat(c.tag, ~c.web_reg, C(1, 1)), c.way)
+                # Update tag and data lines
+                if c.num_sectors > 1:
+                    self.add_sector_fill(c, m)
                 else:
-                    c.tag_array.write(c.set, Cat(c.tag, C(1, 1)), c.way)
-                # Update data line
-                c.data_array.write(c.set, c.dram.output(), c.way)
+                    # Update tag line
+                    if c.has_dirty:
+                        c.tag_array.write(c.set, Cat(c.tag, ~c.web_reg, C(1, 1)), c.way)
+                    else:
+                        c.tag_array.write(c.set, Cat(c.tag, C(1, 1)), c.way)
+                    # Update data line
+                    c.data_array.write(c.set, c.dram.output(), c.way)
                 # Perform the write request if data cache
                 if not OPTS.read_only:
                     with m.If(~c.web_reg):
                         c.data_array.write_input(c.way, c.offset if c.offset_size else None, c.din_reg, c.wmask_reg if c.num_masks else None)
                         # If write policy is write-through, write to the DRAM
                         if OPTS.write_policy == wp.WRITE_THROUGH:
-                            c.dram.write(Cat(c.set, c.tag), c.dram.output())
+                            c.dram.write(c.set.line_address(c.tag, c.sector), c.dram.output())
                             c.dram.write_input(c.offset if c.offset_size else None, c.din_reg, c.wmask_reg if c.num_masks else None)
                 # Read next lines from SRAMs even though the CPU is not sending
                 # a new request since read is non-destructive.
@@ -263,4 +293,64 @@ class memory_controller(logic_base):
         # In the FLUSH state, cache will write all data lines back to DRAM.
         with m.If(c.flush):
             c.tag_array.read(0)
-            c.data_array.read(0)
\ No newline at end of file
+            c.data_array.read(0)
+
+
+    def add_write_around(self, c, m):
+        """ Add statements to forward the write request to DRAM. """
+
+        # Only the written part of the line is sent to DRAM since the line isn't
+        # brought into the cache.
+        c.dram.write_masked(c.set.line_address(c.tag, c.sector))
+        c.dram.write_input(c.offset if c.offset_size else None, c.din_reg, c.wmask_reg if c.num_masks else None)
+        # Read next lines from SRAMs even though the CPU is not sending a new
+        # request since read is non-destructive.
+        c.tag_array.read(c.addr.parse_set())
+        c.data_array.read(c.addr.parse_set())
+
+
+    def add_write_back(self, c, m, way):
+        """ Add statements to write the first dirty sector of the way back to DRAM. """
+
+        # Dirty bit of the sector is cleared so that the next dirty sector is
+        # written back when DRAM is available again
+        tag_line = c.tag_array.output()
+        for i in c.tag_array.find_way(way):
+            dirty = tag_line.dirty_sectors(i)
+            for j in reversed(range(c.num_sectors)):
+                with m.If(dirty[j]):
+                    c.tag_array.write(c.set, Cat(tag_line.tag(i), dirty & ~C(1 << j, c.num_sectors), tag_line.valid_sectors(i)), i)
+                    c.dram.write(c.set.line_address(tag_line.tag(i), C(j, c.sector_index_size)), c.data_array.output(i).sector(j))
+
+
+    def add_sector_fill(self, c, m):
+        """ Add statements to bring the sector read from DRAM into the way. """
+
+        # Other sectors are kept if the way already has the line. Otherwise,
+        # they are invalid.
+        tag_line = c.tag_array.output()
+        sector_bits = self.get_sector_bits(c)
+        for i in c.tag_array.find_way(c.way):
+            has_line = c.hit_detector.check_line(i)
+            valid = Mux(has_line, tag_line.valid_sectors(i), 0) | sector_bits
+            if c.has_dirty:
+                dirty = Mux(has_line, tag_line.dirty_sectors(i), 0) | (sector_bits & Repl(~c.web_reg, c.num_sectors))
+                c.tag_array.write(c.set, Cat(c.tag, dirty, valid), i)
+            else:
+                c.tag_array.write(c.set, Cat(c.tag, valid), i)
+        c.data_array.write_sector(c.set, c.dram.output(), c.way, c.sector)
+
+
+    def get_sector_bits(self, c):
+        """ Return the one-hot bits of the sector of current request. """
+
+        return Cat(*[c.sector == i for i in range(c.num_sectors)])
+
+
+    def get_dram_row(self, c, line):
+        """ Return the part of a data line in the DRAM row of current request. """
+
+        # Each row of DRAM is a sector if lines are sectored
+        if c.num_sectors > 1:
+            return line.sector(c.sector)
+        return line
\ No newline at end of file
@@ -41,6 +41,11 @@ class output_interface(logic_base):
         # Data output is valid if the request is hit and even if the current
         # request is write since read is non-destructive.
         with m.Case(state.COMPARE):
+            # Lower the stall if current request is a write miss which is
+            # forwarded to DRAM and DRAM is available.
+            for _ in c.hit_detector.find_write_miss():
+                with m.If(~c.dram.stall()):
+                    m.d.comb += c.stall.eq(0)
             for i in c.hit_detector.find_hit():
                 # If write policy is write-through, lower the stall if current request
                 # is read or DRAM is available.
@@ -58,13 +63,13 @@ class output_interface(logic_base):
     def add_write(self, c, m):
         """ Add statements for the WRITE state. """
 
-        # If write policy is not write-through, don't generate this state.
-        if OPTS.write_policy != wp.WRITE_THROUGH:
+        # If write requests aren't completed in this state, don't generate it.
+        if not self.has_write_done():
             return
 
         # In the WRITE state, stall is lowered.
         with m.Case(state.WRITE):
-            with m.If(~c.dram.stall()):
+            with self.check_write_done(c, m):
                 m.d.comb += c.stall.eq(0)
 
 
@@ -79,7 +84,9 @@ class output_interface(logic_base):
             # Check if DRAM answers to the read request
             with m.If(~c.dram.stall()):
                 m.d.comb += c.stall.eq(0)
-                if c.offset_size:
-                    m.d.comb += c.dout.eq(c.dram.output().word(c.offset))
+                # Output of DRAM is a sector if lines are sectored
+                offset = c.dram.row_offset(c.offset) if c.offset_size else None
+                if offset is not None:
+                    m.d.comb += c.dout.eq(c.dram.output().word(offset))
                 else:
                     m.d.comb += c.dout.eq(c.dram.output())
\ No newline at end of file
@@ -7,6 +7,7 @@
 #
 import os
 import sys
+from policy_plugin import policy_plugin
 from globals import OPTS
 
 
@@ -32,6 +33,10 @@ class replacer:
         """ Get the replacer logic of the replacement policy. """
 
         name = "{0}_replacer".format(OPTS.replacement_policy)
+        # Plugins are added by the same replacer logic
+        if isinstance(OPTS.replacement_policy, policy_plugin):
+            name = "plugin_replacer"
+            kwargs["policy"] = OPTS.replacement_policy
         path = "{0}/logic/replacers/".format(os.getenv("OPENCACHE_HOME"))
 
         # Check if file exists
@@ -0,0 +1,50 @@
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2021 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+from amaranth import Mux
+from srrip_replacer import srrip_replacer
+from state import state
+from policy import RRPV_MAX
+
+
+class brrip_replacer(srrip_replacer):
+    """
+    This class extends SRRIP replacer logic module for BRRIP replacement policy.
+    """
+
+    def __init__(self):
+
+        super().__init__()
+
+
+    def add(self, c, m):
+        """ Add all sections of the always block code. """
+
+        # Fill counter is incremented after each line is brought from DRAM
+        with m.If((c.state == state.WAIT_READ) & ~c.dram.stall()):
+            for _ in c.hit_detector.find_line_fill():
+                m.d.comb += c.brrip_count.eq(c.brrip_count + 1)
+
+        super().add(c, m)
+
+
+    def add_reset_sig(self, c, m):
+        """ Add reset signal control. """
+
+        super().add_reset_sig(c, m)
+
+        with m.If(c.rst):
+            m.d.comb += c.brrip_count.eq(0)
+
+
+    def get_insertion_value(self, c, m):
+        """ Return the RRPV of new lines. """
+
+        # Most lines are inserted with the distant RRPV so that a scan larger
+        # than the cache cannot evict the working set. A line is inserted
+        # with the long RRPV once in BRRIP_PERIOD fills.
+        return Mux(c.brrip_count == 0, RRPV_MAX - 1, RRPV_MAX)
\ No newline at end of file
@@ -37,7 +37,7 @@ class fifo_replacer(logic_base):
         # to DRAM.
         with m.Case(state.FLUSH):
             # If current set is clean or DRAM is available, increment the way register
-            with m.If((~c.tag_array.output().dirty(c.way) | ~c.dram.stall())):
+            with m.If(self.flush_way_done(c)):
                 m.d.comb += c.way.eq(c.way + 1)
 
 
@@ -59,6 +59,15 @@ class fifo_replacer(logic_base):
         # policy of the cache.
         with m.Case(state.COMPARE):
             m.d.comb += c.way.eq(c.use_array.output())
+            # If the line is in the cache without the sector of current
+            # request, the sector is brought into the same way.
+            for i in c.hit_detector.find_sector_miss():
+                m.d.comb += c.way.eq(i)
+            # Read next lines from SRAMs if current request is a write miss
+            # which is forwarded to DRAM and DRAM is available.
+            for _ in c.hit_detector.find_write_miss():
+                with m.If(~c.dram.stall()):
+                    c.use_array.read(c.addr.parse_set())
             # The corresponding use array line needs to be requested if current
             # request is hit.
             # Read next lines from SRAMs even though CPU is not sending a new
@@ -77,14 +86,14 @@ class fifo_replacer(logic_base):
     def add_write(self, c, m):
         """ Add statements for the WRITE state. """
 
-        # If write policy is not write-through, don't generate this state.
-        if OPTS.write_policy != wp.WRITE_THROUGH:
+        # If write requests aren't completed in this state, don't generate it.
+        if not self.has_write_done():
             return
 
         # In the WRITE state, corresponding line from the use array is requested
         # if DRAM is available.
         with m.Case(state.WRITE):
-            with m.If(~c.dram.stall()):
+            with self.check_write_done(c, m):
                 c.use_array.read(c.addr.parse_set())
 
 
@@ -97,7 +106,9 @@ class fifo_replacer(logic_base):
                 # Each set has its own FIFO number. These numbers start from 0 and
                 # always show the next way to be placed. When new data is placed on
                 # that way, FIFO number is incremented.
-                c.use_array.write(c.set, c.way + 1)
+                # Bringing a sector of a line in the cache doesn't place new data.
+                for _ in c.hit_detector.find_line_fill():
+                    c.use_array.write(c.set, c.way + 1)
                 # Read next lines from SRAMs even if CPU is not sending a new request
                 # since read is non-destructive.
                 c.use_array.read(c.addr.parse_set())
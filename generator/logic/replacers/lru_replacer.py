@@ -37,7 +37,7 @@ class lru_replacer(logic_base):
         # back to DRAM.
         with m.Case(state.FLUSH):
             # If current set is clean or DRAM is available, increment the way register
-            with m.If((~c.tag_array.output().dirty(c.way) | ~c.dram.stall())):
+            with m.If(self.flush_way_done(c)):
                 m.d.comb += c.way.eq(c.way + 1)
 
 
@@ -62,6 +62,15 @@ class lru_replacer(logic_base):
             c.use_array.read(c.set)
             for is_dirty, i in c.hit_detector.find_miss():
                 m.d.comb += c.way.eq(i)
+            # If the line is in the cache without the sector of current
+            # request, the sector is brought into the same way.
+            for i in c.hit_detector.find_sector_miss():
+                m.d.comb += c.way.eq(i)
+            # Read next lines from SRAMs if current request is a write miss
+            # which is forwarded to DRAM and DRAM is available.
+            for _ in c.hit_detector.find_write_miss():
+                with m.If(~c.dram.stall()):
+                    c.use_array.read(c.addr.parse_set())
             # Check if current request is a hit
             for i in c.hit_detector.find_hit():
                 m.d.comb += c.way.eq(i)
@@ -90,14 +99,14 @@ class lru_replacer(logic_base):
     def add_write(self, c, m):
         """ Add statements for the WRITE state. """
 
-        # If write policy is not write-through, don't generate this state
-        if OPTS.write_policy != wp.WRITE_THROUGH:
+        # If write requests aren't completed in this state, don't generate it.
+        if not self.has_write_done():
             return
 
         # In the WRITE state, corresponding line from the use array is requested
         # if DRAM is available.
         with m.Case(state.WRITE):
-            with m.If(~c.dram.stall()):
+            with self.check_write_done(c, m):
                 c.use_array.read(c.addr.parse_set())
 
 
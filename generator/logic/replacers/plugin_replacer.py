@@ -0,0 +1,91 @@
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2021 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+from lru_replacer import lru_replacer
+from state import state
+from policy import write_policy as wp
+from globals import OPTS
+
+
+class plugin_replacer(lru_replacer):
+    """
+    This class extends LRU replacer logic module for replacement policy plugins.
+    Use array is read and written in the same states as LRU; however, use lines
+    are updated by the plugin.
+    """
+
+    def __init__(self, policy):
+
+        super().__init__()
+        self.policy = policy
+
+
+    def add(self, c, m):
+        """ Add all sections of the always block code. """
+
+        self.policy.add_victim(c, m)
+
+        super().add(c, m)
+
+
+    def add_compare(self, c, m):
+        """ Add statements for the COMPARE state. """
+
+        # In the COMPARE state, way is selected by the plugin.
+        # Also use line is updated if current request is hit.
+        with m.Case(state.COMPARE):
+            c.use_array.read(c.set)
+            m.d.comb += c.way.eq(c.victim)
+            # If the line is in the cache without the sector of current
+            # request, the sector is brought into the same way.
+            for i in c.hit_detector.find_sector_miss():
+                m.d.comb += c.way.eq(i)
+            # Read next lines from SRAMs if current request is a write miss
+            # which is forwarded to DRAM and DRAM is available.
+            for _ in c.hit_detector.find_write_miss():
+                with m.If(~c.dram.stall()):
+                    c.use_array.read(c.addr.parse_set())
+            # Check if current request is a hit
+            for i in c.hit_detector.find_hit():
+                m.d.comb += c.way.eq(i)
+                if self.policy.updated_after_read():
+                    c.use_array.write(c.set, c.use_array.output())
+                    self.policy.add_hit(c, m, i)
+                # Read next lines from SRAMs even if CPU is not sending a new request
+                # since read is non-destructive.
+                # If write policy is write-through, read next lines if current request
+                # is read or DRAM is available.
+                if OPTS.write_policy == wp.WRITE_THROUGH:
+                    with m.If(c.web_reg | ~c.dram.stall()):
+                        c.use_array.read(c.addr.parse_set())
+                else:
+                    c.use_array.read(c.addr.parse_set())
+
+
+    def add_wait_read(self, c, m):
+        """ Add statements for the WAIT_READ state. """
+
+        # In the WAIT_READ state, use line is updated by the plugin.
+        with m.Case(state.WAIT_READ):
+            c.use_array.read(c.set)
+            with m.If(~c.dram.stall()):
+                c.use_array.write(c.set, c.use_array.output())
+                for _ in c.hit_detector.find_line_fill():
+                    self.policy.add_fill(c, m)
+                # Bringing a sector of a line in the cache is a hit of the line
+                if self.policy.updated_after_read():
+                    for i in c.hit_detector.find_sector_fill():
+                        self.policy.add_hit(c, m, i)
+                # Read next lines from SRAMs even if CPU is not sending a new request
+                # since read is non-destructive.
+                c.use_array.read(c.addr.parse_set())
+
+
+    def get_reset_value(self, c):
+        """ Return the reset value for use array lines. """
+
+        return self.policy.reset_value(c)
\ No newline at end of file
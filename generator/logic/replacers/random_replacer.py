@@ -5,8 +5,11 @@
 # (acting for and on behalf of Oklahoma State University)
 # All rights reserved.
 #
+from amaranth import Cat
 from logic_base import logic_base
 from state import state
+from lfsr import LFSR_SEED, LFSR_TAPS
+from globals import OPTS
 
 
 class random_replacer(logic_base):
@@ -22,7 +25,12 @@ class random_replacer(logic_base):
     def add(self, c, m):
         """ Add all sections of the always block code. """
 
-        m.d.comb += c.random.eq(c.random + 1)
+        if OPTS.random_generator == "lfsr":
+            # Shift the XOR of the tap bits into the LFSR
+            feedback = Cat(*[c.random[x - 1] for x in LFSR_TAPS[OPTS.lfsr_size]]).xor()
+            m.d.comb += c.random.eq(Cat(feedback, c.random[:-1]))
+        else:
+            m.d.comb += c.random.eq(c.random + 1)
 
         super().add(c, m)
 
@@ -34,7 +42,7 @@ class random_replacer(logic_base):
         # to DRAM.
         with m.Case(state.FLUSH):
             # If current set is clean or DRAM is available, increment the way register
-            with m.If((~c.tag_array.output().dirty(c.way) | ~c.dram.stall())):
+            with m.If(self.flush_way_done(c)):
                 m.d.comb += c.way.eq(c.way + 1)
 
 
@@ -44,11 +52,15 @@ class random_replacer(logic_base):
         # In the COMPARE state, way is selected according to the replacement
         # policy of the cache.
         with m.Case(state.COMPARE):
-            m.d.comb += c.way.eq(c.random)
+            m.d.comb += c.way.eq(c.random[:c.way_size])
             # If there is an empty way, it must be filled before evicting the
             # random way.
             for i in c.hit_detector.find_empty():
                 m.d.comb += c.way.eq(i)
+            # If the line is in the cache without the sector of current
+            # request, the sector is brought into the same way.
+            for i in c.hit_detector.find_sector_miss():
+                m.d.comb += c.way.eq(i)
             # Check if current request is a hit
             for i in c.hit_detector.find_hit():
                 m.d.comb += c.way.eq(i)
@@ -69,7 +81,7 @@ class random_replacer(logic_base):
 
         # If rst is high, way and random are reset.
         # way register becomes 0 since it is going to be used to reset all ways
-        # tag lines.
+        # tag lines. LFSR cannot be reset to 0 since it would stay 0.
         with m.If(c.rst):
             m.d.comb += c.way.eq(0)
-            m.d.comb += c.random.eq(0)
\ No newline at end of file
+            m.d.comb += c.random.eq(LFSR_SEED if OPTS.random_generator == "lfsr" else 0)
\ No newline at end of file
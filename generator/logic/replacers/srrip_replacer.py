@@ -0,0 +1,120 @@
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2021 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+from lru_replacer import lru_replacer
+from state import state
+from policy import write_policy as wp
+from policy import RRPV_SIZE, RRPV_MAX
+from globals import OPTS
+
+
+class srrip_replacer(lru_replacer):
+    """
+    This class extends LRU replacer logic module for SRRIP replacement policy.
+    Use array is read and written in the same states as LRU; however, each way
+    has a re-reference prediction value (RRPV) instead of a use number.
+    """
+
+    def __init__(self):
+
+        super().__init__()
+
+
+    def add(self, c, m):
+        """ Add all sections of the always block code. """
+
+        # The last way with the maximum RRPV is the victim. If no way has
+        # RRPV_MAX, all ways are aged so that the victim's RRPV becomes
+        # RRPV_MAX.
+        for value in range(RRPV_MAX + 1):
+            for i in range(c.num_ways):
+                with m.If(c.use_array.output().use(i) == value):
+                    m.d.comb += c.victim.eq(i)
+                    m.d.comb += c.rrpv_age.eq(RRPV_MAX - value)
+        # Empty ways are filled first. Their RRPV is always RRPV_MAX; therefore,
+        # no way needs to be aged.
+        for i in range(c.num_ways):
+            with m.If(~c.tag_array.output().valid(i)):
+                m.d.comb += c.victim.eq(i)
+
+        super().add(c, m)
+
+
+    def add_compare(self, c, m):
+        """ Add statements for the COMPARE state. """
+
+        # In the COMPARE state, way is selected according to the replacement
+        # policy of the cache.
+        # Also RRPV of the way is reset if current request is hit.
+        with m.Case(state.COMPARE):
+            c.use_array.read(c.set)
+            m.d.comb += c.way.eq(c.victim)
+            # If the line is in the cache without the sector of current
+            # request, the sector is brought into the same way.
+            for i in c.hit_detector.find_sector_miss():
+                m.d.comb += c.way.eq(i)
+            # Read next lines from SRAMs if current request is a write miss
+            # which is forwarded to DRAM and DRAM is available.
+            for _ in c.hit_detector.find_write_miss():
+                with m.If(~c.dram.stall()):
+                    c.use_array.read(c.addr.parse_set())
+            # Check if current request is a hit
+            for i in c.hit_detector.find_hit():
+                m.d.comb += c.way.eq(i)
+                # A hit predicts that the way is going to be re-referenced in
+                # the near future
+                c.use_array.write(c.set, c.use_array.output())
+                m.d.comb += c.use_array.input().use(i).eq(0)
+                # Read next lines from SRAMs even if CPU is not sending a new request
+                # since read is non-destructive.
+                # If write policy is write-through, read next lines if current request
+                # is read or DRAM is available.
+                if OPTS.write_policy == wp.WRITE_THROUGH:
+                    with m.If(c.web_reg | ~c.dram.stall()):
+                        c.use_array.read(c.addr.parse_set())
+                else:
+                    c.use_array.read(c.addr.parse_set())
+
+
+    def add_wait_read(self, c, m):
+        """ Add statements for the WAIT_READ state. """
+
+        # In the WAIT_READ state, RRPVs are updated.
+        with m.Case(state.WAIT_READ):
+            c.use_array.read(c.set)
+            with m.If(~c.dram.stall()):
+                # All ways are aged and the new line is inserted with the RRPV
+                # of the replacement policy
+                c.use_array.write(c.set, c.use_array.output())
+                for _ in c.hit_detector.find_line_fill():
+                    for i in range(c.num_ways):
+                        m.d.comb += c.use_array.input().use(i).eq(c.use_array.output().use(i) + c.rrpv_age)
+                    with m.Switch(c.way):
+                        for i in range(c.num_ways):
+                            with m.Case(i):
+                                m.d.comb += c.use_array.input().use(i).eq(self.get_insertion_value(c, m))
+                # Bringing a sector of a line in the cache is a hit of the line
+                for i in c.hit_detector.find_sector_fill():
+                    m.d.comb += c.use_array.input().use(i).eq(0)
+                # Read next lines from SRAMs even if CPU is not sending a new request
+                # since read is non-destructive.
+                c.use_array.read(c.addr.parse_set())
+
+
+    def get_insertion_value(self, c, m):
+        """ Return the RRPV of new lines. """
+
+        # SRRIP predicts a long re-reference interval for new lines so that
+        # lines which are never reused are evicted before the working set
+        return RRPV_MAX - 1
+
+
+    def get_reset_value(self, c):
+        """ Return the reset value for use array lines. """
+
+        # All ways are predicted to be re-referenced in the distant future
+        return (1 << (RRPV_SIZE * c.num_ways)) - 1
\ No newline at end of file
@@ -48,7 +48,7 @@ class state_machine(logic_base):
             # the last data line. This may cause a simulation mismatch.
             # This is the behavior that we probably want, so fix sim_cache
             # instead.
-            with m.If((~c.tag_array.output().dirty(c.way) | ~c.dram.stall()) & (c.way == c.num_ways - 1) & (c.set == c.num_rows - 1)):
+            with m.If(self.flush_way_done(c) & (c.way == c.num_ways - 1) & (c.set == c.num_rows - 1)):
                 m.d.comb += c.state.eq(state.IDLE)
 
 
@@ -73,14 +73,22 @@ class state_machine(logic_base):
         #   WAIT_WRITE  if current request is dirty miss and DRAM is available
         #   READ        if current request is clean miss and DRAM is busy
         #   WAIT_READ   if current request is clean miss and DRAM is available
+        # Write misses which aren't allocated switch to WRITE if DRAM is busy.
+        # Otherwise, they are completed like hits.
+        # Sector misses switch to READ or WAIT_READ like clean misses.
         with m.Case(state.COMPARE):
             for is_dirty, _ in c.hit_detector.find_miss():
                 # Assuming that current request is miss, check if it is dirty miss
                 if is_dirty:
-                    with m.If(c.dram.stall()):
-                        m.d.comb += c.state.eq(state.WRITE)
-                    with m.Else():
+                    # Dirty sectors are written back in the WAIT_WRITE state
+                    # if lines are sectored
+                    if c.num_sectors > 1:
                         m.d.comb += c.state.eq(state.WAIT_WRITE)
+                    else:
+                        with m.If(c.dram.stall()):
+                            m.d.comb += c.state.eq(state.WRITE)
+                        with m.Else():
+                            m.d.comb += c.state.eq(state.WAIT_WRITE)
                 # Else, assume that current request is clean miss
                 else:
                     with m.If(c.dram.stall()):
@@ -96,6 +104,20 @@ class state_machine(logic_base):
                     m.d.comb += c.state.eq(state.READ)
                 with m.Else():
                     m.d.comb += c.state.eq(state.WAIT_READ)
+            # Check if the line is in the cache without the sector of current
+            # request. Only the sector is read without evicting a line.
+            for _ in c.hit_detector.find_sector_miss():
+                with m.If(c.dram.stall()):
+                    m.d.comb += c.state.eq(state.READ)
+                with m.Else():
+                    m.d.comb += c.state.eq(state.WAIT_READ)
+            # Check if current request is a write miss which is forwarded to
+            # DRAM without refilling.
+            for _ in c.hit_detector.find_write_miss():
+                with m.If(c.dram.stall()):
+                    m.d.comb += c.state.eq(state.WRITE)
+                with m.Else():
+                    self.add_write_done(c, m)
             # Check if current request is hit.
             # Compare all ways' tags to find a hit. Since each way has a different
             # tag, only one of them can match at most.
@@ -157,6 +179,7 @@ class state_machine(logic_base):
         # In the WRITE state, state switches to:
         #   WRITE      if DRAM didn't respond yet
         #   WAIT_WRITE if DRAM responded
+        # Write misses which aren't allocated are completed if DRAM responded.
         with m.Case(state.WRITE):
             with m.If(~c.dram.stall()):
                 if OPTS.write_policy == wp.WRITE_THROUGH:
@@ -173,17 +196,23 @@ class state_machine(logic_base):
                             m.d.comb += c.state.eq(state.COMPARE)
                 else:
                     m.d.comb += c.state.eq(state.WAIT_WRITE)
+                for _ in c.hit_detector.find_write_miss():
+                    self.add_write_done(c, m)
 
 
     def add_wait_write(self, c, m):
         """ Add statements for the WAIT_WRITE state. """
 
         # In the WAIT_WRITE state, state switches to:
-        #   WAIT_WRITE if DRAM didn't respond yet
+        #   WAIT_WRITE if DRAM didn't respond yet or a dirty sector is left
         #   WAIT_READ  if DRAM responded
         with m.Case(state.WAIT_WRITE):
             with m.If(~c.dram.stall()):
                 m.d.comb += c.state.eq(state.WAIT_READ)
+                # Dirty sectors are written back one by one
+                if c.num_sectors > 1:
+                    with m.If(c.tag_array.output().dirty(c.way)):
+                        m.d.comb += c.state.eq(state.WAIT_WRITE)
 
 
     def add_read(self, c, m):
@@ -267,4 +296,18 @@ class state_machine(logic_base):
 
         # If rst is high, state switches to RESET.
         with m.If(c.rst):
-            m.d.comb += c.state.eq(state.RESET)
\ No newline at end of file
+            m.d.comb += c.state.eq(state.RESET)
+
+
+    def add_write_done(self, c, m):
+        """ Add statements to complete a write miss forwarded to DRAM. """
+
+        # State switches to:
+        #   IDLE    if CPU isn't sending a new request
+        #   COMPARE if CPU is sending a new request
+        # SRAMs aren't written for the write miss; therefore, there is no
+        # data hazard.
+        with m.If(c.csb):
+            m.d.comb += c.state.eq(state.IDLE)
+        with m.Else():
+            m.d.comb += c.state.eq(state.COMPARE)
\ No newline at end of file
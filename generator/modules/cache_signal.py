@@ -5,7 +5,7 @@
 # (acting for and on behalf of Oklahoma State University)
 # All rights reserved.
 #
-from amaranth import Signal
+from amaranth import Signal, Cat
 from amaranth import tracer
 
 
@@ -59,7 +59,28 @@ class cache_signal(Signal):
     def parse_set(self):
         """ Return set bits of an address signal. """
 
-        return self.bit_select(self.offset_size, self.set_size)
+        set_bits = self.bit_select(self.offset_size, self.set_size)
+        # Hashed set index is the XOR of set bits and folded tag bits
+        if cache_signal.has_set_hash:
+            return set_bits ^ fold_tag(self.parse_tag())
+        return set_bits
+
+
+    def line_address(self, tag, sector=None):
+        """
+        Return the DRAM address of a line from a set signal and its tag. If
+        lines are sectored, the address of the given sector is returned.
+        """
+
+        # Hashing the set index with the same tag again gives the set bits
+        if cache_signal.has_set_hash:
+            address = Cat(self ^ fold_tag(tag), tag)
+        else:
+            address = Cat(self, tag)
+        # Each row of DRAM is a sector of a line
+        if sector is not None:
+            return Cat(sector, address)
+        return address
 
 
     def parse_offset(self):
@@ -71,15 +92,33 @@ class cache_signal(Signal):
     def valid(self, way=0):
         """ Return valid bit of a tag signal. """
 
+        # Line is valid if any of its sectors is valid
+        if cache_signal.num_sectors > 1:
+            return self.valid_sectors(way).any()
         return self.bit_select(way * (cache_signal.tag_word_size) + (cache_signal.tag_word_size - 1), 1)
 
 
     def dirty(self, way=0):
         """ Return dirty bit of a tag signal. """
 
+        # Line is dirty if any of its sectors is dirty
+        if cache_signal.num_sectors > 1:
+            return self.dirty_sectors(way).any()
         return self.bit_select(way * (cache_signal.tag_word_size) + (cache_signal.tag_word_size - 2), 1)
 
 
+    def valid_sectors(self, way=0):
+        """ Return valid bits of all sectors of a tag signal. """
+
+        return self.bit_select(way * (cache_signal.tag_word_size) + (cache_signal.tag_word_size - cache_signal.num_sectors), cache_signal.num_sectors)
+
+
+    def dirty_sectors(self, way=0):
+        """ Return dirty bits of all sectors of a tag signal. """
+
+        return self.bit_select(way * (cache_signal.tag_word_size) + cache_signal.tag_size, cache_signal.num_sectors)
+
+
     def tag(self, way=0):
         """ Return tag bits of a tag signal. """
 
@@ -110,7 +149,23 @@ class cache_signal(Signal):
         return self.way(way)
 
 
+    def sector(self, sector, way=0):
+        """ Return a sector of a data signal. """
+
+        return self.word_select(way * cache_signal.num_sectors + sector, cache_signal.sector_size)
+
+
     def use(self, way=0):
         """ Return use bits of a use signal. """
 
-        return self.way(way)
\ No newline at end of file
+        return self.way(way)
+
+
+def fold_tag(tag):
+    """ Return the XOR of set-sized chunks of a tag value. """
+
+    set_size = cache_signal.set_size
+    folded = tag[:set_size]
+    for i in range(set_size, cache_signal.tag_size, set_size):
+        folded = folded ^ tag[i:i + set_size]
+    return folded
\ No newline at end of file
@@ -22,6 +22,9 @@ class dram_instance:
         # Write enable
         if not read_only:
             self.main_web = cache_signal(reset_less=True, reset=1)
+        # Write mask
+        if dram_instance.dram_num_masks:
+            self.main_wmask = cache_signal(dram_instance.dram_num_masks, reset_less=True)
         # Address
         self.main_addr = cache_signal(address_size, reset_less=True)
         # Data input
@@ -81,6 +84,23 @@ class dram_instance:
             self.m.d.comb += self.main_web.eq(0)
             self.m.d.comb += self.main_addr.eq(address)
             self.m.d.comb += self.main_din.eq(data)
+            # Write the whole line
+            if dram_instance.dram_num_masks:
+                self.m.d.comb += self.main_wmask.eq(2 ** dram_instance.dram_num_masks - 1)
+
+
+    def write_masked(self, address):
+        """
+        Send a new write request to DRAM without data. Only the parts of the line
+        added by write_input are written.
+        """
+
+        if not self.read_only:
+            self.m.d.comb += self.main_csb.eq(0)
+            self.m.d.comb += self.main_web.eq(0)
+            self.m.d.comb += self.main_addr.eq(address)
+            if dram_instance.dram_num_masks:
+                self.m.d.comb += self.main_wmask.eq(0)
 
 
     def write_input(self, offset, data, wmask):
@@ -95,6 +115,8 @@ class dram_instance:
                             self.m.d.comb += self.main_din.mask(mask_idx).eq(data.mask(mask_idx))
                         else:
                             self.m.d.comb += self.main_din.mask(mask_idx, word_idx).eq(data.mask(mask_idx))
+                        if dram_instance.dram_num_masks:
+                            self.m.d.comb += self.main_wmask[(word_idx or 0) * dram_instance.num_masks + mask_idx].eq(1)
 
                 # Write the whole word if write mask is not used
                 if not dram_instance.num_masks:
@@ -102,15 +124,32 @@ class dram_instance:
                         self.m.d.comb += self.main_din.eq(data)
                     else:
                         self.m.d.comb += self.main_din.word(word_idx).eq(data)
+                    if dram_instance.dram_num_masks:
+                        self.m.d.comb += self.main_wmask[word_idx or 0].eq(1)
+
+
+    def row_offset(self, offset):
+        """ Return the offset of a word in a DRAM row from its offset in the line. """
+
+        # Each row of DRAM is a sector of a line. Upper offset bits select the
+        # sector; therefore, only lower bits select the word in the row.
+        if dram_instance.num_sectors == 1:
+            return offset
+        if dram_instance.words_per_sector == 1:
+            return None
+        return offset[:-dram_instance.sector_index_size]
 
 
     def find_word(self, offset):
         """ Return all word indices corresponding to the given offset value. """
 
+        if offset is not None:
+            offset = self.row_offset(offset)
+
         if offset is None:
             yield None
         else:
             with self.m.Switch(offset):
-                for word_idx in range(dram_instance.words_per_line):
+                for word_idx in range(dram_instance.words_per_sector):
                     with self.m.Case(word_idx):
                         yield word_idx
\ No newline at end of file
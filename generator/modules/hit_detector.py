@@ -5,8 +5,9 @@
 # (acting for and on behalf of Oklahoma State University)
 # All rights reserved.
 #
-from amaranth import C
+from amaranth import C, Cat
 from policy import replacement_policy as rp
+from policy_plugin import policy_plugin
 from globals import OPTS
 
 
@@ -25,9 +26,18 @@ class hit_detector:
         """ Return Amaranth context manager instance to check hit. """
 
         # Request is hit if valid bit is set and address' tag matches the way's tag
+        # If lines are sectored, the sector of the request must be valid
+        if self.c.num_sectors > 1:
+            return self.m.If(self.c.tag_array.output().valid_sectors(way).bit_select(self.c.sector, 1) & (self.c.tag_array.output().tag(way) == self.c.tag))
         return self.m.If(self.c.tag_array.output().valid(way) & (self.c.tag_array.output().tag(way) == self.c.tag))
 
 
+    def check_line(self, way=0):
+        """ Return whether the way has the line of the request. """
+
+        return self.c.tag_array.output().valid(way) & (self.c.tag_array.output().tag(way) == self.c.tag)
+
+
     def check_clean_miss(self):
         """ Return Amaranth context manager instance to check clean miss. """
 
@@ -69,6 +79,67 @@ class hit_detector:
             return self.find_miss_lru()
         elif OPTS.replacement_policy == rp.RANDOM:
             return self.find_miss_random()
+        elif OPTS.replacement_policy.is_rrip() or isinstance(OPTS.replacement_policy, policy_plugin):
+            return self.find_miss_victim()
+
+
+    def find_write_miss(self):
+        """
+        Wrap the statements to check if current request is a write miss which
+        is forwarded to DRAM without refilling.
+        """
+
+        # Write misses are refilled if the cache allocates lines for them
+        if OPTS.write_allocate or OPTS.read_only:
+            return
+
+        hits = [self.c.tag_array.output().valid(i) & (self.c.tag_array.output().tag(i) == self.c.tag) for i in range(self.c.num_ways)]
+        with self.m.If(~self.c.web_reg & ~Cat(*hits).any()):
+            yield
+
+
+    def find_sector_miss(self):
+        """
+        Return the way which has the line of the request without its sector
+        and wrap the statements accordingly.
+        """
+
+        # Only the sector is brought into the way instead of evicting a line
+        if self.c.num_sectors == 1:
+            return
+
+        for i in range(self.c.num_ways):
+            with self.m.If(self.check_line(i)):
+                yield i
+
+
+    def find_sector_fill(self):
+        """
+        Return the way being refilled if it already has the line of the request
+        and wrap the statements accordingly.
+        """
+
+        if self.c.num_sectors == 1:
+            return
+
+        for i in self.c.tag_array.find_way(self.c.way):
+            with self.m.If(self.check_line(i)):
+                yield i
+
+
+    def find_line_fill(self):
+        """
+        Wrap the statements to check if a new line is brought into the way
+        being refilled.
+        """
+
+        # Every refill brings a new line if lines aren't sectored
+        if self.c.num_sectors == 1:
+            yield
+            return
+
+        with self.m.If(~self.check_line(self.c.way)):
+            yield
 
 
     def find_empty(self):
@@ -136,10 +207,27 @@ class hit_detector:
     def find_miss_random(self):
         """ Return the way missed for random caches. """
 
+        # Lower bits of the random counter or LFSR select the way
+        random_way = self.c.random[:self.c.way_size]
+
+        # Instruction caches don't have dirty bit
+        if self.c.has_dirty:
+            with self.check_dirty_miss(random_way):
+                with self.m.Switch(random_way):
+                    for i in range(self.c.num_ways):
+                        with self.m.Case(i):
+                            yield True, i
+        with self.check_clean_miss():
+            yield False, 0
+
+
+    def find_miss_victim(self):
+        """ Return the way missed for RRIP caches and plugins. """
+
         # Instruction caches don't have dirty bit
         if self.c.has_dirty:
-            with self.check_dirty_miss(self.c.random):
-                with self.m.Switch(self.c.random):
+            with self.check_dirty_miss(self.c.victim):
+                with self.m.Switch(self.c.victim):
                     for i in range(self.c.num_ways):
                         with self.m.Case(i):
                             yield True, i
@@ -8,6 +8,7 @@
 from amaranth import Instance
 from amaranth import tracer
 from cache_signal import cache_signal
+from sram_model import sram_model
 
 
 class sram_instance:
@@ -33,6 +34,8 @@ class sram_instance:
         self.read_csb = []
         self.read_addr = []
         self.read_dout = []
+        # Behavioral models of the arrays
+        self.models = []
 
         for i in range(num_arrays):
             # Write enable
@@ -48,6 +51,18 @@ class sram_instance:
             # Read data
             self.read_dout.append(cache_signal(real_row_size, name="{0}_read_dout{1}".format(short_name, i)))
 
+            # Add a behavioral model instead if the design is going to be
+            # simulated by Amaranth
+            if c.behavioral_srams:
+                self.models.append(sram_model(self.write_csb[i],
+                                              self.write_addr[i],
+                                              self.write_din[i],
+                                              self.read_csb[i],
+                                              self.read_addr[i],
+                                              self.read_dout[i]))
+                m.submodules += self.models[-1]
+                continue
+
             # Add this instance to the design module
             m.submodules += Instance(module_name,
                 ("i", "clk0", c.clk),
@@ -121,6 +136,23 @@ class sram_instance:
             self.write_local(address, data, way)
 
 
+    def write_sector(self, address, data, way, sector):
+        """
+        Send a new write request to SRAM which only changes a sector of the
+        line.
+        """
+
+        for way_idx in self.find_way(way):
+            idx = way_idx if self.num_arrays > 1 else 0
+            self.m.d.comb += self.write_csb[idx].eq(0)
+            self.m.d.comb += self.write_addr[idx].eq(address)
+            self.m.d.comb += self.write_din[idx].eq(self.read_dout[idx])
+            with self.m.Switch(sector):
+                for sector_idx in range(sram_instance.num_sectors):
+                    with self.m.Case(sector_idx):
+                        self.m.d.comb += self.write_din[idx].sector(sector_idx, 0 if self.num_arrays > 1 else way_idx).eq(data)
+
+
     def write_input_local(self, way, word, data, wmask):
         """ Add input data to write request to SRAM. """
 
@@ -0,0 +1,59 @@
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2021 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+from amaranth import Elaboratable, Module, Memory, Signal, Mux
+
+
+class sram_model(Elaboratable):
+    """
+    This is a behavioral model of OpenRAM SRAM modules with one write and one
+    read port. It is used instead of Instance so that the cache design can be
+    simulated by Amaranth.
+    """
+
+    def __init__(self, csb0, addr0, din0, csb1, addr1, dout1):
+
+        # Write port
+        self.csb0 = csb0
+        self.addr0 = addr0
+        self.din0 = din0
+        # Read port
+        self.csb1 = csb1
+        self.addr1 = addr1
+        self.dout1 = dout1
+
+        self.memory = Memory(width=len(din0), depth=2 ** len(addr0))
+
+
+    def elaborate(self, platform):
+        """ Elaborate the SRAM model. Called by Amaranth library. """
+
+        m = Module()
+
+        # OpenRAM SRAMs latch inputs at the posedge and read/write at the
+        # negedge of the clock. Therefore, output is ready in the next cycle
+        # just like synchronous read ports.
+        m.submodules.write_port = write_port = self.memory.write_port()
+        m.submodules.read_port = read_port = self.memory.read_port(transparent=False)
+
+        m.d.comb += write_port.en.eq(~self.csb0)
+        m.d.comb += write_port.addr.eq(self.addr0)
+        m.d.comb += write_port.data.eq(self.din0)
+        m.d.comb += read_port.en.eq(~self.csb1)
+        m.d.comb += read_port.addr.eq(self.addr1)
+
+        # Writes are performed before reads at the negedge. If the same
+        # address is written and read, the new data is forwarded to the output.
+        forward = Signal(reset_less=True)
+        forward_data = Signal(len(self.din0), reset_less=True)
+        with m.If(~self.csb1):
+            m.d.sync += forward.eq(~self.csb0 & (self.addr0 == self.addr1))
+            m.d.sync += forward_data.eq(self.din0)
+
+        m.d.comb += self.dout1.eq(Mux(forward, forward_data, read_port.data))
+
+        return m
\ No newline at end of file
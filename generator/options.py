@@ -33,13 +33,29 @@ class options(optparse.Values):
     num_ways = 1
     # Replacement policy of the cache
     replacement_policy = None
+    # Random replacement can use a counter incremented every cycle or an LFSR
+    # of lfsr_size bits. It can be "counter" or "lfsr".
+    random_generator = "counter"
+    lfsr_size = 16
+    # Modules which register replacement policy plugins. They are imported
+    # before the replacement policy is selected.
+    policy_plugins = []
 
     # Cache can be write-back or write-through
     write_policy = None
+    # Whether write misses bring their lines into the cache. If False, write
+    # misses are forwarded to DRAM without refilling.
+    write_allocate = True
     # Cache can be a data cache or an instruction cache
     read_only = False
     # Cache can return a word or a line of words
     return_type = "word"
+    # Lines can be split into sectors which have their own valid and dirty
+    # bits. Misses and write-backs only transfer the sectors they need.
+    num_sectors = 1
+    # Set index can be hashed by XOR-folding tag bits into set bits so that
+    # strided accesses are spread over sets. It can be None or "xor".
+    set_hash = None
 
     # Whether the cache has the flush signal
     has_flush = True
@@ -82,9 +98,21 @@ class options(optparse.Values):
 
     # Verify the design by simulating
     simulate = False
+    # Simulation tool ("icarus", "verilator", or "amaranth")
+    sim_tool = "icarus"
+    # Number of shards the simulation is split into
+    # Shards are simulated in parallel with different random test data
+    num_shards = 1
+    # Compare SRAM contents with sim_cache after each operation and stop at
+    # the first divergence (Amaranth simulation only)
+    lockstep = False
     # Verify the design by synthesizing
     synthesize = False
 
+    # SRAM models used for verification ("openram" or "behavioral")
+    # Behavioral SRAM modules are written by OpenCache so that OpenRAM isn't
+    # needed. OpenRAM should be used for sign-off.
+    sram_model = "openram"
     # OpenRAM needs to be run for verification. If the output of it has already
     # been generated, this can be set False for faster verification.
     run_openram = True
@@ -95,10 +123,38 @@ class options(optparse.Values):
     # Number of read/write operations in the simulation
     # Random data are written and read from random addresses
     sim_size = 64
+    # Stimulus of the simulation ("directed" or "random")
+    # Directed stimulus biases requests towards uncovered functional coverage
+    # bins while random stimulus writes to and reads from random addresses.
+    stimulus = "directed"
+    # Seed of the random test data and DRAM image
+    # If this is None, a random seed is picked so that every run tests
+    # different data. The seed is saved to replay failed simulations.
+    seed = None
+
+    # Dump waveforms during the simulation
+    dump_waves = True
+    # Waveform format ("vcd" or "fst")
+    dump_format = "vcd"
+    # Hierarchical names of the scopes to be dumped
+    # If this is None, the whole test bench is dumped
+    dump_scopes = None
+    # Number of hierarchy levels dumped under each scope (0 for all)
+    dump_depth = 0
+    # Time window in ns in which waveforms are dumped
+    # If dump_end is None, waveforms are dumped until the end of the simulation
+    dump_start = 0
+    dump_end = None
 
     # Number of threads for regression testing
     num_threads = 1
+    # Only run regression tests whose files have changed since they passed
+    test_impact = False
 
     verbose_level = 0
+    # Format of the log file ("text" or "json")
+    # JSON log files have a record with the level and the caller of each
+    # message per line.
+    log_format = "text"
 
     debug = False
\ No newline at end of file
@@ -8,6 +8,7 @@
 #
 import sys, os
 import unittest
+from random import Random
 sys.path.append(os.getenv("OPENCACHE_HOME"))
 from testutils import *
 import globals
@@ -45,23 +46,46 @@ class sim_cache_test(opencache_test):
         OPTS.replacement_policy = rp.RANDOM
         self.run_all_tests()
 
+        # Run tests for 4-way SRRIP
+        OPTS.num_ways = 4
+        OPTS.replacement_policy = rp.SRRIP
+        self.run_all_tests()
+
+        # Run tests for 4-way BRRIP
+        OPTS.num_ways = 4
+        OPTS.replacement_policy = rp.BRRIP
+        self.run_all_tests()
+
         globals.end_opencache()
 
 
     def run_all_tests(self):
 
         sc = setup_sim_cache()
+        self.check_true(check_address(sc))
         self.check_true(check_reset(sc))
         self.check_true(check_flush(sc))
         self.check_true(check_hit(sc))
         self.check_true(check_dirty(sc))
+        self.check_true(check_flush_stalls(sc))
+        self.check_true(check_write_through_hazard(sc))
         self.check_true(check_read_write(sc))
+        self.check_true(check_batch(sc))
+        self.check_true(check_coverage(sc))
+        self.check_true(check_opt(sc))
+        self.check_true(check_stats(sc))
+        self.check_true(check_set_hash(sc))
+        self.check_true(check_write_allocate(sc))
+        self.check_true(check_sectors(sc))
         if OPTS.replacement_policy == rp.FIFO:
             self.check_true(check_fifo(sc))
         if OPTS.replacement_policy == rp.LRU:
             self.check_true(check_lru(sc))
         if OPTS.replacement_policy == rp.RANDOM:
             self.check_true(check_random(sc))
+            self.check_true(check_lfsr(sc))
+        if OPTS.replacement_policy.is_rrip():
+            self.check_true(check_rrip(sc))
 
 
 def setup_sim_cache():
@@ -73,6 +97,19 @@ def setup_sim_cache():
     return sc
 
 
+def check_address(sc):
+    """ Check if merge_address() and decode() function properly. """
+
+    for tag, set, offset in [(0, 0, 0), (1, 2, 3), (2 ** sc.tag_size - 1, sc.num_rows - 1, sc.words_per_line - 1)]:
+        address = sc.decode(sc.merge_address(tag, set, offset))
+        if (address.tag, address.set, address.offset) != (tag, set, offset):
+            return False
+        if address.line != sc.line_address(tag, set):
+            return False
+
+    return True
+
+
 def check_reset(sc):
     """ Check if reset() functions properly. """
 
@@ -159,6 +196,44 @@ def check_dirty(sc):
     return True
 
 
+def check_flush_stalls(sc):
+    """ Check the stall cycles of a miss right after a flush. """
+
+    from verify.sim_dram import DRAM_DELAY
+
+    sc.reset()
+
+    # Make all ways of the last set dirty so that DRAM is still writing the
+    # last way when the flush is completed
+    for i in range(sc.num_ways):
+        sc.write(sc.merge_address(i, sc.num_rows - 1, 0), "1111", i)
+    sc.flush()
+
+    # DRAM also proceeds while the next request is received in the IDLE
+    # state; therefore, a clean miss waits DRAM_DELAY - 1 cycles for DRAM
+    return sc.stall_cycles(sc.merge_address(0, 0, 0), False) == 1 + (DRAM_DELAY - 1) + DRAM_DELAY
+
+
+def check_write_through_hazard(sc):
+    """ Check data hazard after a write hit of a write-through cache. """
+
+    from base.policy import write_policy as wp
+
+    with changed_options(write_policy=wp.WRITE_THROUGH):
+        wt_sc = setup_sim_cache()
+        wt_sc.reset()
+
+        # Setup 2 addresses in the same line
+        address = [wt_sc.merge_address(0, 0, i) for i in range(2)]
+        wt_sc.read(address[0])
+        wt_sc.write(address[0], "1111", 1)
+
+        # Write hit doesn't wait for DRAM if it is available; therefore, the
+        # next request doesn't enter WAIT_HAZARD unless the use array is
+        # updated after each read
+        return wt_sc.stall_cycles(address[1], False) == int(OPTS.replacement_policy.updated_after_read())
+
+
 def check_read_write(sc):
     """ Check if read() and write() function properly. """
 
@@ -180,6 +255,258 @@ def check_read_write(sc):
     return True
 
 
+def check_batch(sc):
+    """ Check if run_batch() matches requests sent one by one. """
+
+    # Setup operations to 5 addresses with different tags but in the same set
+    address = [sc.merge_address(i, 0, 0) for i in range(5)]
+    ops = ["reset"] + ["write"] * 5 + ["read"] * 5 + ["flush", "read"]
+    addresses = [None] + address + address + [None, address[0]]
+    masks = ["1111"] * len(ops)
+    data = [0] + [i + 1 for i in range(5)] + [0] * 7
+
+    dout, stalls = sc.run_batch(ops, addresses, masks, data)
+
+    sc.reset()
+    for i in range(1, len(ops)):
+        if ops[i] == "flush":
+            stall = sc.flush()
+        else:
+            stall = sc.stall_cycles(addresses[i], ops[i] == "write")
+        if stall != stalls[i]:
+            return False
+        if ops[i] == "write":
+            sc.write(addresses[i], masks[i], data[i])
+        if ops[i] == "read" and sc.read(addresses[i]) != dout[i]:
+            return False
+
+    return True
+
+
+def check_coverage(sc):
+    """ Check if directed test data cover all functional coverage bins. """
+
+    from verify.test_data import test_data
+    data = test_data(sc, make_config(), seed=0)
+    data.generate_data(512)
+
+    # Operations are simulated while they are consumed
+    for _ in data.operations:
+        pass
+
+    return not data.coverage.uncovered()
+
+
+def check_opt(sc):
+    """ Check the OPT oracle of sim_cache. """
+
+    sc.reset()
+    opt_sc = setup_sim_cache()
+
+    # Fill set 0 and request one more line in the same set
+    address = [sc.merge_address(i, 0, 0) for i in range(sc.num_ways + 1)]
+    trace = address + address[:-2]
+    opt_sc.use_opt(trace)
+    for i in range(sc.num_ways + 1):
+        opt_sc.read(trace[i])
+
+    # The only line which is never used again must be evicted
+    if opt_sc.find_way(address[-2]) is not None:
+        return False
+    for i in range(sc.num_ways - 1):
+        if opt_sc.find_way(address[i]) is None:
+            return False
+
+    # OPT cannot miss more than the replacement policy
+    rng = Random(0)
+    trace = [sc.merge_address(rng.randrange(8), rng.randrange(2), 0) for _ in range(256)]
+    opt_sc.reset()
+    opt_sc.use_opt(trace)
+    misses = 0
+    opt_misses = 0
+    for address in trace:
+        misses += sc.find_way(address) is None
+        opt_misses += opt_sc.find_way(address) is None
+        sc.read(address)
+        opt_sc.read(address)
+
+    return opt_misses <= misses
+
+
+def check_stats(sc):
+    """ Check the miss classification of sim_cache. """
+
+    from verify.miss_stats import miss_stats, HEATMAP_CHARS
+
+    # Request one more line than the number of ways in set 0 twice
+    sc.stats = miss_stats(make_config())
+    try:
+        sc.reset()
+        address = [sc.merge_address(i, 0, 0) for i in range(sc.num_ways + 1)]
+        for i in address + address:
+            sc.read(i)
+        counts = sc.stats.counts
+        set_conflicts = sc.stats.set_conflicts
+        # Set 0 is the first cell of the first line of the heatmap
+        heatmap_cell = sc.stats.heatmap()[0].split("|")[1][0]
+    finally:
+        sc.stats = None
+
+    # Lines fit in the fully-associative cache; therefore, misses of the
+    # second round are conflict misses
+    if counts["compulsory"] != sc.num_ways + 1 or counts["capacity"]:
+        return False
+    if counts["hit"] + counts["conflict"] != sc.num_ways + 1:
+        return False
+    if set_conflicts[0] != counts["conflict"] or sum(set_conflicts) != counts["conflict"]:
+        return False
+    if counts["conflict"] and heatmap_cell != HEATMAP_CHARS[-1]:
+        return False
+
+    # Request one more line than the size of the cache twice
+    sc.stats = miss_stats(make_config())
+    try:
+        sc.reset()
+        address = [i << sc.offset_size for i in range(sc.num_rows * sc.num_ways + 1)]
+        for i in address + address:
+            sc.read(i)
+        counts = sc.stats.counts
+    finally:
+        sc.stats = None
+
+    # Lines don't fit in the fully-associative cache; therefore, misses of the
+    # second round are capacity misses
+    if counts["compulsory"] != len(address) or counts["conflict"]:
+        return False
+    if counts["hit"] + counts["capacity"] != len(address):
+        return False
+
+    return True
+
+
+def check_set_hash(sc):
+    """ Check if hashed set index spreads strided addresses over sets. """
+
+    with changed_options(set_hash="xor"):
+        hash_sc = setup_sim_cache()
+
+    # Addresses with the same set bits but different tags
+    address = [i << hash_sc.tag_shift for i in range(hash_sc.num_ways + 1)]
+    if len(set(hash_sc.decode(x).set for x in address)) != len(address):
+        return False
+    if not check_address(hash_sc):
+        return False
+
+    # All lines must stay in the cache
+    for i in address:
+        hash_sc.read(i)
+    for i in address:
+        if hash_sc.find_way(i) is None:
+            return False
+
+    return True
+
+
+def check_write_allocate(sc):
+    """ Check if write misses are forwarded to DRAM when they aren't allocated. """
+
+    with changed_options(write_allocate=False):
+        return check_write_around(setup_sim_cache())
+
+
+def check_write_around(sc):
+    """ Check write misses of sim_cache which doesn't allocate lines for them. """
+
+    from verify.miss_stats import miss_stats
+    sc.stats = miss_stats(make_config())
+    sc.reset()
+
+    # Setup 2 addresses with different tags but in the same set
+    address = [sc.merge_address(i, 0, 0) for i in range(2)]
+    orig_data = sc.dram.read_line(sc.decode(address[0]).line)[0]
+
+    # Write miss doesn't stall if DRAM is available
+    if sc.stall_cycles(address[0], True):
+        return False
+    sc.write(address[0], "0011", 0xAABBCCDD)
+
+    # Line is not brought into the cache
+    if sc.find_way(address[0]) is not None:
+        return False
+
+    # Next write miss waits for DRAM to complete the previous write
+    if not sc.stall_cycles(address[1], True):
+        return False
+    sc.write(address[1], "1111", 1)
+
+    # Only the bytes over the write mask are written to DRAM
+    if sc.read(address[0]) != (orig_data & 0xFFFF0000) | 0xCCDD:
+        return False
+
+    # Write hits are still written to the cache
+    sc.write(address[0], "1111", 2)
+    if sc.read(address[0]) != 2 or sc.read(address[1]) != 1:
+        return False
+
+    # Lines of write misses aren't brought into the shadow cache; therefore,
+    # first reads of them are compulsory misses
+    counts = sc.stats.counts
+    sc.stats = None
+    if counts["compulsory"] != 4 or counts["capacity"] or counts["conflict"]:
+        return False
+
+    return True
+
+
+def check_sectors(sc):
+    """ Check if sectors of lines are brought and written back separately. """
+
+    with changed_options(num_sectors=2):
+        return check_sector_miss(setup_sim_cache())
+
+
+def check_sector_miss(sc):
+    """ Check sector misses of sim_cache whose lines are sectored. """
+
+    from verify.miss_stats import miss_stats
+    sc.stats = miss_stats(make_config())
+    sc.reset()
+
+    # Setup 2 addresses in different sectors of the same line
+    address = [sc.decode(sc.merge_address(0, 0, i * sc.words_per_sector)) for i in range(2)]
+    rows = [sc.dram_row(x.line, x.sector) for x in address]
+    orig_data = [sc.dram.read_line(x)[0] for x in rows]
+
+    # Only the sector of the request is brought into the cache
+    if sc.read(address[0]) != orig_data[0]:
+        return False
+    way = sc.find_way(address[0])
+    if sc.is_hit(address[1], way):
+        return False
+
+    # Other sector is brought into the same way
+    sc.write(address[0], "1111", 1)
+    if not sc.stall_cycles(address[1], False):
+        return False
+    if sc.read(address[1]) != orig_data[1] or sc.find_way(address[1]) != way:
+        return False
+
+    # Each sector is used for the first time
+    counts = sc.stats.counts
+    sc.stats = None
+    if counts["compulsory"] != 2 or counts["capacity"] or counts["conflict"]:
+        return False
+
+    # Only the dirty sector is written back
+    sc.flush()
+    if sc.dram.read_line(rows[0])[0] != 1 or sc.dram.read_line(rows[1])[0] != orig_data[1]:
+        return False
+    if sc.is_dirty(address[0]):
+        return False
+
+    return True
+
+
 def check_fifo(sc):
     """ Check FIFO replacement of sim_cache. """
 
@@ -255,6 +582,59 @@ def check_random(sc):
     return True
 
 
+def check_lfsr(sc):
+    """ Check if every way can be evicted with the narrowest allowed LFSR. """
+
+    # Address is widened so that a set has enough tags
+    with changed_options(random_generator="lfsr",
+                         lfsr_size=sc.way_size + 1,
+                         address_size=OPTS.address_size + 4):
+        return check_random_ways(setup_sim_cache())
+
+
+def check_random_ways(sc):
+    """ Check if random replacement of sim_cache evicts every way. """
+
+    sc.reset()
+
+    # Fill a set and keep replacing its ways with new tags
+    # Misses are followed by a varying number of hits so that the random way
+    # doesn't depend on a fixed number of cycles between misses
+    evicted = set()
+    for i in range(sc.num_ways * 16):
+        address = sc.merge_address(i, 0, 0)
+        for _ in range(i % 3 + 1):
+            sc.read(address)
+        if i >= sc.num_ways:
+            evicted.add(sc.find_way(address))
+
+    return evicted == set(range(sc.num_ways))
+
+
+def check_rrip(sc):
+    """ Check RRIP replacement of sim_cache. """
+
+    sc.reset()
+
+    # Setup 6 addresses with different tags but in the same set
+    address = [sc.merge_address(i, 0, 0) for i in range(6)]
+
+    # Reuse the first 2 addresses
+    for i in [0, 1, 0, 1]:
+        sc.read(address[i])
+
+    # Scan as many addresses as the ways
+    for i in range(2, 6):
+        sc.read(address[i])
+
+    # Reused addresses must not be evicted by the scan
+    for i in range(2):
+        if sc.find_way(address[i]) is None:
+            return False
+
+    return True
+
+
 # Run the test from the terminal
 if __name__ == "__main__":
     (OPTS, args) = globals.parse_args()
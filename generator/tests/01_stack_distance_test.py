@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2021 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+import sys, os
+import unittest
+from random import Random
+sys.path.append(os.getenv("OPENCACHE_HOME"))
+from testutils import *
+import globals
+from base.policy import replacement_policy as rp
+from globals import OPTS
+
+# Largest set size and number of ways compared with sim_cache
+MAX_SET_SIZE = 4
+MAX_WAYS = 8
+# Number of requests in the trace
+TRACE_SIZE = 2000
+
+
+class stack_distance_test(opencache_test):
+
+    def runTest(self):
+
+        OPENCACHE_HOME = os.getenv("OPENCACHE_HOME")
+        config_file = "{}/tests/configs/config.py".format(OPENCACHE_HOME)
+        globals.init_opencache(config_file)
+
+        from verify import sim_cache
+        from verify import stack_distance
+
+        # Random requests to a small range of lines so that all caches hit
+        rng = Random(0)
+        trace = [rng.randrange(2 ** (OPTS.address_size - 3)) for _ in range(TRACE_SIZE)]
+
+        # Analyze all caches in a single pass
+        # Reset in the middle of the trace empties all caches
+        sd = stack_distance(make_config(), MAX_SET_SIZE)
+        sd.run(trace[:TRACE_SIZE // 2])
+        sd.reset()
+        sd.run(trace[TRACE_SIZE // 2:])
+        curve = sd.miss_ratio_curve(MAX_WAYS)
+
+        # Number of misses of each LRU cache must match sim_cache
+        for (total_size, num_ways), miss_ratio in curve.items():
+            OPTS.num_ways = num_ways
+            OPTS.replacement_policy = rp.NONE if num_ways == 1 else rp.LRU
+            OPTS.total_size = total_size
+            sc = sim_cache(cache_config=make_config())
+            misses = 0
+            for i, address in enumerate(trace):
+                if i == TRACE_SIZE // 2:
+                    sc.reset()
+                if sc.find_way(address) is None:
+                    misses += 1
+                sc.read(address)
+            self.assertEqual(misses, sd.num_misses(sc.num_rows, num_ways))
+            self.assertEqual(miss_ratio, misses / TRACE_SIZE)
+
+        globals.end_opencache()
+
+
+# Run the test from the terminal
+if __name__ == "__main__":
+    (OPTS, args) = globals.parse_args()
+    del sys.argv[1:]
+    header(__file__)
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2021 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+import sys, os
+import unittest
+sys.path.append(os.getenv("OPENCACHE_HOME"))
+from testutils import *
+import globals
+from base.policy import replacement_policy as rp
+from globals import OPTS
+
+
+class amaranth_sim_test(opencache_test):
+
+    def runTest(self):
+
+        OPENCACHE_HOME = os.getenv("OPENCACHE_HOME")
+        config_file = "{}/tests/configs/config.py".format(OPENCACHE_HOME)
+        globals.init_opencache(config_file)
+
+        OPTS.write_size = 8
+        OPTS.simulate = True
+        OPTS.sim_tool = "amaranth"
+        # Check SRAM contents after each operation as well
+        OPTS.lockstep = True
+
+        # Run tests for direct-mapped
+        OPTS.num_ways = 1
+        OPTS.replacement_policy = rp.NONE
+        self.check_verification(make_config(), OPTS.output_name)
+
+        # Run tests for 4-way FIFO
+        OPTS.num_ways = 4
+        OPTS.replacement_policy = rp.FIFO
+        self.check_verification(make_config(), OPTS.output_name)
+
+        # Run tests for 4-way LRU
+        OPTS.num_ways = 4
+        OPTS.replacement_policy = rp.LRU
+        self.check_verification(make_config(), OPTS.output_name)
+
+        # Run tests for 4-way random
+        OPTS.num_ways = 4
+        OPTS.replacement_policy = rp.RANDOM
+        self.check_verification(make_config(), OPTS.output_name)
+
+        # Run tests for 4-way SRRIP
+        OPTS.num_ways = 4
+        OPTS.replacement_policy = rp.SRRIP
+        self.check_verification(make_config(), OPTS.output_name)
+
+        # Run tests for 4-way BRRIP
+        OPTS.num_ways = 4
+        OPTS.replacement_policy = rp.BRRIP
+        self.check_verification(make_config(), OPTS.output_name)
+
+        # Run tests for 4-way random with LFSR
+        OPTS.num_ways = 4
+        OPTS.replacement_policy = rp.RANDOM
+        with changed_options(random_generator="lfsr"):
+            self.check_verification(make_config(), OPTS.output_name)
+
+        # Run tests for 4-way LRU with hashed set index
+        OPTS.num_ways = 4
+        OPTS.replacement_policy = rp.LRU
+        with changed_options(set_hash="xor"):
+            self.check_verification(make_config(), OPTS.output_name)
+
+        # Run tests for 4-way LRU without write allocation
+        OPTS.num_ways = 4
+        OPTS.replacement_policy = rp.LRU
+        with changed_options(write_allocate=False):
+            self.check_verification(make_config(), OPTS.output_name)
+
+        # Run tests for 4-way LRU with sectored lines
+        OPTS.num_ways = 4
+        OPTS.replacement_policy = rp.LRU
+        with changed_options(num_sectors=2):
+            self.check_verification(make_config(), OPTS.output_name)
+
+        # Run tests for 4-way LRU in shards
+        OPTS.num_ways = 4
+        OPTS.replacement_policy = rp.LRU
+        OPTS.num_shards = 2
+        self.check_verification(make_config(), OPTS.output_name)
+
+        globals.end_opencache()
+
+
+# Run the test from the terminal
+if __name__ == "__main__":
+    (OPTS, args) = globals.parse_args()
+    del sys.argv[1:]
+    header(__file__)
+    unittest.main()
\ No newline at end of file
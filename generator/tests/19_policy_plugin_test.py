@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2021 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+import sys, os
+import unittest
+sys.path.append(os.getenv("OPENCACHE_HOME"))
+from testutils import *
+import globals
+from globals import OPTS
+
+
+class policy_plugin_test(opencache_test):
+
+    def runTest(self):
+
+        OPENCACHE_HOME = os.getenv("OPENCACHE_HOME")
+        config_file = "{}/tests/configs/config.py".format(OPENCACHE_HOME)
+        # Plugin of the NRU policy is imported from the configs directory
+        OPTS.policy_plugins = ["nru_policy"]
+        OPTS.replacement_policy = "nru"
+        globals.init_opencache(config_file)
+
+        OPTS.write_size = 8
+        OPTS.num_ways = 4
+
+        self.check_true(check_nru())
+
+        # Check SRAM contents of the cache design after each operation
+        OPTS.simulate = True
+        OPTS.sim_tool = "amaranth"
+        OPTS.lockstep = True
+        self.check_verification(make_config(), OPTS.output_name)
+
+        globals.end_opencache()
+
+
+def check_nru():
+    """ Check NRU replacement of sim_cache. """
+
+    from verify import sim_cache
+    sc = sim_cache(cache_config=make_config())
+    sc.reset()
+
+    # Setup 6 addresses with different tags but in the same set
+    address = [sc.merge_address(i, 0, 0) for i in range(6)]
+
+    # Fill all ways. Only the last filled way is recently used.
+    for i in range(4):
+        sc.read(address[i])
+    sc.read(address[2])
+
+    # address[0] and address[1] must be evicted in order
+    sc.read(address[4])
+    if sc.find_way(address[0]) is not None or sc.find_way(address[1]) is None:
+        return False
+    sc.read(address[5])
+    if sc.find_way(address[1]) is not None:
+        return False
+
+    return all(sc.find_way(address[i]) is not None for i in [2, 3, 4, 5])
+
+
+# Run the test from the terminal
+if __name__ == "__main__":
+    (OPTS, args) = globals.parse_args()
+    del sys.argv[1:]
+    header(__file__)
+    unittest.main()
\ No newline at end of file
@@ -5,4 +5,7 @@ words_per_line = 4
 address_size = 11
 
 output_path = "outputs/unit_test/"
-verbose_level = 0
\ No newline at end of file
+verbose_level = 0
+
+# Regression runs don't need waveforms
+dump_waves = False
\ No newline at end of file
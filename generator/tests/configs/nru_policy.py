@@ -0,0 +1,89 @@
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2021 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+"""
+Example replacement policy plugin used by the unit tests.
+"""
+from amaranth import C
+from policy_plugin import policy_plugin, register_policy
+
+
+class nru_policy(policy_plugin):
+    """
+    This is the Not Recently Used (NRU) replacement policy.
+    Each way has a bit in the use line which is set when the way is accessed.
+    The last empty way or the last way whose bit is clear is evicted. When all
+    bits would be set, only the accessed way's bit is kept.
+    """
+
+    name = "nru"
+
+
+    def long_name(self):
+        """ Get the long name of the replacement policy. """
+
+        return "Not Recently Used"
+
+
+    def add_victim(self, c, m):
+        """ Add statements to select the way to evict. """
+
+        for i in range(c.num_ways):
+            with m.If(~c.use_array.output()[i]):
+                m.d.comb += c.victim.eq(i)
+        for i in range(c.num_ways):
+            with m.If(~c.tag_array.output().valid(i)):
+                m.d.comb += c.victim.eq(i)
+
+
+    def add_hit(self, c, m, way):
+        """ Add statements to update the use line when the way is hit. """
+
+        self.add_access(c, m, C(1 << way, c.num_ways))
+
+
+    def add_fill(self, c, m):
+        """ Add statements to update the use line when c.way is filled. """
+
+        self.add_access(c, m, C(1, c.num_ways) << c.way)
+
+
+    def add_access(self, c, m, way_bit):
+        """ Add statements to set the bit of an accessed way. """
+
+        used = c.use_array.output() | way_bit
+        with m.If(used == (1 << c.num_ways) - 1):
+            m.d.comb += c.use_array.input().eq(way_bit)
+        with m.Else():
+            m.d.comb += c.use_array.input().eq(used)
+
+
+    def way_to_evict(self, sc, set_decimal):
+        """ Return the way to evict in sim_cache. """
+
+        use_line = sc.sram.read_use(set_decimal)
+        valid_line = sc.sram.read_valid_line(set_decimal)
+        way = None
+        for i in range(sc.num_ways):
+            if not (use_line >> i) & 1:
+                way = i
+        for i in range(sc.num_ways):
+            if not valid_line[i]:
+                way = i
+        return way
+
+
+    def update(self, sc, set_decimal, way, is_hit):
+        """ Update the use line of sim_cache after a hit or a fill. """
+
+        used = sc.sram.read_use(set_decimal) | (1 << way)
+        if used == (1 << sc.num_ways) - 1:
+            used = 1 << way
+        sc.sram.write_use(set_decimal, used)
+
+
+register_policy(nru_policy())
\ No newline at end of file
@@ -6,13 +6,16 @@
 # (acting for and on behalf of Oklahoma State University)
 # All rights reserved.
 #
-import sys, os, re
+import sys, os, re, json, time, hashlib, copy
 import unittest
+import multiprocessing
+from functools import partial
 from subunit import ProtocolTestCase, TestProtocolClient
-from testtools import ConcurrentTestSuite
+from testtools import ConcurrentTestSuite, MultiTestResult, TestResult, iterate_tests
 sys.path.append(os.getenv("OPENCACHE_HOME"))
 from testutils import *
 import globals
+import debug
 
 (OPTS, args) = globals.parse_args()
 del sys.argv[1:]
@@ -29,24 +32,185 @@ all_tests.sort()
 
 num_threads = OPTS.num_threads
 
+# Durations of tests in previous runs are used to run the longest tests first
+history_file = os.path.join(sys.path[0], "regress_history.json")
+# Hashes of the files each test used in its last successful run are used to
+# skip tests which aren't affected by changes
+impact_file = os.path.join(sys.path[0], "regress_impact.json")
+record_lock = multiprocessing.Lock()
 
-def partition_unit_tests(suite, num_threads):
-    partitions = [list() for _ in range(num_threads)]
-    for index, test in enumerate(suite):
-        partitions[index % num_threads].append(test)
-    return partitions
+# Only files of OpenCache are tracked for test impact
+home_path = os.path.realpath(os.getenv("OPENCACHE_HOME"))
+file_hashes = {}
+# Options of regress.py which change what the tests simulate are tracked as well
+impact_options = ["sim_tool", "sim_size", "stimulus", "seed", "num_shards", "lockstep", "sram_model"]
+
+
+def load_records(file_name):
+    """ Return the records of tests in previous runs. """
+
+    try:
+        with open(file_name, "r") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_records(file_name, records):
+    """ Merge the records of tests with the ones in the file. """
+
+    # Workers save their own records
+    with record_lock:
+        all_records = load_records(file_name)
+        all_records.update(records)
+        with open(file_name, "w") as file:
+            json.dump(all_records, file, indent=4, sort_keys=True)
+
+
+def hash_file(path):
+    """ Return the hash of a file relative to the generator directory. """
+
+    if path not in file_hashes:
+        try:
+            with open(os.path.join(home_path, path), "rb") as file:
+                file_hashes[path] = hashlib.sha1(file.read()).hexdigest()
+        except OSError:
+            file_hashes[path] = None
+    return file_hashes[path]
+
+
+def hash_options():
+    """ Return the hash of the options of regress.py which are tracked. """
+
+    values = {x: getattr(OPTS, x, None) for x in impact_options}
+    return hashlib.sha1(json.dumps(values, sort_keys=True).encode()).hexdigest()
+
+
+def is_affected(test, impact):
+    """
+    Return whether the options or any file used by the test have changed since
+    it passed.
+    """
+
+    # Run the test if it has never passed with these options
+    record = impact.get(test.id())
+    if record is None or record.get("options") != options_hash:
+        return True
+
+    return any(hash_file(path) != digest for path, digest in record["files"].items())
+
+
+def is_data_module(module):
+    """ Return whether the module doesn't define any function. """
+
+    for value in vars(module).values():
+        values = vars(value).values() if isinstance(value, type) else [value]
+        for x in values:
+            code = getattr(x, "__code__", None)
+            if code is not None and code.co_filename == module.__file__:
+                return False
+    return True
+
+
+def find_used_files(executed_files):
+    """ Return the files of OpenCache used by a test relative to the generator directory. """
+
+    # Module-level code runs only once in a process, so modules which are only
+    # used for their data (options, configs, enums) are added as well
+    files = set(executed_files)
+    for module in list(sys.modules.values()):
+        if getattr(module, "__file__", None) and is_data_module(module):
+            files.add(module.__file__)
+
+    used_files = []
+    for file in files:
+        path = os.path.relpath(os.path.realpath(file), home_path)
+        if not path.startswith(os.pardir) and os.path.isfile(os.path.join(home_path, path)):
+            used_files.append(path)
+    return used_files
+
+
+def schedule_unit_tests(suite):
+    """ Return the list of tests from the longest to the shortest expected. """
+
+    tests = list(iterate_tests(suite))
+
+    if OPTS.test_impact:
+        impact = load_records(impact_file)
+        selected = [x for x in tests if is_affected(x, impact)]
+        debug.print_raw("Skipping {0} of {1} tests which aren't affected by changes.".format(len(tests) - len(selected), len(tests)))
+        tests = selected
+
+    history = load_records(history_file)
+    # Tests without a history might be the longest, so they run first
+    return sorted(tests,
+                  key=lambda test: history.get(test.id(), float("inf")),
+                  reverse=True)
+
+
+def warm_up():
+    """
+    Import the modules used by most tests before forking workers so that
+    workers don't import them for each test.
+    """
+
+    globals.setup_paths()
+    # The verify package isn't imported since it checks the executables
+    # according to the options of each test
+    import amaranth.sim
+    from cache import cache
+
+
+def run_unit_tests(tests, next_index, result):
+    """
+    Run tests taken from the shared work queue until it is empty and save
+    their durations and the files they used.
+    """
+
+    # Each test starts with the options given to regress.py so that options
+    # changed by a test don't leak into the next tests of the worker
+    options = copy.deepcopy(OPTS.__dict__)
+
+    durations = {}
+    impact = {}
+    while True:
+        # Take the next test so that idle workers get the remaining tests
+        with next_index.get_lock():
+            index = next_index.value
+            next_index.value += 1
+        if index >= len(tests):
+            break
+        test = tests[index]
+        OPTS.__dict__ = copy.deepcopy(options)
+        start_time = time.time()
+        if OPTS.test_impact:
+            # Record the source files of all executed functions
+            executed_files = set()
+            sys.settrace(lambda frame, event, arg: executed_files.add(frame.f_code.co_filename))
+            test_result = TestResult()
+            test.run(MultiTestResult(result, test_result))
+            sys.settrace(None)
+            if test_result.wasSuccessful():
+                impact[test.id()] = {
+                    "options": options_hash,
+                    "files": {x: hash_file(x) for x in find_used_files(executed_files)},
+                }
+        else:
+            test.run(result)
+        durations[test.id()] = time.time() - start_time
+    save_records(history_file, durations)
+    if impact:
+        save_records(impact_file, impact)
 
 
 def fork_tests(num_threads):
     results = []
-    test_partitions = partition_unit_tests(suite, num_threads)
-    suite._tests[:] = []
+    next_index = multiprocessing.Value("i", 0)
 
 
     def do_fork(suite):
-        for test_partition in test_partitions:
-            test_suite = unittest.TestSuite(test_partition)
-            test_partition[:] = []
+        tests = schedule_unit_tests(suite)
+        for _ in range(min(num_threads, len(tests))):
             # Child-parent file descriptors
             c2pread, c2pwrite = os.pipe()
             pid = os.fork()
@@ -58,7 +222,7 @@ def fork_tests(num_threads):
                     os.close(c2pread)
                     sys.stdin.close()
                     test_suite_result = TestProtocolClient(stream)
-                    test_suite.run(test_suite_result)
+                    run_unit_tests(tests, next_index, test_suite_result)
                 except EBADF:
                     try:
                         stream.write(traceback.format_exc())
@@ -88,8 +252,13 @@ suite.addTests(map(load, modules))
 
 test_runner = unittest.TextTestRunner(verbosity=2, stream=sys.stderr)
 
+options_hash = hash_options()
+warm_up()
+
 if num_threads == 1:
-    final_suite = suite
+    final_suite = partial(run_unit_tests,
+                          schedule_unit_tests(suite),
+                          multiprocessing.Value("i", 0))
 else:
     final_suite = ConcurrentTestSuite(suite, fork_tests(num_threads))
 
@@ -8,6 +8,7 @@
 import sys, os, shutil
 import unittest
 import time
+from contextlib import contextmanager
 sys.path.append(os.getenv("OPENCACHE_HOME"))
 from globals import OPTS
 import debug
@@ -38,6 +39,7 @@ class opencache_test(unittest.TestCase):
         zip_file = "{0}../{1}_{2}".format(OPTS.output_path, base_filename, os.getpid())
 
         debug.info(0, "Archiving failed test's files to {}".format(zip_file))
+        debug.close_log()
         shutil.make_archive(zip_file, "zip", OPTS.output_path)
 
         super().fail(msg)
@@ -49,6 +51,7 @@ class opencache_test(unittest.TestCase):
         # Remove everything under the current test case's directory
         # If test fails, files will be deleted after archived
         if not OPTS.keep_temp:
+            debug.close_log()
             shutil.rmtree(OPTS.output_path)
 
 
@@ -84,6 +87,20 @@ def make_config():
                         num_ways=OPTS.num_ways)
 
 
+@contextmanager
+def changed_options(**values):
+    """ Change options in a block and restore their previous values after it. """
+
+    old_values = {x: getattr(OPTS, x) for x in values}
+    for x in values:
+        setattr(OPTS, x, values[x])
+    try:
+        yield
+    finally:
+        for x in old_values:
+            setattr(OPTS, x, old_values[x])
+
+
 def header(filename):
     """ Print the banner for unit test. """
 
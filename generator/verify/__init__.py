@@ -7,19 +7,26 @@
 #
 import debug
 from .sim_cache import sim_cache
+from .stack_distance import stack_distance
 from .verification import verification
 from globals import OPTS
 from globals import find_exe
 
 
 # Check FuseSoC executable
-if find_exe("fusesoc") is None:
-    debug.error("FuseSoC isn't installed. Disable verification to ignore.", -1)
+# Amaranth simulation doesn't need any EDA tool
+if OPTS.synthesize or (OPTS.simulate and OPTS.sim_tool != "amaranth"):
+    if find_exe("fusesoc") is None:
+        debug.error("FuseSoC isn't installed. Disable verification to ignore.", -1)
 
 # Check simulation tool executable
 if OPTS.simulate:
-    if find_exe("iverilog") is None:
-        debug.error("Icarus isn't installed. Disable simulation to ignore.", -1)
+    if OPTS.sim_tool == "verilator":
+        if find_exe("verilator") is None:
+            debug.error("Verilator isn't installed. Disable simulation to ignore.", -1)
+    elif OPTS.sim_tool == "icarus":
+        if find_exe("iverilog") is None:
+            debug.error("Icarus isn't installed. Disable simulation to ignore.", -1)
 
 # Check synthesis tool executable
 if OPTS.synthesize:
@@ -0,0 +1,339 @@
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2021 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+from collections import deque
+from amaranth import Elaboratable, Module, Memory, Signal, ClockDomain, Value, Repl
+from amaranth.sim import Simulator, Settle
+from .sim_dram import DRAM_DELAY
+from state import state
+from policy import replacement_policy as rp
+from policy import RRPV_SIZE, RRPV_MAX
+import debug
+from globals import OPTS
+
+# Clock period of the simulation in seconds
+CLOCK_PERIOD = 10e-9
+# Number of cycles printed when the lockstep checker finds a divergence
+HISTORY_SIZE = 16
+
+
+class dram_model(Elaboratable):
+    """
+    This is a behavioral model of the DRAM module written by sim_dram.
+    """
+
+    def __init__(self, dram, sim_dram):
+
+        self.dram = dram
+
+        # Initial data is packed the same way as the DRAM memory file
+        init = []
+        for line in sim_dram.data_array:
+            data = 0
+            for i in range(len(line)):
+                data += line[i] << (i * sim_dram.word_size)
+            init.append(data)
+        self.memory = Memory(width=len(dram.main_dout), depth=len(init), init=init)
+
+
+    def elaborate(self, platform):
+        """ Elaborate the DRAM model. Called by Amaranth library. """
+
+        m = Module()
+
+        dram = self.dram
+        m.submodules.read_port = read_port = self.memory.read_port(transparent=False)
+        m.d.comb += read_port.en.eq(0)
+        m.d.comb += read_port.addr.eq(dram.main_addr)
+        m.d.comb += dram.main_dout.eq(read_port.data)
+        if not dram.read_only:
+            # Each part of the line over the write mask has its own write enable
+            num_masks = dram.dram_num_masks or 1
+            m.submodules.write_port = write_port = self.memory.write_port(granularity=len(dram.main_din) // num_masks)
+            m.d.comb += write_port.addr.eq(dram.main_addr)
+            m.d.comb += write_port.data.eq(dram.main_din)
+
+        stall_count = Signal(range(DRAM_DELAY + 2))
+
+        with m.If(dram.main_stall):
+            # Stall becomes low after a couple of cycles
+            with m.If(stall_count == DRAM_DELAY):
+                m.d.sync += dram.main_stall.eq(0)
+            m.d.sync += stall_count.eq(stall_count + 1)
+        with m.Elif(~dram.main_csb):
+            # When there is a request, DRAM immediately stalls
+            m.d.sync += dram.main_stall.eq(1)
+            m.d.sync += stall_count.eq(1)
+            m.d.comb += read_port.en.eq(1)
+            if not dram.read_only:
+                if num_masks > 1:
+                    m.d.comb += write_port.en.eq(Repl(~dram.main_web, num_masks) & dram.main_wmask)
+                else:
+                    m.d.comb += write_port.en.eq(~dram.main_web)
+
+        return m
+
+
+class amaranth_sim:
+    """
+    Class to simulate the cache design with the simulator of Amaranth library.
+    OpenRAM SRAMs and DRAM are replaced with behavioral models so that no EDA
+    tool is needed.
+
+    In lockstep mode, SRAM rows of the design are compared with the ones of
+    sim_cache after each operation and the simulation stops at the first
+    divergence with the history of the last cycles.
+    """
+
+    def __init__(self, cache_config, name, sim_cache):
+
+        cache_config.set_local_config(self)
+
+        # Import here to elaborate a new instance of the design
+        from cache import cache
+        self.c = cache(cache_config, name).c
+        self.c.behavioral_srams = True
+        self.c.add_io_signals()
+
+        self.m = Module()
+        self.m.domains.sync = self.domain = ClockDomain("sync")
+        self.m.submodules.cache = self.c
+        # DRAM model must be made before sim_cache changes the DRAM data
+        self.m.submodules.dram = dram_model(self.c.dram, sim_cache.dram)
+
+        # sim_cache streams the expected SRAM rows of each operation
+        self.sim_cache = sim_cache
+        if OPTS.lockstep:
+            sim_cache.events = deque()
+
+
+    def simulate(self, operations):
+        """ Simulate the operations and return the number of errors. """
+
+        self.operations = operations
+        self.error_count = 0
+        self.cycle = 0
+        self.history = deque(maxlen=HISTORY_SIZE)
+
+        sim = Simulator(self.m)
+        sim.add_clock(CLOCK_PERIOD)
+        sim.add_sync_process(self.run_tests)
+
+        if OPTS.dump_waves:
+            with sim.write_vcd(OPTS.temp_path + "waves.vcd"):
+                sim.run()
+        else:
+            sim.run()
+
+        return self.error_count
+
+
+    def run_tests(self):
+        """ Apply operations and check the outputs like the test bench. """
+
+        c = self.c
+
+        # Signals of the design are created while elaborating
+        if OPTS.lockstep:
+            self.find_write_ports()
+
+        yield c.csb.eq(1)
+        if not OPTS.read_only:
+            yield c.web.eq(1)
+
+        self.test = None
+        for test_count, (op, wmask, address, data, stall) in enumerate(self.operations):
+            if op == "reset":
+                yield self.domain.rst.eq(1)
+            elif op == "flush":
+                yield c.flush.eq(1)
+            else:
+                yield c.csb.eq(0)
+                if not OPTS.read_only:
+                    yield c.web.eq(op != "write")
+                if self.num_masks:
+                    yield c.wmask.eq(int(wmask, 2))
+                yield c.addr.eq(address)
+                if op == "write":
+                    yield c.din.eq(data)
+
+            # Wait for 1 cycle so that cache will receive the request
+            yield
+            if op == "reset":
+                yield self.domain.rst.eq(0)
+            elif op == "flush":
+                yield c.flush.eq(0)
+            yield from self.settle()
+
+            # Previous operation is completed at the last clock edge
+            if OPTS.lockstep and self.test:
+                yield from self.check_rows()
+            self.test = (test_count, op, address)
+
+            # Check for a number of stall cycles
+            for i in range(1, stall + 1):
+                if not (yield c.stall):
+                    self.report("Error at test #{0}! Cache stall #{1} is expected to be high but it is low.".format(test_count, i))
+                yield
+                yield from self.settle()
+
+            # Check read request after stalls
+            if op == "read":
+                dout = yield c.dout
+                if dout != data:
+                    self.report("Error at test #{0}! Expected: {1}, Received: {2}".format(test_count, data, dout))
+
+        # Wait for the last operation to complete
+        if OPTS.lockstep and self.test:
+            yield
+            yield from self.settle()
+            yield from self.check_rows()
+
+
+    def settle(self):
+        """ Settle the signals and record the current cycle in lockstep mode. """
+
+        yield Settle()
+        if OPTS.lockstep:
+            yield from self.record_cycle()
+
+
+    def find_write_ports(self):
+        """ Find the write ports of all SRAM arrays of the design. """
+
+        c = self.c
+
+        self.arrays = [c.tag_array, c.data_array]
+        if OPTS.replacement_policy.has_sram_array():
+            self.arrays.append(c.use_array)
+
+        self.write_ports = []
+        for array in self.arrays:
+            for i in range(array.num_arrays):
+                name = array.write_csb[i].name.replace("_write_csb", "")
+                self.write_ports.append((name, array.write_csb[i], array.write_addr[i], array.write_din[i]))
+
+
+    def record_cycle(self):
+        """ Record the state of the design and SRAM writes in this cycle. """
+
+        c = self.c
+
+        self.cycle += 1
+
+        writes = []
+        for name, csb, addr, din in self.write_ports:
+            if not (yield csb):
+                writes.append("{0}[{1}] <= {2:#x}".format(name, (yield addr), (yield din)))
+
+        way = (yield c.way) if isinstance(c.way, Value) else c.way
+        self.history.append((self.cycle,
+                             self.test[0] if self.test else None,
+                             state((yield c.state)).name,
+                             (yield c.set),
+                             way,
+                             (yield c.stall),
+                             writes))
+
+
+    def read_row(self, set):
+        """ Return the valid, dirty, tag, data, and use values of a set. """
+
+        c = self.c
+
+        tag_line = yield c.tag_array.models[0].memory[set]
+        valid = []
+        dirty = []
+        tag = []
+        # Each sector has a valid bit and a dirty bit
+        sector_mask = (1 << self.num_sectors) - 1
+        for way in range(self.num_ways):
+            tag_word = tag_line >> (way * self.tag_word_size)
+            valid.append((tag_word >> (self.tag_word_size - self.num_sectors)) & sector_mask)
+            dirty.append((tag_word >> self.tag_size) & sector_mask if self.has_dirty else 0)
+            tag.append(tag_word & ((1 << self.tag_size) - 1))
+
+        data = []
+        for way in range(self.num_ways):
+            data_line = yield c.data_array.models[way].memory[set]
+            data.append([(data_line >> (i * self.word_size)) & ((1 << self.word_size) - 1) for i in range(self.words_per_line)])
+
+        use = None
+        if OPTS.replacement_policy.has_sram_array():
+            use_line = yield c.use_array.models[0].memory[set]
+            if OPTS.replacement_policy == rp.LRU:
+                use = [(use_line >> (way * self.way_size)) & ((1 << self.way_size) - 1) for way in range(self.num_ways)]
+            elif OPTS.replacement_policy.is_rrip():
+                use = [(use_line >> (way * RRPV_SIZE)) & RRPV_MAX for way in range(self.num_ways)]
+            else:
+                use = use_line
+
+        return (valid, dirty, tag, data, use)
+
+
+    def check_rows(self):
+        """ Compare the SRAM rows changed by the last operation with sim_cache. """
+
+        for set, expected in self.sim_cache.events.popleft():
+            actual = yield from self.read_row(set)
+
+            # Contents of invalid ways don't matter
+            mismatch = expected[0] != actual[0] or expected[4] != actual[4]
+            for way in range(self.num_ways):
+                if expected[0][way] and any(x[way] != y[way] for x, y in zip(expected[1:4], actual[1:4])):
+                    mismatch = True
+
+            if mismatch:
+                test_count, op, address = self.test
+                lines = []
+                for way in range(self.num_ways):
+                    lines.append("  way {0} expected: {1}".format(way, self.format_way(expected, way)))
+                    lines.append("  way {0} received: {1}".format(way, self.format_way(actual, way)))
+                if expected[4] is not None:
+                    lines.append("  use expected: {0}, received: {1}".format(expected[4], actual[4]))
+                self.diverge("Error at test #{0} ({1} {2:#x})! SRAM rows of set {3} don't match.".format(test_count, op, address, set), lines)
+
+
+    def format_way(self, row, way):
+        """ Return the string of a way in an SRAM row. """
+
+        valid, dirty, tag, data, _ = row
+        return "valid={0} dirty={1} tag={2:#x} data=[{3}]".format(valid[way],
+                                                                   dirty[way],
+                                                                   tag[way],
+                                                                   ", ".join("{:#x}".format(x) for x in data[way]))
+
+
+    def diverge(self, message, lines=()):
+        """ Stop the simulation and print the context of the divergence. """
+
+        debug.print_raw(message)
+        for line in lines:
+            debug.print_raw(line)
+
+        debug.print_raw("Last {} cycles:".format(len(self.history)))
+        for cycle, test_count, state_name, set, way, stall, writes in self.history:
+            debug.print_raw("  cycle {0:>6} test #{1}: {2:<12} set={3} way={4} stall={5} {6}".format(cycle,
+                                                                                              test_count,
+                                                                                              state_name,
+                                                                                              set,
+                                                                                              way,
+                                                                                              stall,
+                                                                                              ", ".join(writes)))
+
+        debug.error("Lockstep simulation diverged at cycle {}.".format(self.cycle), -1)
+
+
+    def report(self, message):
+        """ Report an error of the simulation. """
+
+        # Lockstep simulation stops at the first error
+        if OPTS.lockstep:
+            self.diverge(message)
+
+        debug.info(1, message)
+        self.error_count += 1
\ No newline at end of file
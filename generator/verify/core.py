@@ -36,14 +36,16 @@ class core:
             file.write("          is_include_file: true\n")
             file.write("          copyto: dram_mem.hex\n")
             file.write("          file_type: user\n")
+            file.write("      - test_data.hex:\n")
+            file.write("          is_include_file: true\n")
+            file.write("          copyto: test_data.hex\n")
+            file.write("          file_type: user\n")
             if OPTS.replacement_policy.has_sram_array():
                 file.write("      - {}.v\n".format(OPTS.use_array_name))
             file.write("      - {}.v\n".format(OPTS.tag_array_name))
             file.write("      - {}.v\n".format(OPTS.data_array_name))
             file.write("      - {}.v\n".format(OPTS.output_name))
             file.write("      - test_bench.v\n")
-            file.write("      - test_data.v:\n")
-            file.write("          is_include_file: true\n")
             file.write("    file_type: verilogSource\n\n")
 
             file.write("  syn_files:\n")
@@ -63,12 +65,20 @@ class core:
 
             file.write("  sim:\n")
             file.write("    description: Simulate the cache design\n")
-            file.write("    default_tool: icarus\n")
+            file.write("    default_tool: {}\n".format(OPTS.sim_tool))
             file.write("    filesets:\n")
             file.write("      - sim_files\n")
             file.write("    tools:\n")
             file.write("      icarus:\n")
             file.write("        timescale: 1ns/1ps\n")
+            file.write("      verilator:\n")
+            file.write("        mode: binary\n")
+            file.write("        verilator_options:\n")
+            file.write("          - --timing\n")
+            file.write("          - --timescale 1ns/1ps\n")
+            file.write("          - -Wno-fatal\n")
+            if OPTS.dump_waves:
+                file.write("          - {}\n".format("--trace-fst" if OPTS.dump_format == "fst" else "--trace"))
             file.write("    toplevel: test_bench\n\n")
 
             file.write("  syn:\n")
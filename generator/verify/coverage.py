@@ -0,0 +1,96 @@
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2021 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+from policy import write_policy as wp
+from globals import OPTS
+
+
+class coverage:
+    """
+    This is the functional coverage model of the cache design.
+    Bins are sampled by sim_cache while it simulates requests. Each bin
+    corresponds to a path through the internal states of the cache:
+    - (op, "hit", way): COMPARE
+    - (op, "clean_miss", way): READ and WAIT_READ
+    - (op, "dirty_miss", way): WRITE, WAIT_WRITE, READ, and WAIT_READ
+    - (op, "sector_miss", way): READ and WAIT_READ without evicting the line
+    - ("write", "write_around"): COMPARE and WRITE without refilling
+    - (op, "hazard"): WAIT_HAZARD
+    - (op, "dram_busy"): waiting for DRAM to complete the previous request
+    - ("flush", "hazard"): FLUSH_HAZARD
+    """
+
+    def __init__(self, cache_config):
+
+        cache_config.set_local_config(self)
+
+        self.bins = {x: 0 for x in self.make_bins()}
+
+
+    def make_bins(self):
+        """ Yield all bins which can be covered by the cache design. """
+
+        ops = ["read"] if OPTS.read_only else ["read", "write"]
+        for op in ops:
+            for way in range(self.num_ways):
+                yield (op, "hit", way)
+                # Write misses are not refilled if they are not allocated
+                if op == "write" and not OPTS.write_allocate:
+                    continue
+                yield (op, "clean_miss", way)
+                # Instruction and write-through caches don't have dirty bit
+                if self.has_dirty:
+                    yield (op, "dirty_miss", way)
+                # Only sectored lines can be in the cache without a sector
+                if self.num_sectors > 1:
+                    yield (op, "sector_miss", way)
+            # Write misses are forwarded to DRAM if they are not allocated
+            if op == "write" and not OPTS.write_allocate:
+                yield (op, "write_around")
+            if OPTS.data_hazard:
+                yield (op, "hazard")
+            # DRAM is busy after write-through writes, write misses forwarded to
+            # DRAM, and flushes
+            if OPTS.write_policy == wp.WRITE_THROUGH or not OPTS.write_allocate or OPTS.has_flush:
+                yield (op, "dram_busy")
+        if OPTS.has_flush and OPTS.data_hazard:
+            yield ("flush", "hazard")
+
+
+    def sample(self, bin):
+        """ Count a hit of the bin. """
+
+        if bin in self.bins:
+            self.bins[bin] += 1
+
+
+    def merge(self, covered):
+        """ Count the bins covered by another run. """
+
+        for bin in covered:
+            self.sample(bin)
+
+
+    def covered(self):
+        """ Return the list of covered bins. """
+
+        return [x for x, count in self.bins.items() if count]
+
+
+    def uncovered(self):
+        """ Return the list of uncovered bins. """
+
+        return [x for x, count in self.bins.items() if not count]
+
+
+    def report(self):
+        """ Return the coverage summary as a string. """
+
+        num_covered = len(self.covered())
+        return "{0} of {1} bins ({2:.1f}%)".format(num_covered,
+                                                   len(self.bins),
+                                                   100 * num_covered / len(self.bins))
\ No newline at end of file
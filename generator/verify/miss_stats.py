@@ -0,0 +1,135 @@
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2021 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+from collections import OrderedDict
+
+# Characters of the heatmap from the fewest to the most conflict misses
+HEATMAP_CHARS = " .:-=+*#%@"
+# Number of sets in a line of the heatmap
+HEATMAP_WIDTH = 64
+# Names of the miss types
+MISS_TYPES = ["compulsory", "capacity", "conflict"]
+
+
+class miss_stats:
+    """
+    This is the hit and miss statistics of the cache design.
+    Requests are sampled by sim_cache and each miss is classified as:
+    - compulsory: the line is used for the first time
+    - capacity: the line misses in a fully-associative LRU cache of the same
+      size as well
+    - conflict: the line would hit in a fully-associative LRU cache of the
+      same size
+    If lines are sectored, each sector is classified like a line; the shadow
+    cache keeps valid sectors of its lines as the cache does.
+    """
+
+    def __init__(self, cache_config):
+
+        cache_config.set_local_config(self)
+
+        self.counts = {x: 0 for x in ["hit"] + MISS_TYPES}
+        # Conflict misses of each set
+        self.set_conflicts = [0] * self.num_rows
+
+        self.reset()
+
+
+    def reset(self):
+        """ Empty the shadow cache as the cache is reset. Counts are kept. """
+
+        # Sectors of lines which are brought into the cache since the last
+        # reset
+        self.seen = set()
+        # Shadow fully-associative LRU cache ordered from LRU to MRU
+        # Each line has the bits of its valid sectors.
+        self.shadow = OrderedDict()
+
+
+    def sample(self, address, is_hit, allocate=True):
+        """
+        Count a request of the decoded address. If allocate is False, the line
+        of a miss isn't brought into the cache; therefore, it isn't brought
+        into the shadow cache either.
+        """
+
+        line = address.line
+        sector = (line, address.sector)
+        sector_bit = 1 << address.sector
+        shadow = self.shadow
+
+        # Update the shadow cache in constant time
+        # Missing sectors of a line are brought without evicting it
+        shadow_line = shadow.get(line)
+        shadow_hit = shadow_line is not None and shadow_line & sector_bit
+        if shadow_line is not None:
+            shadow.move_to_end(line)
+            if allocate:
+                shadow[line] = shadow_line | sector_bit
+        elif allocate:
+            shadow[line] = sector_bit
+            if len(shadow) > self.num_rows * self.num_ways:
+                shadow.popitem(last=False)
+
+        if is_hit:
+            self.counts["hit"] += 1
+        elif sector not in self.seen:
+            self.counts["compulsory"] += 1
+        elif not shadow_hit:
+            self.counts["capacity"] += 1
+        else:
+            self.counts["conflict"] += 1
+            self.set_conflicts[address.set] += 1
+        if allocate:
+            self.seen.add(sector)
+
+
+    def merge(self, other):
+        """ Add the counts of another run returned by summary(). """
+
+        counts, set_conflicts = other
+        for x in counts:
+            self.counts[x] += counts[x]
+        for i in range(self.num_rows):
+            self.set_conflicts[i] += set_conflicts[i]
+
+
+    def summary(self):
+        """ Return the counts so that they can be merged into another run. """
+
+        return (self.counts, self.set_conflicts)
+
+
+    def report(self):
+        """ Return the hit and miss summary as a string. """
+
+        num_requests = sum(self.counts.values())
+        num_misses = num_requests - self.counts["hit"]
+        misses = ", ".join("{0} {1}".format(self.counts[x], x) for x in MISS_TYPES)
+        return "{0} hits, {1} misses ({2}) in {3} requests".format(self.counts["hit"],
+                                                                   num_misses,
+                                                                   misses,
+                                                                   num_requests)
+
+
+    def heatmap(self):
+        """
+        Return the lines of the heatmap of conflict misses. Each character is a
+        set and darker characters have more conflict misses.
+        """
+
+        max_conflicts = max(self.set_conflicts)
+        chars = []
+        for count in self.set_conflicts:
+            # Sets with conflict misses are never drawn blank
+            level = -(-count * (len(HEATMAP_CHARS) - 1) // max_conflicts) if max_conflicts else 0
+            chars.append(HEATMAP_CHARS[level])
+
+        lines = []
+        for i in range(0, self.num_rows, HEATMAP_WIDTH):
+            lines.append("{0:>6}: |{1}|".format(i, "".join(chars[i:i + HEATMAP_WIDTH])))
+        return lines
\ No newline at end of file
@@ -0,0 +1,42 @@
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2021 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+from array import array
+from mmap import mmap
+
+# Next use position of lines which are never used again
+NEVER = 2 ** 63 - 1
+# Type code and byte size of the positions in the index
+INDEX_TYPE = "q"
+INDEX_ITEM_SIZE = 8
+
+
+def next_use_index(addresses, offset_size, index_path=None):
+    """
+    Return the position of the next request to the same data line for each
+    request in the list of addresses. If index_path is given, the index is
+    saved to this file and memory-mapped so that huge traces don't need to
+    keep their index in memory.
+    """
+
+    num_requests = len(addresses)
+    if index_path is None or not num_requests:
+        next_uses = array(INDEX_TYPE, bytes(num_requests * INDEX_ITEM_SIZE))
+    else:
+        with open(index_path, "w+b") as file:
+            file.truncate(num_requests * INDEX_ITEM_SIZE)
+            next_uses = memoryview(mmap(file.fileno(), 0)).cast(INDEX_TYPE)
+
+    # Stream the trace in reverse so that the next use of each line is the
+    # last one seen. Only one position per line is kept in memory.
+    last_use = {}
+    for i in range(num_requests - 1, -1, -1):
+        line = addresses[i] >> offset_size
+        next_uses[i] = last_use.get(line, NEVER)
+        last_use[line] = i
+
+    return next_uses
\ No newline at end of file
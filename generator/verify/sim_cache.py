@@ -5,40 +5,105 @@
 # (acting for and on behalf of Oklahoma State University)
 # All rights reserved.
 #
+from functools import partial
 from policy import replacement_policy as rp
 from policy import write_policy as wp
+from policy import RRPV_MAX, BRRIP_PERIOD
+from policy_plugin import policy_plugin
 from .sim_sram import sim_sram
 from .sim_dram import sim_dram
 from .sim_dram import DRAM_DELAY
+from .next_use import next_use_index
+from lfsr import LFSR_SEED, lfsr_next, lfsr_prev
+import debug
 from globals import OPTS
 
 
+def fold_tag(tag, set_size):
+    """ Return the XOR of set-sized chunks of a tag. """
+
+    set_mask = (1 << set_size) - 1
+    folded = 0
+    while tag:
+        folded ^= tag & set_mask
+        tag >>= set_size
+    return folded
+
+
+class decoded_address:
+    """
+    This is an address parsed into its tag, set, and offset values.
+    It is created once per request and passed through the call chain of
+    sim_cache so that the same address isn't parsed multiple times.
+    """
+
+    __slots__ = ("address", "tag", "set", "offset", "line", "sector")
+
+    def __init__(self, address, tag, set, offset, line, sector=0):
+
+        self.address = address
+        self.tag = tag
+        self.set = set
+        self.offset = offset
+        # Line address is the address of the data line in DRAM
+        self.line = line
+        # Sector of the line if lines are sectored
+        self.sector = sector
+
+
 class sim_cache:
     """
     This is an high level cache design used for simulation.
     """
 
-    def __init__(self, cache_config):
+    def __init__(self, cache_config, seed=None):
 
         cache_config.set_local_config(self)
+
+        # Shift amounts and bit masks to decode addresses
+        self.set_mask = (1 << self.set_size) - 1
+        self.offset_mask = (1 << self.offset_size) - 1
+        self.tag_shift = self.set_size + self.offset_size
+        self.sector_shift = self.offset_size - self.sector_index_size
+
         self.sram = sim_sram(num_words=self.words_per_line,
                              num_ways=self.num_ways,
                              num_rows=self.num_rows)
+        # Each row of DRAM is a sector of a line
         self.dram = sim_dram(word_size=self.word_size,
-                             num_words=self.words_per_line,
-                             num_rows=self.dram_num_rows)
+                             num_words=self.words_per_sector,
+                             num_rows=self.dram_num_rows,
+                             num_masks=self.dram_num_masks,
+                             seed=None if seed is None else "{}:dram".format(seed))
+
+        # If this is not None, expected contents of the SRAM rows changed by
+        # each operation are appended to it for the lockstep checker
+        self.events = None
+        # If this is not None, functional coverage bins are sampled into it
+        self.coverage = None
+        # If this is not None, hits and misses are sampled into it
+        self.stats = None
+        # If this is not None, it has the next use positions of the requests
+        # of a trace and ways are evicted by the OPT oracle
+        self.next_uses = None
+
         self.reset()
 
 
     def reset(self):
         """ Reset the cache and return the number of stall cycles. """
 
+        self.select_policy()
         self.sram.reset()
+        if self.stats is not None:
+            self.stats.reset()
 
         # Previous request is used to detect data hazard
         self.prev_hit = False
         self.prev_web = 1
         self.prev_set = None
+        self.prev_dram_wait = False
+        self.prev_write_around = False
 
         # Remaining DRAM stall cycles
         # This is used to calculate how many cycles are needed to calculate
@@ -51,10 +116,18 @@ class sim_cache:
             # It starts with unknown. Cache sets it 0 first, then increments.
             # Therefore, random is equal to num_rows when the first request is
             # in the COMPARE state.
-            self.random = 0
+            # LFSR is reset to its seed instead and shifted in each cycle.
+            self.random = LFSR_SEED if OPTS.random_generator == "lfsr" else 0
             self.update_random(self.num_rows + 1)
 
-        # Normally we would return 1 less stall cycles since test_data.v waits
+        if OPTS.replacement_policy == rp.BRRIP:
+            # Fill counter is reset when rst is high
+            self.brrip_count = 0
+
+        if isinstance(OPTS.replacement_policy, policy_plugin):
+            OPTS.replacement_policy.sim_reset(self)
+
+        # Normally we would return 1 less stall cycles since the test bench waits
         # for 1 cycle in order to submit the request. However, cache spends 1
         # more cycle when switching to the RESET state.
         return self.num_rows + 1 - 1
@@ -68,32 +141,39 @@ class sim_cache:
 
         # Start with 1 stall cycle if cache enters FLUSH_HAZARD
         stalls = int(OPTS.data_hazard and self.prev_set == 0)
+        if stalls and self.coverage is not None:
+            self.coverage.sample(("flush", "hazard"))
+        # Remaining DRAM stalls are counted from the first cycle of the flush
+        # while the loop below counts them from the cycle before each way
+        if not stalls:
+            self.dram_stalls += 1
         for row_i in range(self.num_rows):
             for way_i in range(self.num_ways):
                 stalls += 1
                 self.dram_stalls = max(self.dram_stalls - 1, 0)
                 if self.sram.read_valid(row_i, way_i) and self.sram.read_dirty(row_i, way_i):
-                    tag = self.sram.read_tag(row_i, way_i)
-                    data = self.sram.read_line(row_i, way_i)
-                    self.dram.write_line((tag << self.set_size) + row_i, data)
-                    self.sram.write_dirty(row_i, way_i, 0)
-
-                    # Cache will wait in the FLUSH state if DRAM hasn't completed
-                    # the last write request.
-                    stalls += self.dram_stalls
-                    self.dram_stalls = DRAM_DELAY + 1
+                    # Dirty sectors are written back one by one
+                    for _ in self.write_back(row_i, way_i):
+                        # Cache will wait in the FLUSH state if DRAM hasn't
+                        # completed the last write request.
+                        stalls += self.dram_stalls
+                        self.dram_stalls = DRAM_DELAY + 1
 
         # Add 1 more cycle for switching to IDLE
         stalls += 1
-        self.dram_stalls = max(self.dram_stalls - 1, 0)
+        # DRAM also proceeds while the next request is received in the IDLE
+        # state
+        self.dram_stalls = max(self.dram_stalls - 2, 0)
         self.update_random(stalls)
 
         # Reset previous request
         self.prev_hit = False
         self.prev_web = 1
         self.prev_set = None
+        self.prev_dram_wait = False
+        self.prev_write_around = False
 
-        # Return 1 less stall cycles since test_data.v waits for 1 cycle
+        # Return 1 less stall cycles since the test bench waits for 1 cycle
         # in order to submit the request.
         return stalls - 1
 
@@ -101,121 +181,276 @@ class sim_cache:
     def merge_address(self, tag_decimal, set_decimal, offset_decimal):
         """ Create the address consists of given tag, set, and offset values. """
 
-        tag_binary = "{0:0{1}b}".format(tag_decimal, self.tag_size)
-        set_binary = "{0:0{1}b}".format(set_decimal, self.set_size)
+        # Set bits of a hashed set index are found by hashing it again
+        if self.has_set_hash:
+            set_decimal ^= fold_tag(tag_decimal, self.set_size)
+
+        address = (tag_decimal << self.tag_shift) | (set_decimal << self.offset_size)
         if self.offset_size:
-            offset_binary = "{0:0{1}b}".format(offset_decimal, self.offset_size)
-        else:
-            offset_binary = ""
+            address |= offset_decimal
+        return address
 
-        address_binary = tag_binary + set_binary + offset_binary
-        address_decimal = int(address_binary, 2)
 
-        return address_decimal
+    def line_address(self, tag_decimal, set_decimal):
+        """ Return the DRAM address of a line from its tag and set index. """
+
+        if self.has_set_hash:
+            set_decimal ^= fold_tag(tag_decimal, self.set_size)
+        return (tag_decimal << self.set_size) | set_decimal
+
+
+    def dram_row(self, line_decimal, sector_decimal=0):
+        """ Return the DRAM row of a sector of a line. """
+
+        return (line_decimal << self.sector_index_size) | sector_decimal
 
 
     def parse_address(self, address):
         """ Parse the given address into tag, set, and offset values. """
 
-        address_binary = "{0:0{1}b}".format(address, self.address_size)
-        tag_binary = address_binary[:self.tag_size]
-        set_binary = address_binary[self.tag_size:self.tag_size + self.set_size]
-        offset_binary = address_binary[-self.offset_size:]
+        address = self.decode(address)
+        return (address.tag, address.set, address.offset)
 
-        tag_decimal = int(tag_binary, 2)
-        set_decimal = int(set_binary, 2)
-        if self.offset_size:
-            offset_decimal = int(offset_binary, 2)
-        else:
-            offset_decimal = None
 
-        return (tag_decimal, set_decimal, offset_decimal)
+    def decode(self, address):
+        """ Decode the given address unless it is already decoded. """
+
+        if isinstance(address, decoded_address):
+            return address
+
+        line = address >> self.offset_size
+        tag = address >> self.tag_shift
+        set = line & self.set_mask
+        if self.has_set_hash:
+            set ^= fold_tag(tag, self.set_size)
+        return decoded_address(address,
+                               tag,
+                               set,
+                               address & self.offset_mask if self.offset_size else None,
+                               line,
+                               (address >> self.sector_shift) & (self.num_sectors - 1))
 
 
     def find_way(self, address):
         """ Find the way which has the given address' data. """
 
-        tag_decimal, set_decimal, _ = self.parse_address(address)
-        for way in range(self.num_ways):
-            if self.sram.read_valid(set_decimal, way) and self.sram.read_tag(set_decimal, way) == tag_decimal:
-                return way
+        address = self.decode(address)
+        return self.sram.find_tag(address.set, address.tag)
 
 
     def is_dirty(self, address):
         """ Return the dirty bit of the given address. """
 
-        _, set_decimal, _ = self.parse_address(address)
+        address = self.decode(address)
         way = self.find_way(address)
         if way is not None:
-            return self.sram.read_dirty(set_decimal, way)
+            return self.sram.read_dirty(address.set, way)
 
 
-    def way_to_evict(self, set_decimal):
-        """ Return the way to evict according to the replacement policy. """
+    def is_hit(self, address, way):
+        """ Return whether the sector of the address is valid in the way. """
 
-        if OPTS.replacement_policy == rp.NONE:
-            return 0
+        # Line must have the sector of the address if lines are sectored
+        return way is not None and (self.sram.read_valid(address.set, way) >> address.sector) & 1
 
-        if OPTS.replacement_policy == rp.FIFO:
-            return self.sram.read_fifo(set_decimal)
 
-        if OPTS.replacement_policy == rp.LRU:
-            way = None
-            for i in range(self.num_ways):
-                if not self.sram.read_lru(set_decimal, i):
-                    way = i
-            return way
+    def select_policy(self):
+        """
+        Select the methods of the replacement policy so that the policy is
+        checked once instead of in every request.
+        """
 
-        if OPTS.replacement_policy == rp.RANDOM:
-            way = None
-            for i in range(self.num_ways):
-                if not self.sram.read_valid(set_decimal, i):
-                    way = i
-            if way is None:
-                way = self.random
-            return way
+        # Plugins are called with this instance as their first argument
+        plugin = OPTS.replacement_policy if isinstance(OPTS.replacement_policy, policy_plugin) else None
+
+        # Way to evict is found by the method of the replacement policy
+        if self.next_uses is not None:
+            self.way_to_evict = self.way_to_evict_opt
+        elif plugin:
+            self.way_to_evict = partial(plugin.way_to_evict, self)
+        else:
+            self.way_to_evict = getattr(self, "way_to_evict_{}".format(OPTS.replacement_policy))
+
+        # Use numbers of other replacement policies are never updated
+        self.update_fifo = self.update_fifo_numbers if OPTS.replacement_policy == rp.FIFO else self.skip_update
+        self.update_lru = self.update_lru_numbers if OPTS.replacement_policy == rp.LRU else self.skip_update
+        self.update_rrip = self.update_rrip_values if OPTS.replacement_policy.is_rrip() else self.skip_update
+        self.update_plugin = partial(plugin.update, self) if plugin else self.skip_update
+        # Plugins are updated every cycle just like the random register
+        if plugin:
+            self.update_random = partial(plugin.update_cycles, self)
+        elif OPTS.replacement_policy != rp.RANDOM:
+            self.update_random = self.skip_update
+        elif OPTS.random_generator == "lfsr":
+            self.update_random = self.update_random_lfsr
+        else:
+            self.update_random = self.update_random_counter
+        self.update_opt = self.update_next_use if self.next_uses is not None else self.skip_update
+
+
+    def use_opt(self, addresses, index_path=None):
+        """
+        Evict ways by Belady's OPT algorithm for the given trace of request
+        addresses. Requests must be sent in the same order as the trace.
+        OPT needs to know the future requests; therefore, it cannot be
+        generated and stall cycles don't match any hardware.
+        """
+
+        self.next_uses = next_use_index(addresses, self.offset_size, index_path)
+        # Position of the next request in the trace
+        self.position = 0
+        # Next use position of the line in each way
+        self.way_next_uses = [[0] * self.num_ways for _ in range(self.num_rows)]
+        self.select_policy()
+
+
+    def way_to_evict_none(self, set_decimal):
+        """ Return the way to evict for direct-mapped caches. """
+
+        return 0
+
+
+    def way_to_evict_fifo(self, set_decimal):
+        """ Return the way to evict for FIFO caches. """
+
+        return self.sram.read_fifo(set_decimal)
+
+
+    def way_to_evict_lru(self, set_decimal):
+        """ Return the way to evict for LRU caches. """
+
+        # The last way with the lowest use number is evicted
+        lru_line = self.sram.read_lru_line(set_decimal)
+        way = None
+        for i in range(self.num_ways):
+            if not lru_line[i]:
+                way = i
+        return way
+
+
+    def way_to_evict_srrip(self, set_decimal):
+        """ Return the way to evict for SRRIP caches. """
+
+        # The last empty way is filled before evicting the last way with the
+        # maximum RRPV
+        valid_line = self.sram.read_valid_line(set_decimal)
+        rrip_line = self.sram.read_rrip_line(set_decimal)
+        max_rrpv = max(rrip_line)
+        way = None
+        for i in range(self.num_ways):
+            if rrip_line[i] == max_rrpv:
+                way = i
+        for i in range(self.num_ways):
+            if not valid_line[i]:
+                way = i
+        return way
+
+
+    def way_to_evict_brrip(self, set_decimal):
+        """ Return the way to evict for BRRIP caches. """
+
+        # BRRIP only inserts lines differently than SRRIP
+        return self.way_to_evict_srrip(set_decimal)
+
+
+    def way_to_evict_random(self, set_decimal):
+        """ Return the way to evict for random caches. """
+
+        # The last empty way is filled before evicting a random way
+        valid_line = self.sram.read_valid_line(set_decimal)
+        way = None
+        for i in range(self.num_ways):
+            if not valid_line[i]:
+                way = i
+        if way is None:
+            # Lower bits of the LFSR select the way
+            way = self.random & ((1 << self.way_size) - 1)
+        return way
+
+
+    def way_to_evict_opt(self, set_decimal):
+        """ Return the way to evict for the OPT oracle. """
+
+        # The last empty way is filled before evicting the way which is used
+        # again furthest in the future
+        valid_line = self.sram.read_valid_line(set_decimal)
+        way = None
+        for i in range(self.num_ways):
+            if not valid_line[i]:
+                way = i
+        if way is None:
+            next_uses = self.way_next_uses[set_decimal]
+            way = next_uses.index(max(next_uses))
+        return way
 
 
     def request(self, address):
         """ Prepare arrays for a request of address. """
 
-        tag_decimal, set_decimal, _ = self.parse_address(address)
-        way = self.find_way(address)
+        address = self.decode(address)
+        set_decimal = address.set
+        way = self.sram.find_tag(set_decimal, address.tag)
         way_evict = None
+        is_hit = self.is_hit(address, way)
 
         # Increment the random counter if cache enters WAIT_HAZARD
         self.add_cycles(int(self.is_data_hazard(address)))
 
-        if way is not None: # Hit
+        if self.stats is not None:
+            self.stats.sample(address, is_hit)
+
+        if is_hit: # Hit
+            self.update_lru(set_decimal, way)
+            self.update_rrip(set_decimal, way, True)
+            self.update_plugin(set_decimal, way, True)
+        elif way is not None: # Sector miss
+            self.add_cycles(self.dram_stalls)
+
+            # Bring the sector from DRAM without evicting the line. This is a
+            # hit of the line for the replacement policy.
+            self.sram.write_valid(set_decimal, way, self.sram.read_valid(set_decimal, way) | (1 << address.sector))
+            self.read_sector(set_decimal, way, address)
+
             self.update_lru(set_decimal, way)
+            self.update_rrip(set_decimal, way, True)
+            self.update_plugin(set_decimal, way, True)
+            self.add_cycles(1 + DRAM_DELAY)
         else: # Miss
             way_evict = self.way_to_evict(set_decimal)
 
-            self.add_cycles(self.dram_stalls)
+            dram_wait = self.dram_stalls
+            self.add_cycles(dram_wait)
 
             # Write-back
             if self.sram.read_dirty(set_decimal, way_evict):
-                old_tag = self.sram.read_tag(set_decimal, way_evict)
-                old_data = self.sram.read_line(set_decimal, way_evict)
-                self.dram.write_line((old_tag << self.set_size) + set_decimal, old_data)
-                self.add_cycles(DRAM_DELAY + 1)
+                # Sectored caches write dirty sectors back in the WAIT_WRITE
+                # state, which takes 1 more cycle if DRAM was available
+                if self.num_sectors > 1 and not dram_wait:
+                    self.add_cycles(1)
+                for _ in self.write_back(set_decimal, way_evict):
+                    self.add_cycles(DRAM_DELAY + 1)
 
             # Bring data line from DRAM
-            self.sram.write_valid(set_decimal, way_evict, 1)
+            # Only the sector of the request is valid if lines are sectored
+            self.sram.write_valid(set_decimal, way_evict, 1 << address.sector)
             self.sram.write_dirty(set_decimal, way_evict, 0)
-            self.sram.write_tag(set_decimal, way_evict, tag_decimal)
-            self.sram.write_line(set_decimal, way_evict, self.dram.read_line((tag_decimal << self.set_size) + set_decimal))
+            self.sram.write_tag(set_decimal, way_evict, address.tag)
+            self.read_sector(set_decimal, way_evict, address)
 
             self.update_fifo(set_decimal)
             self.update_lru(set_decimal, way_evict)
+            self.update_rrip(set_decimal, way_evict, False)
+            self.update_plugin(set_decimal, way_evict, False)
             self.add_cycles(1 + DRAM_DELAY)
 
         # Update previous request variables
-        self.prev_hit = way is not None
+        self.prev_hit = is_hit
         self.prev_web = 1
         self.prev_set = set_decimal
+        self.prev_write_around = False
 
         way = way if way_evict is None else way_evict
+        self.update_opt(set_decimal, way)
 
         # Return the valid way
         return way
@@ -224,7 +459,9 @@ class sim_cache:
     def read(self, address):
         """ Read data from an address. """
 
-        _, set_decimal, offset_decimal = self.parse_address(address)
+        address = self.decode(address)
+        set_decimal = address.set
+        offset_decimal = address.offset
         way = self.request(address)
         self.add_cycles(1)
         # If returning a data word
@@ -243,10 +480,21 @@ class sim_cache:
     def write(self, address, mask, data_input):
         """ Write data to an address. """
 
-        tag_decimal, set_decimal, offset_decimal = self.parse_address(address)
+        address = self.decode(address)
+        set_decimal = address.set
+        offset_decimal = address.offset
+
+        # Write misses are forwarded to DRAM if they are not allocated
+        if not OPTS.write_allocate and self.find_way(address) is None:
+            self.write_around(address, mask, data_input)
+            return
+
         way = self.request(address)
         if self.has_dirty:
-            self.sram.write_dirty(set_decimal, way, 1)
+            self.sram.write_dirty(set_decimal, way, self.sram.read_dirty(set_decimal, way) | (1 << address.sector))
+
+        # Write-through caches wait in the WRITE state if DRAM is busy
+        self.prev_dram_wait = OPTS.write_policy == wp.WRITE_THROUGH and self.dram_stalls > 0
 
         # Write input data over the write mask
         # If returning a data word
@@ -259,21 +507,14 @@ class sim_cache:
             for word in self.sram.read_line(set_decimal, way):
                 orig_data += word << (idx * self.word_size)
                 idx += 1
-        wr_data = 0 if self.num_masks else data_input
-
-        for i in range(self.num_masks):
-            part = data_input if mask[-(i + 1)] == "1" else orig_data
-            part = (part >> (i * self.write_size)) % (2 ** self.write_size)
-            wr_data += part << (i * self.write_size)
+        wr_data = self.mask_data(orig_data, mask, data_input)
 
         # If returning a data word
         if self.offset_size:
             self.sram.write_word(set_decimal, way, offset_decimal, wr_data)
             # If write policy is write-through, update the data line in DRAM
             if OPTS.write_policy == wp.WRITE_THROUGH:
-                line = self.sram.read_line(set_decimal, way)
-                line[offset_decimal] = wr_data
-                self.dram.write_line((tag_decimal << self.set_size) + set_decimal, line)
+                self.write_sector(set_decimal, way, address.line, address.sector)
                 self.add_cycles(self.dram_stalls)
                 self.dram_stalls = DRAM_DELAY + 1
         # If returning a data line
@@ -285,7 +526,7 @@ class sim_cache:
             self.sram.write_line(set_decimal, way, line)
             # If write policy is write-through, update the data line in DRAM
             if OPTS.write_policy == wp.WRITE_THROUGH:
-                self.dram.write_line((tag_decimal << self.set_size) + set_decimal, line)
+                self.dram.write_line(address.line, line)
                 self.add_cycles(self.dram_stalls)
                 self.dram_stalls = DRAM_DELAY + 1
 
@@ -295,9 +536,104 @@ class sim_cache:
         self.prev_web = 0
 
 
+    def write_around(self, address, mask, data_input):
+        """ Write data to DRAM without bringing its line into the cache. """
+
+        # Increment the random counter if cache enters WAIT_HAZARD
+        self.add_cycles(int(self.is_data_hazard(address)))
+
+        # Line isn't allocated in the shadow cache of statistics either
+        if self.stats is not None:
+            self.stats.sample(address, False, False)
+
+        # Write input data over the write mask
+        line = self.dram.read_line(address.line)
+        # If returning a data word
+        if self.offset_size:
+            line[address.offset] = self.mask_data(line[address.offset], mask, data_input)
+        # If returning a data line
+        else:
+            orig_data = 0
+            for i in range(self.words_per_line):
+                orig_data += line[i] << (i * self.word_size)
+            wr_data = self.mask_data(orig_data, mask, data_input)
+            for i in range(self.words_per_line):
+                line[i] = (wr_data >> (i * self.word_size)) % (2 ** self.word_size)
+        self.dram.write_line(address.line, line)
+
+        # Cache waits in the WRITE state if DRAM is busy
+        self.add_cycles(self.dram_stalls)
+        self.dram_stalls = DRAM_DELAY + 1
+        self.add_cycles(1)
+
+        # Update previous request variables
+        self.prev_hit = False
+        self.prev_web = 0
+        self.prev_set = address.set
+        self.prev_dram_wait = False
+        self.prev_write_around = True
+
+        # No way is used by the request but it is still in the trace of OPT
+        if self.next_uses is not None:
+            self.position += 1
+
+
+    def read_sector(self, set_decimal, way, address):
+        """ Bring the sector of the address from DRAM into the way. """
+
+        data = self.dram.read_line(self.dram_row(address.line, address.sector))
+        # Other sectors of the line are kept
+        if self.num_sectors > 1:
+            line = self.sram.read_line(set_decimal, way)
+            start = address.sector * self.words_per_sector
+            line[start:start + self.words_per_sector] = data
+            data = line
+        self.sram.write_line(set_decimal, way, data)
+
+
+    def write_sector(self, set_decimal, way, line_decimal, sector_decimal):
+        """ Write a sector of the way to its row in DRAM. """
+
+        data = self.sram.read_line(set_decimal, way)
+        if self.num_sectors > 1:
+            start = sector_decimal * self.words_per_sector
+            data = data[start:start + self.words_per_sector]
+        self.dram.write_line(self.dram_row(line_decimal, sector_decimal), data)
+
+
+    def write_back(self, set_decimal, way):
+        """
+        Write dirty sectors of the way back to DRAM. Yield after each sector is
+        written so that the caller can count the cycles of DRAM.
+        """
+
+        line_decimal = self.line_address(self.sram.read_tag(set_decimal, way), set_decimal)
+        dirty = self.sram.read_dirty(set_decimal, way)
+        for i in range(self.num_sectors):
+            if (dirty >> i) & 1:
+                self.write_sector(set_decimal, way, line_decimal, i)
+                yield
+        self.sram.write_dirty(set_decimal, way, 0)
+
+
+    def mask_data(self, orig_data, mask, data_input):
+        """ Return the original data overwritten by input data over the write mask. """
+
+        if not self.num_masks:
+            return data_input
+
+        wr_data = 0
+        for i in range(self.num_masks):
+            part = data_input if mask[-(i + 1)] == "1" else orig_data
+            part = (part >> (i * self.write_size)) % (2 ** self.write_size)
+            wr_data += part << (i * self.write_size)
+        return wr_data
+
+
     def stall_cycles(self, address, is_write):
         """ Return the number of stall cycles for a request of address. """
 
+        address = self.decode(address)
         hazard = self.is_data_hazard(address)
 
         # In order to calculate the stall cycles correctly, random counter
@@ -312,7 +648,11 @@ class sim_cache:
         # Don't add an extra cycle here if DRAM's stall is non-zero.
         cycles = int(hazard and self.dram_stalls == 0)
 
-        if self.find_way(address) is None:
+        way = self.sram.find_tag(address.set, address.tag)
+        is_hit = self.is_hit(address, way)
+        # Write misses are forwarded to DRAM if they are not allocated
+        write_around = is_write and way is None and not OPTS.write_allocate
+        if not is_hit and not write_around:
             # Stalls 1 cycle in the COMPARE state since the request is a miss
             cycles += 1
 
@@ -321,9 +661,10 @@ class sim_cache:
             cycles += self.dram_stalls
 
             # Find the evicted address
-            _, set_decimal, _ = self.parse_address(address)
-            evicted_way = self.way_to_evict(set_decimal)
-            is_dirty = self.sram.read_dirty(set_decimal, evicted_way)
+            # If the line is in the cache without the sector of the request,
+            # only the sector is read
+            evicted_way = self.way_to_evict(address.set) if way is None else way
+            is_dirty = way is None and self.sram.read_dirty(address.set, evicted_way)
 
             # If a way is written back before being replaced, cache stalls for
             # 2n+1 cycles in total:
@@ -331,13 +672,33 @@ class sim_cache:
             # - 1 for sending the read request to DRAM
             # - n while reading
             cycles += (DRAM_DELAY * 2 + 1 if is_dirty else DRAM_DELAY)
-        elif OPTS.write_policy == wp.WRITE_THROUGH and is_write:
-            # If DRAM is not yet ready and the request is miss, cache needs to
-            # wait until DRAM is ready
+
+            # Sectored caches write dirty sectors back one by one in the
+            # WAIT_WRITE state, which takes 1 more cycle if DRAM is available
+            if is_dirty and self.num_sectors > 1:
+                cycles += (bin(is_dirty).count("1") - 1) * (DRAM_DELAY + 1) + int(not self.dram_stalls)
+        elif is_write and (write_around or OPTS.write_policy == wp.WRITE_THROUGH):
+            # If DRAM is not yet ready and the request is written to DRAM, cache
+            # needs to wait until DRAM is ready
             cycles += self.dram_stalls
         else:
             cycles = int(hazard)
 
+        if self.coverage is not None:
+            op = "write" if is_write else "read"
+            if write_around:
+                self.coverage.sample((op, "write_around"))
+            elif is_hit:
+                self.coverage.sample((op, "hit", way))
+            elif way is not None:
+                self.coverage.sample((op, "sector_miss", way))
+            else:
+                self.coverage.sample((op, "dirty_miss" if is_dirty else "clean_miss", evicted_way))
+            if hazard:
+                self.coverage.sample((op, "hazard"))
+            if self.dram_stalls and (not is_hit or (OPTS.write_policy == wp.WRITE_THROUGH and is_write)):
+                self.coverage.sample((op, "dram_busy"))
+
         # After the calculation is done, the random counter should be decremented
         if hazard:
             self.update_random(-1)
@@ -345,6 +706,50 @@ class sim_cache:
         return cycles
 
 
+    def run_batch(self, ops, addresses, masks, data):
+        """
+        Run a batch of operations and return the data outputs and the number of
+        stall cycles of each operation.
+        Operations can be "reset", "flush", "read", or "write". Data output of
+        an operation other than read is 0.
+        """
+
+        # Replacement policy methods are selected once for the whole batch
+        self.select_policy()
+
+        # Keep methods in local variables to avoid attribute lookups in the loop
+        decode = self.decode
+        stall_cycles = self.stall_cycles
+        read = self.read
+        write = self.write
+        events = self.events
+
+        dout = [0] * len(ops)
+        stalls = [0] * len(ops)
+        for i, op in enumerate(ops):
+            if op == "read":
+                address = decode(addresses[i])
+                stalls[i] = stall_cycles(address, False)
+                dout[i] = read(address)
+            elif op == "write":
+                address = decode(addresses[i])
+                stalls[i] = stall_cycles(address, True)
+                write(address, masks[i], data[i])
+            elif op == "reset":
+                stalls[i] = self.reset()
+            elif op == "flush":
+                stalls[i] = self.flush()
+            else:
+                debug.error("Unknown operation in batch: {}".format(op), -1)
+
+            if events is not None:
+                # Reset and flush may change all rows
+                rows = range(self.num_rows) if op in ("reset", "flush") else [address.set]
+                events.append([(x, self.sram.read_row(x)) for x in rows])
+
+        return dout, stalls
+
+
     def is_data_hazard(self, address):
         """ Return whether a data hazard is detected. """
 
@@ -352,18 +757,27 @@ class sim_cache:
         if not OPTS.data_hazard:
             return False
 
-        _, set_decimal, _ = self.parse_address(address)
+        set_decimal = self.decode(address).set
 
         # No data hazard if this is the first request or current request is not
         # in the same set with the previous request
         if self.prev_set is None or set_decimal != self.prev_set:
             return False
 
-        if OPTS.replacement_policy == rp.LRU:
-            # In LRU cache, use bits are updated in each access.
+        # SRAMs are not written if previous request was a write miss forwarded
+        # to DRAM
+        if self.prev_write_around:
+            return False
+
+        if OPTS.replacement_policy.updated_after_read():
+            # In LRU and RRIP caches, use bits are updated in each access.
             # Therefore, when there are two requests to the same set, data
-            # hazard on LRU SRAM might occur.
+            # hazard on the use array might occur.
             return True
+        elif not self.has_dirty and not OPTS.read_only:
+            # Write-through caches switch to WAIT_HAZARD after a write hit only
+            # if they waited for DRAM in the WRITE state
+            return (self.prev_hit and not self.prev_web and self.prev_dram_wait) or (not self.prev_hit)
         else:
             # If previous request was hit and write If previous request was miss
             return (self.prev_hit and not self.prev_web) or (not self.prev_hit)
@@ -374,45 +788,88 @@ class sim_cache:
     def add_cycles(self, cycles):
         """ Add cycles to calculate stalls. """
 
-        self.dram_stalls = max(self.dram_stalls - cycles, 0)
+        self.dram_stalls = self.dram_stalls - cycles if self.dram_stalls > cycles else 0
         self.update_random(cycles)
 
 
-    def update_fifo(self, set_decimal):
+    def skip_update(self, *args):
+        """ Don't update anything for replacement policies that don't match. """
+
+        pass
+
+
+    def update_fifo_numbers(self, set_decimal):
         """ Update the FIFO number of the latest replaced set. """
 
-        # Check if replacement policy matches
-        if OPTS.replacement_policy == rp.FIFO:
-            # Starting from 0, increase the FIFO number every time a new data
-            # is brought from DRAM.
-            # When it reaches the max value, go back to 0 and proceed.
-            self.sram.write_fifo(set_decimal, self.sram.read_fifo(set_decimal) + 1)
+        # Starting from 0, increase the FIFO number every time a new data
+        # is brought from DRAM.
+        # When it reaches the max value, go back to 0 and proceed.
+        self.sram.write_fifo(set_decimal, self.sram.read_fifo(set_decimal) + 1)
 
 
-    def update_lru(self, set_decimal, way):
+    def update_lru_numbers(self, set_decimal, way):
         """ Update the LRU numbers of the latest used way. """
 
-        # Check if replacement policy matches
-        if OPTS.replacement_policy == rp.LRU:
-            # There is a number for each way in a set. They are ordered by their
-            # access time relative to each other.
-            # When a way is accessed (read or write), it is brought to the top
-            # of the order (highest possible number) and numbers which are more
-            # than its previous value are decreased by one.
-            for i in range(self.num_ways):
-                if self.sram.read_lru(set_decimal, i) > self.sram.read_lru(set_decimal, way):
-                    self.sram.write_lru(set_decimal, i, self.sram.read_lru(set_decimal, i) - 1)
-            self.sram.write_lru(set_decimal, way, self.num_ways - 1)
+        # There is a number for each way in a set. They are ordered by their
+        # access time relative to each other.
+        # When a way is accessed (read or write), it is brought to the top
+        # of the order (highest possible number) and numbers which are more
+        # than its previous value are decreased by one.
+        lru_line = self.sram.read_lru_line(set_decimal)
+        way_number = lru_line[way]
+        for i in range(self.num_ways):
+            if lru_line[i] > way_number:
+                lru_line[i] -= 1
+        lru_line[way] = self.num_ways - 1
+        self.sram.write_lru_line(set_decimal, lru_line)
+
+
+    def update_rrip_values(self, set_decimal, way, is_hit):
+        """ Update the RRPVs of the latest accessed set. """
+
+        # A hit predicts that the way is re-referenced in the near future.
+        # Before a new line is inserted, all ways are aged until the victim's
+        # RRPV reaches the maximum. SRRIP inserts new lines with a long RRPV.
+        # BRRIP inserts them with the distant RRPV except once in every
+        # BRRIP_PERIOD fills.
+        rrip_line = self.sram.read_rrip_line(set_decimal)
+        if is_hit:
+            rrip_line[way] = 0
+        else:
+            age = RRPV_MAX - max(rrip_line)
+            rrip_line = [x + age for x in rrip_line]
+            rrip_line[way] = RRPV_MAX - 1
+            if OPTS.replacement_policy == rp.BRRIP:
+                if self.brrip_count:
+                    rrip_line[way] = RRPV_MAX
+                self.brrip_count = (self.brrip_count + 1) % BRRIP_PERIOD
+        self.sram.write_rrip_line(set_decimal, rrip_line)
 
 
-    def update_random(self, cycles):
+    def update_random_counter(self, cycles):
         """ Update the random counter for a number of cycles. """
 
-        # Check if replacement policy matches
-        if OPTS.replacement_policy == rp.RANDOM:
-            # In the real hardware, random caches have a register acting like a
-            # counter. This register is incremented at every posedge of the clock.
-            # Since we cannot guarantee how many cycles a miss will take, this
-            # register essentially has random values.
-            self.random += cycles
-            self.random %= self.num_ways
\ No newline at end of file
+        # In the real hardware, random caches have a register acting like a
+        # counter. This register is incremented at every posedge of the clock.
+        # Since we cannot guarantee how many cycles a miss will take, this
+        # register essentially has random values.
+        self.random += cycles
+        self.random %= self.num_ways
+
+
+    def update_random_lfsr(self, cycles):
+        """ Update the random LFSR for a number of cycles. """
+
+        # LFSR is shifted once at every posedge of the clock. It is shifted
+        # back if cycles is negative.
+        for _ in range(cycles):
+            self.random = lfsr_next(self.random, OPTS.lfsr_size)
+        for _ in range(-cycles):
+            self.random = lfsr_prev(self.random, OPTS.lfsr_size)
+
+
+    def update_next_use(self, set_decimal, way):
+        """ Update the next use position of the line in the way. """
+
+        self.way_next_uses[set_decimal][way] = self.next_uses[self.position]
+        self.position += 1
\ No newline at end of file
@@ -6,7 +6,7 @@
 # All rights reserved.
 #
 from math import ceil, log2
-from random import randrange
+from random import Random
 
 DRAM_DELAY = 4
 
@@ -18,11 +18,17 @@ class sim_dram:
     to read and write data.
     """
 
-    def __init__(self, word_size, num_words, num_rows):
+    def __init__(self, word_size, num_words, num_rows, num_masks=0, seed=None):
 
         self.word_size = word_size
         self.num_words = num_words
         self.num_rows = num_rows
+        # DRAM module has a write mask if it is not 0
+        self.num_masks = num_masks
+
+        # DRAM has its own random number generator so that the initial data
+        # only depends on the seed
+        self.rng = Random(seed)
 
         self.make_initial_data()
 
@@ -34,7 +40,7 @@ class sim_dram:
         for _ in range(self.num_rows):
             self.data_array.append([])
             for _ in range(self.num_words):
-                self.data_array[-1].append(randrange(2 ** self.word_size))
+                self.data_array[-1].append(self.rng.randrange(2 ** self.word_size))
 
 
     def read_line(self, address):
@@ -53,7 +59,7 @@ class sim_dram:
         """ Write the DRAM file. """
 
         self.df = open(dram_path, "w")
-        self.df.write("module dram (clk, rst, csb, web, addr, din, dout, stall);\n\n")
+        self.df.write("module dram (clk, rst, csb, web, {}addr, din, dout, stall);\n\n".format("wmask, " if self.num_masks else ""))
 
         self.write_parameters()
         self.write_io_ports()
@@ -71,9 +77,11 @@ class sim_dram:
         self.df.write("  parameter  WORD_WIDTH  = {};\n".format(self.word_size * self.num_words))
         self.df.write("  parameter  ADDR_WIDTH  = {};\n".format(ceil(log2(self.num_rows))))
         self.df.write("  localparam DRAM_DEPTH  = 1 << ADDR_WIDTH;\n\n")
+        if self.num_masks:
+            self.df.write("  parameter  MASK_COUNT  = {};\n".format(self.num_masks))
+            self.df.write("  localparam MASK_WIDTH  = WORD_WIDTH / MASK_COUNT;\n\n")
         self.df.write("  // This delay is used to \"imitate\" DRAMs' low frequencies\n")
-        self.df.write("  parameter  CYCLE_DELAY = {};\n".format(DRAM_DELAY))
-        self.df.write("  parameter  DELAY       = 3;\n\n")
+        self.df.write("  parameter  CYCLE_DELAY = {};\n\n".format(DRAM_DELAY))
 
 
     def write_io_ports(self):
@@ -83,6 +91,8 @@ class sim_dram:
         self.df.write("  input  rst;\n")
         self.df.write("  input  csb;\n")
         self.df.write("  input  web;\n")
+        if self.num_masks:
+            self.df.write("  input  [MASK_COUNT-1:0] wmask;\n")
         self.df.write("  input  [ADDR_WIDTH-1:0] addr;\n")
         self.df.write("  input  [WORD_WIDTH-1:0] din;\n")
         self.df.write("  output [WORD_WIDTH-1:0] dout;\n")
@@ -94,6 +104,10 @@ class sim_dram:
 
         self.df.write("  reg [WORD_WIDTH-1:0] dout;\n")
         self.df.write("  reg stall;\n\n")
+        self.df.write("  integer stall_count;\n")
+        if self.num_masks:
+            self.df.write("  integer i;\n")
+        self.df.write("\n")
         self.df.write("  reg [WORD_WIDTH-1:0] memory [0:DRAM_DEPTH-1];\n\n")
 
 
@@ -104,12 +118,23 @@ class sim_dram:
         self.df.write("    if (rst) begin\n")
         self.df.write("      dout  <= {WORD_WIDTH{1'bx}};\n")
         self.df.write("      stall <= 0;\n")
-        self.df.write("    end else if (!csb && !stall) begin\n")
-        self.df.write("      stall <= 1; // When there is a request, DRAM immediately stalls\n")
-        self.df.write("      stall <= #(CYCLE_DELAY * 5 * 2 + DELAY) 0; // Stall becomes low after a couple of cycles\n")
-        self.df.write("      dout  <= #(DELAY) memory[addr];\n")
+        self.df.write("    end else if (stall) begin\n")
+        self.df.write("      // Stall becomes low after a couple of cycles\n")
+        self.df.write("      if (stall_count == CYCLE_DELAY)\n")
+        self.df.write("        stall <= 0;\n")
+        self.df.write("      stall_count <= stall_count + 1;\n")
+        self.df.write("    end else if (!csb) begin\n")
+        self.df.write("      stall       <= 1; // When there is a request, DRAM immediately stalls\n")
+        self.df.write("      stall_count <= 1;\n")
+        self.df.write("      dout        <= memory[addr];\n")
         self.df.write("      if (!web)\n")
-        self.df.write("        memory[addr] <= #(DELAY) din;\n")
+        if self.num_masks:
+            self.df.write("        // Only the parts of the line over the write mask are written\n")
+            self.df.write("        for (i = 0; i < MASK_COUNT; i = i + 1)\n")
+            self.df.write("          if (wmask[i])\n")
+            self.df.write("            memory[addr][i*MASK_WIDTH +: MASK_WIDTH] <= din[i*MASK_WIDTH +: MASK_WIDTH];\n")
+        else:
+            self.df.write("        memory[addr] <= din;\n")
         self.df.write("    end\n")
         self.df.write("  end\n\n")
 
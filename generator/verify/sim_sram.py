@@ -6,6 +6,8 @@
 # All rights reserved.
 #
 from policy import replacement_policy as rp
+from policy import RRPV_MAX
+from policy_plugin import policy_plugin
 from globals import OPTS
 
 
@@ -13,6 +15,7 @@ class sim_sram:
     """
     This is a simulation module for SRAMs.
     It is used in sim_cache to read and write data.
+    Valid and dirty values have a bit for each sector of the line.
     """
 
     def __init__(self, num_words, num_ways, num_rows):
@@ -32,7 +35,16 @@ class sim_sram:
         if OPTS.replacement_policy == rp.FIFO:
             self.fifo_array = [0] * self.num_rows
         if OPTS.replacement_policy == rp.LRU:
-            self.lru_array = [[0] * self.num_ways for _ in range(self.num_rows)]
+            # Use numbers are reset to the way indices just like in the cache
+            # design so that both evict the same ways
+            self.lru_array = [list(range(self.num_ways)) for _ in range(self.num_rows)]
+        if OPTS.replacement_policy.is_rrip():
+            # All ways are predicted to be re-referenced in the distant future
+            self.rrip_array = [[RRPV_MAX] * self.num_ways for _ in range(self.num_rows)]
+        if isinstance(OPTS.replacement_policy, policy_plugin):
+            # Plugins keep use lines as integers just like the use array of the
+            # cache design. They are reset by the plugin.
+            self.use_array = [0] * self.num_rows
 
 
     def read_valid(self, set, way):
@@ -53,6 +65,22 @@ class sim_sram:
         return self.tag_array[set][way]
 
 
+    def read_valid_line(self, set):
+        """ Return the valid bits of all ways in given set. """
+
+        return self.valid_array[set].copy()
+
+
+    def find_tag(self, set, tag):
+        """ Return the valid way of given set which has the tag. """
+
+        valid_line = self.valid_array[set]
+        tag_line = self.tag_array[set]
+        for way in range(self.num_ways):
+            if valid_line[way] and tag_line[way] == tag:
+                return way
+
+
     def read_fifo(self, set):
         """ Return the FIFO bits of given set and way. """
 
@@ -65,6 +93,48 @@ class sim_sram:
         return self.lru_array[set][way]
 
 
+    def read_lru_line(self, set):
+        """ Return the LRU bits of all ways in given set. """
+
+        return self.lru_array[set].copy()
+
+
+    def read_rrip_line(self, set):
+        """ Return the RRPVs of all ways in given set. """
+
+        return self.rrip_array[set].copy()
+
+
+    def read_use(self, set):
+        """ Return the use line of given set. """
+
+        return self.use_array[set]
+
+
+    def read_row(self, set):
+        """
+        Return the valid, dirty, tag, data, and use values of all ways in
+        given set.
+        """
+
+        if OPTS.replacement_policy == rp.FIFO:
+            use = self.fifo_array[set]
+        elif OPTS.replacement_policy == rp.LRU:
+            use = self.lru_array[set].copy()
+        elif OPTS.replacement_policy.is_rrip():
+            use = self.rrip_array[set].copy()
+        elif isinstance(OPTS.replacement_policy, policy_plugin):
+            use = self.use_array[set]
+        else:
+            use = None
+
+        return (self.valid_array[set].copy(),
+                self.dirty_array[set].copy(),
+                self.tag_array[set].copy(),
+                [line.copy() for line in self.data_array[set]],
+                use)
+
+
     def read_word(self, set, way, offset):
         """ Return the data word of given set, way, and offset. """
 
@@ -107,6 +177,24 @@ class sim_sram:
         self.lru_array[set][way] = data
 
 
+    def write_lru_line(self, set, data):
+        """ Write the LRU bits of all ways in given set. """
+
+        self.lru_array[set] = data
+
+
+    def write_rrip_line(self, set, data):
+        """ Write the RRPVs of all ways in given set. """
+
+        self.rrip_array[set] = data
+
+
+    def write_use(self, set, data):
+        """ Write the use line of given set. """
+
+        self.use_array[set] = data
+
+
     def write_word(self, set, way, offset, data):
         """ Write the data word of given set, way, and offset. """
 
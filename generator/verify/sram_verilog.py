@@ -0,0 +1,119 @@
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2021 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+from math import ceil, log2
+
+
+class sram_verilog:
+    """
+    This is a generator of behavioral SRAM modules with one write and one read
+    port. Generated modules have the same names and ports as OpenRAM's SRAM
+    modules so that the cache design can be simulated and synthesized without
+    running OpenRAM.
+    """
+
+    def __init__(self, config_path):
+
+        # OpenRAM config files written by OpenCache are Python files
+        opts = {}
+        with open(config_path, "r") as file:
+            exec(file.read(), opts)
+
+        self.module_name = opts["output_name"]
+        self.word_size = opts["word_size"]
+        self.addr_size = ceil(log2(opts["num_words"]))
+
+
+    def sram_write(self, sram_path):
+        """ Write the behavioral SRAM module. """
+
+        self.sf = open(sram_path, "w")
+        self.sf.write("// Behavioral SRAM model generated by OpenCache\n")
+
+        self.write_header()
+        self.write_registers()
+        self.write_logic_block()
+
+        self.sf.write("endmodule\n")
+        self.sf.close()
+
+
+    def blackbox_write(self, bb_path):
+        """ Write the blackbox module for synthesis. """
+
+        self.sf = open(bb_path, "w")
+        self.sf.write("// Blackbox SRAM module generated by OpenCache\n")
+
+        self.write_header()
+
+        self.sf.write("endmodule\n")
+        self.sf.close()
+
+
+    def write_header(self):
+        """ Write the module declaration, parameters, and IO ports. """
+
+        self.sf.write("module {} (\n".format(self.module_name))
+        self.sf.write("// Port 0: W\n")
+        self.sf.write("    clk0, csb0, addr0, din0,\n")
+        self.sf.write("// Port 1: R\n")
+        self.sf.write("    clk1, csb1, addr1, dout1\n")
+        self.sf.write("  );\n\n")
+
+        self.sf.write("  parameter  DATA_WIDTH = {};\n".format(self.word_size))
+        self.sf.write("  parameter  ADDR_WIDTH = {};\n".format(self.addr_size))
+        self.sf.write("  localparam RAM_DEPTH  = 1 << ADDR_WIDTH;\n\n")
+
+        self.sf.write("  input  clk0; // clock\n")
+        self.sf.write("  input  csb0; // active low chip select\n")
+        self.sf.write("  input  [ADDR_WIDTH-1:0] addr0;\n")
+        self.sf.write("  input  [DATA_WIDTH-1:0] din0;\n")
+        self.sf.write("  input  clk1; // clock\n")
+        self.sf.write("  input  csb1; // active low chip select\n")
+        self.sf.write("  input  [ADDR_WIDTH-1:0] addr1;\n")
+        self.sf.write("  output [DATA_WIDTH-1:0] dout1;\n\n")
+
+
+    def write_registers(self):
+        """ Write the registers of the SRAM. """
+
+        self.sf.write("  reg [DATA_WIDTH-1:0] dout1;\n\n")
+        self.sf.write("  reg csb0_reg;\n")
+        self.sf.write("  reg [ADDR_WIDTH-1:0] addr0_reg;\n")
+        self.sf.write("  reg [DATA_WIDTH-1:0] din0_reg;\n")
+        self.sf.write("  reg csb1_reg;\n")
+        self.sf.write("  reg [ADDR_WIDTH-1:0] addr1_reg;\n\n")
+        self.sf.write("  reg [DATA_WIDTH-1:0] memory [0:RAM_DEPTH-1];\n\n")
+
+
+    def write_logic_block(self):
+        """ Write the logic block of the SRAM. """
+
+        # OpenRAM SRAMs latch inputs at the posedge and read/write at the
+        # negedge of the clock. Therefore, output is ready in the next cycle.
+        self.sf.write("  // All inputs are latched at the posedge\n")
+        self.sf.write("  always @(posedge clk0) begin\n")
+        self.sf.write("    csb0_reg  <= csb0;\n")
+        self.sf.write("    addr0_reg <= addr0;\n")
+        self.sf.write("    din0_reg  <= din0;\n")
+        self.sf.write("  end\n\n")
+        self.sf.write("  always @(posedge clk1) begin\n")
+        self.sf.write("    csb1_reg  <= csb1;\n")
+        self.sf.write("    addr1_reg <= addr1;\n")
+        self.sf.write("  end\n\n")
+
+        # Both ports are driven by the same clock in the cache. Writing and
+        # reading in the same block makes sure that the write is performed
+        # first.
+        self.sf.write("  // Write is performed before read at the negedge so that the new\n")
+        self.sf.write("  // data is read if the same address is written and read\n")
+        self.sf.write("  always @(negedge clk0) begin\n")
+        self.sf.write("    if (!csb0_reg)\n")
+        self.sf.write("      memory[addr0_reg] = din0_reg;\n")
+        self.sf.write("    if (!csb1_reg)\n")
+        self.sf.write("      dout1 <= memory[addr1_reg];\n")
+        self.sf.write("  end\n\n")
\ No newline at end of file
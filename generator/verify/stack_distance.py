@@ -0,0 +1,210 @@
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2021 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+from collections import Counter
+from .sim_cache import fold_tag
+import debug
+from globals import OPTS
+
+# Initial number of timestamps in the tree of a set
+MIN_TREE_SIZE = 16
+
+
+class fenwick_tree:
+    """
+    This is a binary indexed tree of counts. Both updating a count and
+    summing the counts up to an index take logarithmic time.
+    """
+
+    def __init__(self, size, counts=None):
+
+        self.size = size
+        self.tree = [0] * (size + 1)
+
+        # Build the tree from the initial counts in linear time
+        if counts:
+            for i, count in enumerate(counts, 1):
+                self.tree[i] = count
+            for i in range(1, size + 1):
+                parent = i + (i & -i)
+                if parent <= size:
+                    self.tree[parent] += self.tree[i]
+
+
+    def add(self, index, value):
+        """ Add a value to the count at the index. """
+
+        index += 1
+        while index <= self.size:
+            self.tree[index] += value
+            index += index & -index
+
+
+    def prefix_sum(self, index):
+        """ Return the sum of the counts up to the index (inclusive). """
+
+        index += 1
+        total = 0
+        while index:
+            total += self.tree[index]
+            index &= index - 1
+        return total
+
+
+class lru_stack:
+    """
+    This is the LRU stack of a set. Each line is marked in a Fenwick tree at
+    the timestamp of its last use; therefore, the number of lines above a line
+    in the stack is the number of marks after its timestamp.
+    """
+
+    def __init__(self):
+
+        self.last_use = {}
+        self.time = 0
+        self.tree = fenwick_tree(MIN_TREE_SIZE)
+
+
+    def access(self, line):
+        """
+        Move the line to the top of the stack and return its stack distance.
+        None is returned if the line isn't in the stack.
+        """
+
+        if self.time == self.tree.size:
+            self.compact()
+
+        time = self.last_use.get(line)
+        if time is None:
+            distance = None
+        else:
+            distance = len(self.last_use) - self.tree.prefix_sum(time)
+            self.tree.add(time, -1)
+
+        self.tree.add(self.time, 1)
+        self.last_use[line] = self.time
+        self.time += 1
+        return distance
+
+
+    def compact(self):
+        """ Renumber timestamps of the lines so that the tree has free space. """
+
+        # Only the last use of each line is marked. Timestamps are renumbered
+        # in the same order and the tree is resized to twice the number of
+        # lines so that its size doesn't grow with the trace.
+        lines = sorted(self.last_use, key=self.last_use.get)
+        self.last_use = {line: time for time, line in enumerate(lines)}
+        self.time = len(lines)
+        self.tree = fenwick_tree(max(MIN_TREE_SIZE, 2 * self.time), [1] * self.time)
+
+
+class stack_distance:
+    """
+    This is a single-pass analyzer of LRU caches with the same line size.
+
+    Every request of a trace is mapped to the LRU stacks of all set counts at
+    once (Mattson's algorithm). A request hits in an n-way LRU cache if its
+    stack distance in its set is less than n; therefore, the histograms of
+    stack distances give the miss ratios of all capacities and associativities
+    without simulating each of them with sim_cache.
+    """
+
+    def __init__(self, cache_config, max_set_size=None):
+
+        cache_config.set_local_config(self)
+
+        # Set counts are powers of two up to the number of lines in DRAM
+        line_address_size = self.address_size - self.offset_size
+        if max_set_size is None:
+            max_set_size = self.set_size
+        if max_set_size > line_address_size:
+            debug.error("Set size of the analysis cannot exceed {}.".format(line_address_size), -1)
+        self.max_set_size = max_set_size
+
+        # Histograms of stack distances for each set size
+        self.histograms = [Counter() for _ in range(max_set_size + 1)]
+        # Requests whose lines aren't in any stack are compulsory misses for
+        # all caches
+        self.cold_misses = 0
+        self.num_requests = 0
+
+        self.reset()
+
+
+    def reset(self):
+        """ Empty the stacks as if the cache is reset. """
+
+        self.stacks = [[lru_stack() for _ in range(2 ** x)] for x in range(self.max_set_size + 1)]
+
+
+    def access(self, address):
+        """ Add a request of the address to the histograms. """
+
+        line = address >> self.offset_size
+        self.num_requests += 1
+        for set_size, stacks in enumerate(self.stacks):
+            distance = stacks[self.set_index(line, set_size)].access(line)
+            # A line is either in the stacks of all set counts or in none of
+            # them, so the first use of a line is counted once
+            if distance is None:
+                self.cold_misses += 1
+                for other_size in range(set_size + 1, self.max_set_size + 1):
+                    self.stacks[other_size][self.set_index(line, other_size)].access(line)
+                return
+            self.histograms[set_size][distance] += 1
+
+
+    def set_index(self, line, set_size):
+        """ Return the set index of a line address for the set size. """
+
+        set = line & ((1 << set_size) - 1)
+        if OPTS.set_hash == "xor" and set_size:
+            set ^= fold_tag(line >> set_size, set_size)
+        return set
+
+
+    def run(self, addresses):
+        """ Add requests of all addresses to the histograms. """
+
+        for address in addresses:
+            self.access(address)
+
+
+    def num_misses(self, num_rows, num_ways):
+        """ Return the number of misses of an LRU cache. """
+
+        set_size = num_rows.bit_length() - 1
+        if num_rows != 1 << set_size or set_size > self.max_set_size:
+            debug.error("Number of rows must be a power of two up to {}.".format(2 ** self.max_set_size), -1)
+
+        histogram = self.histograms[set_size]
+        return self.cold_misses + sum(count for distance, count in histogram.items() if distance >= num_ways)
+
+
+    def miss_ratio(self, num_rows, num_ways):
+        """ Return the miss ratio of an LRU cache. """
+
+        if not self.num_requests:
+            return 0.0
+        return self.num_misses(num_rows, num_ways) / self.num_requests
+
+
+    def miss_ratio_curve(self, max_ways):
+        """
+        Return the miss ratios of all LRU caches up to max_ways as a dictionary
+        of (total_size, num_ways) tuples. Number of ways are powers of two.
+        """
+
+        curve = {}
+        for set_size in range(self.max_set_size + 1):
+            num_ways = 1
+            while num_ways <= max_ways:
+                total_size = (2 ** set_size) * num_ways * self.line_size
+                curve[(total_size, num_ways)] = self.miss_ratio(2 ** set_size, num_ways)
+                num_ways *= 2
+        return curve
\ No newline at end of file
@@ -5,6 +5,7 @@
 # (acting for and on behalf of Oklahoma State University)
 # All rights reserved.
 #
+from .test_data import OP_CODES, OP_WIDTH, STALL_WIDTH
 from globals import OPTS
 
 
@@ -22,8 +23,10 @@ class test_bench:
         self.failure_message = "Simulation failed."
 
 
-    def test_bench_write(self, tb_path):
-        """ Write the test bench file. """
+    def test_bench_write(self, tb_path, test_size):
+        """ Write the test bench file for a number of test vectors. """
+
+        self.test_size = test_size
 
         self.tbf = open(tb_path, "w")
         self.tbf.write("// Timescale is overwritten when running the EDA tool to prevent bugs\n")
@@ -39,7 +42,7 @@ class test_bench:
         self.write_tasks()
 
         self.tbf.write("  initial begin\n")
-        self.tbf.write("    `include \"test_data.v\"\n")
+        self.tbf.write("    run_tests();\n")
         self.tbf.write("  end\n\n")
         self.tbf.write("endmodule\n")
         self.tbf.close()
@@ -58,14 +61,37 @@ class test_bench:
             self.tbf.write("  parameter  MASK_COUNT    = {};\n".format(self.num_masks))
         self.tbf.write("  parameter  WORD_COUNT    = {};\n".format(self.words_per_line))
         self.tbf.write("  localparam LINE_WIDTH    = WORD_WIDTH * WORD_COUNT;\n\n")
+        # DRAM rows are sectors of lines
+        if self.num_sectors > 1:
+            self.tbf.write("  parameter  SECTOR_COUNT  = {};\n".format(self.num_sectors))
+            self.tbf.write("  localparam SECTOR_WIDTH  = LINE_WIDTH / SECTOR_COUNT;\n\n")
 
         self.tbf.write("  localparam ADDR_WIDTH    = TAG_WIDTH + SET_WIDTH + OFFSET_WIDTH;\n\n")
 
         self.tbf.write("  parameter  CLOCK_DELAY   = 5;\n")
         self.tbf.write("  // Reset is asserted for 1.5 cycles\n")
         self.tbf.write("  parameter  RESET_DELAY   = 15;\n")
-        self.tbf.write("  parameter  DELAY         = 3;\n")
-        self.tbf.write("  parameter  MAX_TEST_SIZE = 64;\n\n")
+        self.tbf.write("  parameter  DELAY         = 3;\n\n")
+
+        self.tbf.write("  // Test vectors are read from the test data file. Each vector consists\n")
+        self.tbf.write("  // of operation, write mask, address, data, and stall count fields.\n")
+        self.tbf.write("  parameter  TEST_SIZE     = {};\n".format(self.test_size))
+        self.tbf.write("  parameter  OP_READ       = {};\n".format(OP_CODES["read"]))
+        self.tbf.write("  parameter  OP_WRITE      = {};\n".format(OP_CODES["write"]))
+        self.tbf.write("  parameter  OP_RESET      = {};\n".format(OP_CODES["reset"]))
+        self.tbf.write("  parameter  OP_FLUSH      = {};\n".format(OP_CODES["flush"]))
+        self.tbf.write("  localparam OP_WIDTH      = {};\n".format(OP_WIDTH))
+        self.tbf.write("  localparam DATA_WIDTH    = {};\n".format("WORD_WIDTH" if self.offset_size else "LINE_WIDTH"))
+        self.tbf.write("  localparam STALL_WIDTH   = {};\n".format(STALL_WIDTH))
+        self.tbf.write("  localparam STALL_LSB     = 0;\n")
+        self.tbf.write("  localparam DATA_LSB      = STALL_LSB + STALL_WIDTH;\n")
+        self.tbf.write("  localparam ADDR_LSB      = DATA_LSB + DATA_WIDTH;\n")
+        if self.num_masks:
+            self.tbf.write("  localparam MASK_LSB      = ADDR_LSB + ADDR_WIDTH;\n")
+            self.tbf.write("  localparam OP_LSB        = MASK_LSB + MASK_COUNT;\n")
+        else:
+            self.tbf.write("  localparam OP_LSB        = ADDR_LSB + ADDR_WIDTH;\n")
+        self.tbf.write("  localparam VECTOR_WIDTH  = OP_LSB + OP_WIDTH;\n\n")
 
 
     def write_registers(self):
@@ -94,24 +120,46 @@ class test_bench:
         self.tbf.write("  wire dram_csb;\n")
         if not OPTS.read_only:
             self.tbf.write("  wire dram_web;\n")
-        self.tbf.write("  wire [ADDR_WIDTH-OFFSET_WIDTH-1:0] dram_addr;\n")
+        if self.dram_num_masks:
+            self.tbf.write("  wire [{}-1:0] dram_wmask;\n".format(self.dram_num_masks))
+        if self.num_sectors > 1:
+            self.tbf.write("  wire [ADDR_WIDTH-OFFSET_WIDTH+{}-1:0] dram_addr;\n".format(self.sector_index_size))
+        else:
+            self.tbf.write("  wire [ADDR_WIDTH-OFFSET_WIDTH-1:0] dram_addr;\n")
+        dram_width = "SECTOR_WIDTH" if self.num_sectors > 1 else "LINE_WIDTH"
         if not OPTS.read_only:
-            self.tbf.write("  wire [LINE_WIDTH-1:0] dram_din;\n\n")
+            self.tbf.write("  wire [{}-1:0] dram_din;\n\n".format(dram_width))
 
         self.tbf.write("  // DRAM output ports\n")
-        self.tbf.write("  wire [LINE_WIDTH-1:0] dram_dout;\n\n")
+        self.tbf.write("  wire [{}-1:0] dram_dout;\n\n".format(dram_width))
         self.tbf.write("  wire dram_stall;\n")
 
         self.tbf.write("  // Test registers\n")
-        self.tbf.write("  reg [MAX_TEST_SIZE-1:0] error_count;\n\n")
+        self.tbf.write("  reg [VECTOR_WIDTH-1:0] vectors [0:TEST_SIZE-1];\n")
+        self.tbf.write("  reg [VECTOR_WIDTH-1:0] vector;\n")
+        self.tbf.write("  integer test_count;\n")
+        self.tbf.write("  integer error_count;\n\n")
 
 
     def write_dumps(self):
         """ Write the $dumpfile and $dumpvars system functions for waveforms. """
 
+        if not OPTS.dump_waves:
+            return
+
+        self.tbf.write("  // Waveform dump\n")
         self.tbf.write("  initial begin\n")
-        self.tbf.write("    $dumpfile(\"waves.vcd\");\n")
-        self.tbf.write("    $dumpvars;\n")
+        self.tbf.write("    $dumpfile(\"waves.{}\");\n".format(OPTS.dump_format))
+        for scope in OPTS.dump_scopes or ["test_bench"]:
+            self.tbf.write("    $dumpvars({0}, {1});\n".format(OPTS.dump_depth, scope))
+        # Dump only in the given time window
+        if OPTS.dump_start:
+            self.tbf.write("    $dumpoff;\n")
+            self.tbf.write("    #({});\n".format(OPTS.dump_start))
+            self.tbf.write("    $dumpon;\n")
+        if OPTS.dump_end is not None:
+            self.tbf.write("    #({});\n".format(OPTS.dump_end - OPTS.dump_start))
+            self.tbf.write("    $dumpoff;\n")
         self.tbf.write("  end\n\n")
 
 
@@ -141,6 +189,20 @@ class test_bench:
         self.tbf.write("    error_count = 0;\n")
         self.tbf.write("  end\n\n")
 
+        # Intra-assignment delays block the test in some simulators such as
+        # Verilator. Therefore, signals are deasserted by separate blocks.
+        self.tbf.write("  // Deassert reset after DELAY\n")
+        self.tbf.write("  always @(posedge rst) begin\n")
+        self.tbf.write("    #(DELAY);\n")
+        self.tbf.write("    rst <= 0;\n")
+        self.tbf.write("  end\n\n")
+        if OPTS.has_flush:
+            self.tbf.write("  // Deassert flush after DELAY\n")
+            self.tbf.write("  always @(posedge cache_flush) begin\n")
+            self.tbf.write("    #(DELAY);\n")
+            self.tbf.write("    cache_flush <= 0;\n")
+            self.tbf.write("  end\n\n")
+
 
     def write_instances(self):
         """ Write the module instances of the cache and DRAM. """
@@ -163,6 +225,8 @@ class test_bench:
         self.tbf.write("    .main_csb   (dram_csb),\n")
         if not OPTS.read_only:
             self.tbf.write("    .main_web   (dram_web),\n")
+        if self.dram_num_masks:
+            self.tbf.write("    .main_wmask (dram_wmask),\n")
         self.tbf.write("    .main_addr  (dram_addr),\n")
         if not OPTS.read_only:
             self.tbf.write("    .main_din   (dram_din),\n")
@@ -174,9 +238,13 @@ class test_bench:
         self.tbf.write("    .clk   (clk),\n")
         self.tbf.write("    .rst   (rst),\n")
         self.tbf.write("    .csb   (dram_csb),\n")
-        self.tbf.write("    .web   (dram_web),\n")
+        # Instruction caches never write to DRAM
+        self.tbf.write("    .web   ({}),\n".format("1'b1" if OPTS.read_only else "dram_web"))
+        if self.dram_num_masks:
+            self.tbf.write("    .wmask (dram_wmask),\n")
         self.tbf.write("    .addr  (dram_addr),\n")
-        self.tbf.write("    .din   (dram_din),\n")
+        dram_width = "SECTOR_WIDTH" if self.num_sectors > 1 else "LINE_WIDTH"
+        self.tbf.write("    .din   ({}),\n".format("{" + dram_width + "{1'b0}}" if OPTS.read_only else "dram_din"))
         self.tbf.write("    .dout  (dram_dout),\n")
         self.tbf.write("    .stall (dram_stall)\n")
         self.tbf.write("  );\n\n")
@@ -191,7 +259,6 @@ class test_bench:
         self.tbf.write("    // Reset is asserted just before a posedge of the clock.\n")
         self.tbf.write("    // Therefore, it is enough to assert it for DELAY.\n")
         self.tbf.write("    rst <= 1;\n")
-        self.tbf.write("    rst <= #(DELAY) 0;\n")
         self.tbf.write("    end\n")
         self.tbf.write("  endtask\n\n")
 
@@ -202,14 +269,13 @@ class test_bench:
             self.tbf.write("    // Flush is asserted just before a posedge of the clock.\n")
             self.tbf.write("    // Therefore, it is enough to assert it for DELAY.\n")
             self.tbf.write("    cache_flush <= 1;\n")
-            self.tbf.write("    cache_flush <= #(DELAY) 0;\n")
             self.tbf.write("    end\n")
             self.tbf.write("  endtask\n\n")
 
         self.tbf.write("  // Check for a number of stall cycles starting from the current cycle\n")
         self.tbf.write("  task check_stall;\n")
         self.tbf.write("    input integer cycle_count;\n")
-        self.tbf.write("    input [MAX_TEST_SIZE-1:0] test_count;\n")
+        self.tbf.write("    input integer test_count;\n")
         self.tbf.write("    integer i;\n")
         self.tbf.write("    begin\n")
         self.tbf.write("      for (i = 1; i <= cycle_count; i = i + 1) begin\n")
@@ -224,8 +290,8 @@ class test_bench:
 
         self.tbf.write("  // Output of the cache must match the expected\n")
         self.tbf.write("  task check_dout;\n")
-        self.tbf.write("    input [{}-1:0] dout_expected;\n".format("WORD_WIDTH" if self.offset_size else "LINE_WIDTH"))
-        self.tbf.write("    input [MAX_TEST_SIZE-1:0] test_count;\n")
+        self.tbf.write("    input [DATA_WIDTH-1:0] dout_expected;\n")
+        self.tbf.write("    input integer test_count;\n")
         self.tbf.write("    begin\n")
         self.tbf.write("      if (cache_dout !== dout_expected) begin\n")
         self.tbf.write("        $display(\"Error at test #%0d! Expected: %d, Received: %d\", test_count, dout_expected, cache_dout);\n")
@@ -243,4 +309,42 @@ class test_bench:
         self.tbf.write("        $display(\"{} Error count: %0d\", error_count);\n".format(self.failure_message))
         self.tbf.write("      end\n")
         self.tbf.write("    end\n")
+        self.tbf.write("  endtask\n\n")
+
+        self.tbf.write("  // Apply test vectors and check the outputs\n")
+        self.tbf.write("  task run_tests;\n")
+        self.tbf.write("    begin\n")
+        self.tbf.write("      $readmemh(\"test_data.hex\", vectors);\n\n")
+        self.tbf.write("      // Initial delay to align with the cache and SRAMs.\n")
+        self.tbf.write("      // SRAMs return data at the negedge of the clock.\n")
+        self.tbf.write("      // Therefore, cache's output will be valid after the negedge.\n")
+        self.tbf.write("      #(CLOCK_DELAY + DELAY + 1);\n\n")
+        self.tbf.write("      for (test_count = 0; test_count < TEST_SIZE; test_count = test_count + 1) begin\n")
+        self.tbf.write("        vector = vectors[test_count];\n")
+        self.tbf.write("        case (vector[OP_LSB +: OP_WIDTH])\n")
+        self.tbf.write("          OP_RESET: assert_reset();\n")
+        if OPTS.has_flush:
+            self.tbf.write("          OP_FLUSH: assert_flush();\n")
+        self.tbf.write("          default: begin\n")
+        self.tbf.write("            cache_csb   = 0;\n")
+        if not OPTS.read_only:
+            self.tbf.write("            cache_web   = vector[OP_LSB +: OP_WIDTH] != OP_WRITE;\n")
+        if self.num_masks:
+            self.tbf.write("            cache_wmask = vector[MASK_LSB +: MASK_COUNT];\n")
+        self.tbf.write("            cache_addr  = vector[ADDR_LSB +: ADDR_WIDTH];\n")
+        if not OPTS.read_only:
+            self.tbf.write("            if (vector[OP_LSB +: OP_WIDTH] == OP_WRITE)\n")
+            self.tbf.write("              cache_din = vector[DATA_LSB +: DATA_WIDTH];\n")
+        self.tbf.write("          end\n")
+        self.tbf.write("        endcase\n\n")
+        self.tbf.write("        // Wait for 1 cycle so that cache will receive the request\n")
+        self.tbf.write("        #(CLOCK_DELAY * 2);\n\n")
+        self.tbf.write("        check_stall(vector[STALL_LSB +: STALL_WIDTH], test_count);\n\n")
+        self.tbf.write("        // Check read request after stalls\n")
+        self.tbf.write("        if (vector[OP_LSB +: OP_WIDTH] == OP_READ)\n")
+        self.tbf.write("          check_dout(vector[DATA_LSB +: DATA_WIDTH], test_count);\n")
+        self.tbf.write("      end\n\n")
+        self.tbf.write("      end_simulation();\n")
+        self.tbf.write("      $finish;\n")
+        self.tbf.write("    end\n")
         self.tbf.write("  endtask\n\n")
\ No newline at end of file
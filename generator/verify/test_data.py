@@ -5,161 +5,354 @@
 # (acting for and on behalf of Oklahoma State University)
 # All rights reserved.
 #
-from random import randrange, choice
+from itertools import islice
+from random import Random
+from policy import write_policy as wp
+from .coverage import coverage
+from .miss_stats import miss_stats
 from globals import OPTS
 
+# Number of operations simulated by sim_cache at once
+CHUNK_SIZE = 4096
+# Number of sets used by directed test data so that ways are replaced often
+DIRECTED_SETS = 4
+# Number of tries to find a tag which is not in a set
+MAX_TAG_TRIES = 16
+
+# Operation codes in test vectors
+OP_CODES = {
+    "read": 0,
+    "write": 1,
+    "reset": 2,
+    "flush": 3,
+}
+# Bit widths of fields in test vectors
+OP_WIDTH = 2
+STALL_WIDTH = 32
+
+
+class address_pool:
+    """
+    This is a list of addresses from which a random address can be removed in
+    constant time.
+    """
+
+    def __init__(self, rng):
+
+        self.rng = rng
+        self.addresses = []
+
+
+    def __len__(self):
+
+        return len(self.addresses)
+
+
+    def append(self, address):
+        """ Add an address to the pool. """
+
+        self.addresses.append(address)
+
+
+    def pop_random(self):
+        """ Remove a random address from the pool and return it. """
+
+        # Swap the random address with the last one so that it can be popped
+        # without shifting the list
+        idx = self.rng.randrange(len(self.addresses))
+        self.addresses[idx], self.addresses[-1] = self.addresses[-1], self.addresses[idx]
+        return self.addresses.pop()
+
 
 class test_data:
     """
     Class to generate the test data file for simulation.
+
+    Operations are generated, simulated, and written one chunk at a time so
+    that memory usage doesn't grow with the test size.
     """
 
-    def __init__(self, sim_cache, cache_config):
+    def __init__(self, sim_cache, cache_config, seed=None):
 
         cache_config.set_local_config(self)
         self.sc = sim_cache
 
+        # Test data has its own random number generator so that operations
+        # only depend on the seed
+        self.rng = Random(None if seed is None else "{}:data".format(seed))
+
+        self.num_operations = 0
+
+        # Functional coverage is sampled by sim_cache
+        self.coverage = coverage(cache_config)
+        self.sc.coverage = self.coverage
+        # Hits and misses are sampled by sim_cache as well
+        self.stats = miss_stats(cache_config)
+        self.sc.stats = self.stats
+
 
     def generate_data(self, test_size=16):
-        """ Generate random test data and expected outputs. """
-
-        # Operation
-        self.op = []
-        # Write enable
-        self.web = []
-        # Write mask
-        self.wmask = []
-        # Address
-        self.addr = []
-        # Data input/output
-        self.data = []
-        # Number of stall cycles during the request
-        self.stall = []
+        """ Prepare the pipeline of random test data and expected outputs. """
+
+        # Operations are generated lazily while writing the test data file
+        self.num_operations = 0
+        if OPTS.stimulus == "directed":
+            # Each operation is simulated before the next one is generated so
+            # that directed operations are based on the current state
+            self.operations = self.simulate(self.generate_directed_operations(test_size), 1)
+        else:
+            self.operations = self.simulate(self.generate_operations(test_size))
+
 
-        self.add_operation("reset")
+    def generate_operations(self, test_size):
+        """ Yield random operations. """
+
+        yield self.make_operation("reset")
 
         # Write and flush only when it's a data cache
         if not OPTS.read_only:
+            addresses = address_pool(self.rng)
+
             # Write random data to random addresses initially
             for i in range(test_size):
-                self.add_operation("write")
+                operation = self.make_operation("write")
+                addresses.append(operation[2])
+                yield operation
 
             if OPTS.has_flush:
-                self.add_operation("flush")
-
-            addresses = []
-            for i in range(len(self.op)):
-                if self.op[i] == "write":
-                    addresses.append(self.addr[i])
+                yield self.make_operation("flush")
 
             # Read from random addresses which are written to in the first half
             while len(addresses) > 0:
-                self.add_operation("read", addresses)
-                addresses.remove(self.addr[-1])
+                yield self.make_operation("read", addresses.pop_random())
         else:
             # Read random data from random addresses
             for i in range(test_size):
-                self.add_operation("read")
-
-        # Simulate the cache with sequence operations
-        for i in range(len(self.op)):
-            self.run_sim_cache(i)
-
-
-    def add_operation(self, op, addr_list=None):
-        """ Add a new operation with random address and data. """
-
-        # Operation
-        self.op.append(op)
-        # Write enable
-        self.web.append(int(op != "write"))
+                yield self.make_operation("read")
+
+
+    def generate_directed_operations(self, test_size):
+        """ Yield operations directed towards uncovered coverage bins. """
+
+        yield self.make_operation("reset")
+
+        count = 0
+        while count < test_size:
+            # Try to cover a random uncovered bin
+            uncovered = self.coverage.uncovered()
+            if uncovered:
+                for operation in self.direct(self.rng.choice(uncovered)):
+                    yield operation
+                    count += 1
+                if count >= test_size:
+                    break
+
+            # Send a random request to change the state of the cache
+            yield self.make_operation(self.random_op(), self.random_address())
+            count += 1
+
+
+    def direct(self, bin):
+        """
+        Yield operations which are expected to cover the bin. Nothing is
+        yielded if the bin cannot be covered in the current state.
+        """
+
+        if bin == ("flush", "hazard"):
+            # Flush right after a request to set 0
+            yield self.make_operation(self.random_op(), self.random_address(0))
+            yield self.make_operation("flush")
+        elif bin[1] == "hit":
+            address = self.hit_address(bin[2])
+            if address is not None:
+                yield self.make_operation(bin[0], address)
+        elif bin[1] == "sector_miss":
+            address = self.sector_miss_address(bin[2])
+            if address is not None:
+                yield self.make_operation(bin[0], address)
+        elif bin[1] == "write_around":
+            address = self.miss_address()
+            if address is not None:
+                yield self.make_operation("write", address)
+        elif bin[1].endswith("miss"):
+            address = self.miss_address(bin[2], bin[1] == "dirty_miss")
+            if address is not None:
+                yield self.make_operation(bin[0], address)
+        elif bin[1] == "hazard":
+            # Send two requests to the same set
+            operation = self.make_operation(self.random_op(), self.random_address())
+            yield operation
+            yield self.make_operation(bin[0], self.random_address(self.sc.decode(operation[2]).set))
+        elif bin[1] == "dram_busy":
+            if OPTS.write_policy == wp.WRITE_THROUGH:
+                # DRAM is busy after a write
+                yield self.make_operation("write", self.random_address())
+            elif not OPTS.write_allocate:
+                # DRAM is busy after a write miss which isn't allocated
+                address = self.miss_address()
+                if address is not None:
+                    yield self.make_operation("write", address)
+            else:
+                # DRAM is busy after flushing a dirty line of the last set
+                yield self.make_operation("write", self.random_address(self.num_rows - 1))
+                yield self.make_operation("flush")
+            # Only misses and writes wait for DRAM
+            address = self.miss_address()
+            if address is not None:
+                yield self.make_operation(bin[0], address)
+
+
+    def random_op(self):
+        """ Return a random request type. """
+
+        if OPTS.read_only:
+            return "read"
+        return self.rng.choice(["read", "write"])
+
+
+    def random_address(self, set=None):
+        """ Return a random address in the given set or in a directed set. """
+
+        if set is None:
+            set = self.rng.randrange(min(DIRECTED_SETS, self.num_rows))
+        return self.sc.merge_address(self.rng.randrange(2 ** self.tag_size),
+                                     set,
+                                     self.rng.randrange(2 ** self.offset_size))
+
+
+    def hit_address(self, way):
+        """ Return a random address which hits the way of a directed set. """
+
+        sets = [x for x in range(min(DIRECTED_SETS, self.num_rows)) if self.sc.sram.read_valid(x, way)]
+        if not sets:
+            return None
+
+        set = self.rng.choice(sets)
+        # Offset must be in a valid sector of the line
+        valid = self.sc.sram.read_valid(set, way)
+        offsets = [x for x in range(2 ** self.offset_size) if (valid >> (x // self.words_per_sector)) & 1]
+        return self.sc.merge_address(self.sc.sram.read_tag(set, way),
+                                     set,
+                                     self.rng.choice(offsets))
+
+
+    def sector_miss_address(self, way):
+        """
+        Return a random address whose line is in the way of a directed set
+        without its sector.
+        """
+
+        full = (1 << self.num_sectors) - 1
+        sets = [x for x in range(min(DIRECTED_SETS, self.num_rows)) if self.sc.sram.read_valid(x, way) not in (0, full)]
+        if not sets:
+            return None
+
+        set = self.rng.choice(sets)
+        # Offset must be in an invalid sector of the line
+        valid = self.sc.sram.read_valid(set, way)
+        offsets = [x for x in range(2 ** self.offset_size) if not (valid >> (x // self.words_per_sector)) & 1]
+        return self.sc.merge_address(self.sc.sram.read_tag(set, way),
+                                     set,
+                                     self.rng.choice(offsets))
+
+
+    def miss_address(self, way=None, is_dirty=None):
+        """
+        Return a random address which misses in a directed set. If the way is
+        given, the way to evict must match it. If is_dirty is given, the dirty
+        bit of the way to evict must match it.
+        """
+
+        sets = []
+        for set in range(min(DIRECTED_SETS, self.num_rows)):
+            evicted_way = self.sc.way_to_evict(set)
+            if way is not None and evicted_way != way:
+                continue
+            if is_dirty is not None and bool(self.sc.sram.read_dirty(set, evicted_way)) != is_dirty:
+                continue
+            sets.append(set)
+        if not sets:
+            return None
+
+        set = self.rng.choice(sets)
+        for _ in range(MAX_TAG_TRIES):
+            address = self.random_address(set)
+            if self.sc.find_way(address) is None:
+                return address
+        return None
+
+
+    def make_operation(self, op, address=None):
+        """
+        Return a new operation with random address and data.
+        Operations are tuples of operation, write mask, address, and data.
+        """
 
         # Address
-        if addr_list is None:
-            random_tag = randrange(2 ** self.tag_size)
+        if address is None:
+            random_tag = self.rng.randrange(2 ** self.tag_size)
             # Write to first two sets only so that we can test replacement
-            random_set = randrange(2)
-            random_offset = randrange(2 ** self.offset_size)
-            self.addr.append(self.sc.merge_address(random_tag, random_set, random_offset))
-        else:
-            self.addr.append(choice(addr_list))
+            random_set = self.rng.randrange(2)
+            random_offset = self.rng.randrange(2 ** self.offset_size)
+            address = self.sc.merge_address(random_tag, random_set, random_offset)
 
         if op == "write":
             # Write mask
-            self.wmask.append("".join(
-                [choice(["1", "0"]) for _ in range(self.num_masks)]
-            ))
+            wmask = "".join([self.rng.choice(["1", "0"]) for _ in range(self.num_masks)])
             # Data input
-            self.data.append(randrange(1, 2 ** (self.word_size if self.offset_size else self.line_size)))
+            data = self.rng.randrange(1, 2 ** (self.word_size if self.offset_size else self.line_size))
         else:
             # Write mask
-            self.wmask.append("0" * self.num_masks)
+            wmask = "0" * self.num_masks
             # Data output
             # This will be overwritten when running the sim_cache
-            self.data.append(0)
+            data = 0
 
-        # Number of stall cycles during the operation
-        # This will be overwritten when running the sim_cache
-        self.stall.append(0)
+        return (op, wmask, address, data)
 
 
-    def run_sim_cache(self, op_idx):
-        """ Run the sim_cache for the operation in the given index. """
+    def simulate(self, operations, chunk_size=CHUNK_SIZE):
+        """
+        Run the sim_cache for operations in chunks and yield each operation
+        with its expected output and number of stall cycles.
+        """
 
-        if self.op[op_idx] == "reset":
-            self.stall[op_idx] = self.sc.reset()
-        elif self.op[op_idx] == "flush":
-            self.stall[op_idx] = self.sc.flush()
-        else:
-            self.stall[op_idx] = self.sc.stall_cycles(self.addr[op_idx], self.op[op_idx] == "write")
-            if self.op[op_idx] == "read":
+        chunk = list(islice(operations, chunk_size))
+        while chunk:
+            ops, wmasks, addresses, data = zip(*chunk)
+            dout, stalls = self.sc.run_batch(ops, addresses, wmasks, data)
+            for i in range(len(chunk)):
                 # Overwrite data for read to prevent bugs
                 # NOTE: If the same address is written twice, this data
                 # could be old.
-                self.data[op_idx] = self.sc.read(self.addr[op_idx])
-            elif self.op[op_idx] == "write":
-                self.sc.write(self.addr[op_idx], self.wmask[op_idx], self.data[op_idx])
+                yield (ops[i],
+                       wmasks[i],
+                       addresses[i],
+                       dout[i] if ops[i] == "read" else data[i],
+                       stalls[i])
+                self.num_operations += 1
+            chunk = list(islice(operations, chunk_size))
 
 
     def test_data_write(self, data_path):
-        """ Write the test data file. """
+        """
+        Write the test data file.
+        Each line of the file is a test vector in hexadecimal which is read by
+        the test bench with $readmemh.
+        """
 
-        test_count = 0
+        # Field widths of the test vector
+        data_size = self.word_size if self.offset_size else self.line_size
+        vector_size = OP_WIDTH + self.num_masks + self.address_size + data_size + STALL_WIDTH
 
         with open(data_path, "w") as file:
-            file.write("// Initial delay to align with the cache and SRAMs.\n")
-            file.write("// SRAMs return data at the negedge of the clock.\n")
-            file.write("// Therefore, cache's output will be valid after the negedge.\n")
-            file.write("#(CLOCK_DELAY + DELAY + 1);\n\n")
-
-            # Check requests
-            for i in range(len(self.op)):
-                file.write("// {0} operation (Test #{1})\n".format(self.op[i].capitalize(),
-                                                                   test_count))
-
-                if self.op[i] == "reset" or self.op[i] == "flush":
-                    file.write("assert_{}();\n".format(self.op[i]))
-                else:
-                    file.write("cache_csb   = 0;\n")
-                    if not OPTS.read_only:
-                        file.write("cache_web   = {};\n".format(self.web[i]))
-                    if self.num_masks:
-                        file.write("cache_wmask = {0}'b{1};\n".format(self.num_masks, self.wmask[i]))
-                    file.write("cache_addr  = {};\n".format(self.addr[i]))
-                    if not self.web[i]:
-                        file.write("cache_din   = {};\n".format(self.data[i]))
-
-                # Wait for 1 cycle so that cache will receive the request
-                file.write("\n#(CLOCK_DELAY * 2);\n\n")
-
-                if self.stall[i]:
-                    file.write("check_stall({0}, {1});\n\n".format(self.stall[i], test_count))
-
-                # Check read request after stalls
-                if self.op[i] == "read":
-                    file.write("check_dout({0}, {1});\n\n".format(self.data[i], test_count))
-
-                test_count += 1
-
-            file.write("end_simulation();\n")
-            file.write("$finish;\n")
\ No newline at end of file
+            for op, wmask, address, data, stall in self.operations:
+                # Fields are concatenated as operation, write mask, address,
+                # data, and stall count from MSB to LSB
+                vector = OP_CODES[op]
+                if self.num_masks:
+                    vector = (vector << self.num_masks) | int(wmask, 2)
+                vector = (vector << self.address_size) | address
+                vector = (vector << data_size) | data
+                vector = (vector << STALL_WIDTH) | stall
+                file.write("{0:0{1}x}\n".format(vector, (vector_size + 3) // 4))
\ No newline at end of file
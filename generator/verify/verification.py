@@ -7,6 +7,10 @@
 #
 import os
 import datetime
+import random
+import multiprocessing
+import queue
+import traceback
 from shutil import copyfile
 from subprocess import call, DEVNULL, STDOUT
 from re import findall
@@ -14,9 +18,24 @@ from .core import core
 from .test_bench import test_bench
 from .test_data import test_data
 from .sim_cache import sim_cache
+from .coverage import coverage
+from .miss_stats import miss_stats
+from .sram_verilog import sram_verilog
+from .amaranth_sim import amaranth_sim
 import debug
 from globals import OPTS, print_time
 
+# Options written to the replay config of a failed simulation
+REPLAY_OPTIONS = ["total_size", "word_size", "words_per_line", "address_size",
+                  "write_size", "num_ways", "policy_plugins",
+                  "replacement_policy", "random_generator", "lfsr_size",
+                  "write_policy", "write_allocate", "num_sectors", "read_only",
+                  "return_type", "set_hash", "has_flush", "data_hazard",
+                  "output_name", "sram_model", "sim_tool", "sim_size",
+                  "stimulus", "lockstep", "seed"]
+# Seconds to wait for a shard result before checking if shards crashed
+RESULT_TIMEOUT = 1
+
 
 class verification:
     """
@@ -27,13 +46,17 @@ class verification:
     def __init__(self, cache_config, name):
 
         cache_config.set_local_config(self)
+        self.cache_config = cache_config
         self.name = name
 
         self.core = core()
         if OPTS.simulate:
             self.tb = test_bench(cache_config, name)
-            self.sim_cache = sim_cache(cache_config)
-            self.data = test_data(self.sim_cache, cache_config)
+            self.sim_cache = sim_cache(cache_config, OPTS.seed)
+            self.data = test_data(self.sim_cache, cache_config, OPTS.seed)
+            # Shards make their own simulations
+            if OPTS.sim_tool == "amaranth" and OPTS.num_shards == 1:
+                self.sim = amaranth_sim(cache_config, name, self.sim_cache)
 
         # Print subprocess outputs on the terminal if verbose debug is enabled
         self.stdout = None if OPTS.verbose_level >= 2 else DEVNULL
@@ -45,9 +68,22 @@ class verification:
 
         debug.print_raw("Initializing verification...")
 
-        self.prepare_files()
         if OPTS.simulate:
-            self.simulate()
+            debug.info(1, "Seed of the test data: {}".format(OPTS.seed))
+
+        if OPTS.lockstep and OPTS.sim_tool != "amaranth":
+            debug.warning("Lockstep checking is only supported by the Amaranth simulation.")
+
+        # Amaranth simulation doesn't need any file
+        if OPTS.synthesize or (OPTS.simulate and OPTS.sim_tool != "amaranth"):
+            self.prepare_files()
+        if OPTS.simulate:
+            if OPTS.num_shards > 1:
+                self.simulate_shards()
+            elif OPTS.sim_tool == "amaranth":
+                self.simulate_amaranth()
+            else:
+                self.simulate()
         if OPTS.synthesize:
             self.synthesize()
 
@@ -69,27 +105,185 @@ class verification:
         debug.info(1, "Verilog (DRAM): Writing to {}".format(dram_path))
         self.sim_cache.dram.sim_dram_write(dram_path)
 
-        # Write the test bench file
-        tb_path = OPTS.temp_path + "test_bench.v"
-        debug.info(1, "Verilog (Test bench): Writing to {}".format(tb_path))
-        self.tb.test_bench_write(tb_path)
-
         # Write the test data file
-        data_path = OPTS.temp_path + "test_data.v"
-        debug.info(1, "Verilog (Test data): Writing to {}".format(data_path))
+        data_path = OPTS.temp_path + "test_data.hex"
+        debug.info(1, "Test data: Writing to {}".format(data_path))
         self.data.generate_data(OPTS.sim_size)
         self.data.test_data_write(data_path)
 
+        # Write the test bench file
+        tb_path = OPTS.temp_path + "test_bench.v"
+        debug.info(1, "Verilog (Test bench): Writing to {}".format(tb_path))
+        self.tb.test_bench_write(tb_path, self.data.num_operations)
+
         # Run FuseSoc for simulation
         debug.info(1, "Running FuseSoC for simulation...")
-        self.run_fusesoc(self.name, self.core.core_name, OPTS.temp_path, True)
+        if OPTS.sim_tool == "verilator":
+            # Verilator doesn't write a log file. Therefore, the output of the
+            # simulation is saved instead.
+            log_path = OPTS.temp_path + "verilator.log"
+            self.run_fusesoc(self.name, self.core.core_name, OPTS.temp_path, True, log_path)
+        else:
+            log_path = "{0}build/{1}/sim-icarus/icarus.log".format(OPTS.temp_path,
+                                                                    self.core.core_name.replace(":", "_"))
+            self.run_fusesoc(self.name, self.core.core_name, OPTS.temp_path, True)
+
+        # Check the result of the simulation
+        if not self.check_sim_result(log_path):
+            self.write_replay_config()
+            debug.error("Simulation failed!", -1)
+        debug.info(1, "Simulation successful.")
+        self.report_coverage(self.data.coverage)
+        self.report_stats(self.data.stats)
+
+        print_time("Simulation", datetime.datetime.now(), start_time)
+
+
+    def simulate_amaranth(self):
+        """
+        Simulate the design with behavioral SRAM and DRAM models by using
+        Amaranth's simulator.
+        """
+        debug.info(1, "Initializing simulation with Amaranth...")
+
+        start_time = datetime.datetime.now()
+
+        self.data.generate_data(OPTS.sim_size)
+        error_count = self.sim.simulate(self.data.operations)
 
         # Check the result of the simulation
-        self.check_sim_result(OPTS.temp_path, "icarus.log")
+        if error_count:
+            self.write_replay_config()
+            debug.error("Simulation failed! Error count: {}".format(error_count), -1)
+        debug.info(1, "Simulation successful.")
+        self.report_coverage(self.data.coverage)
+        self.report_stats(self.data.stats)
 
         print_time("Simulation", datetime.datetime.now(), start_time)
 
 
+    def simulate_shards(self):
+        """
+        Split the simulation into shards with different random test data and
+        run them in parallel.
+        """
+        debug.info(1, "Initializing simulation in {} shards...".format(OPTS.num_shards))
+
+        start_time = datetime.datetime.now()
+
+        # Each shard has its own seed so that they don't test the same data
+        rng = random.Random(OPTS.seed)
+        seeds = [rng.getrandbits(32) for _ in range(OPTS.num_shards)]
+
+        # Child processes are forked so that they inherit the options and the
+        # files prepared so far
+        context = multiprocessing.get_context("fork")
+        results = context.Queue()
+        num_slots = min(OPTS.num_shards, os.cpu_count())
+        pending = list(range(OPTS.num_shards))
+        running = {}
+        processes = []
+
+        # Start shards when there are free slots and aggregate their results
+        failed = []
+        num_operations = 0
+        total_coverage = coverage(self.cache_config)
+        total_stats = miss_stats(self.cache_config)
+        while pending or running:
+            while pending and len(running) < num_slots:
+                shard = pending.pop(0)
+                running[shard] = context.Process(target=self.simulate_shard,
+                                                 args=(shard, seeds[shard], results))
+                running[shard].start()
+                processes.append(running[shard])
+            try:
+                shard, passed, shard_operations, covered, stats = results.get(timeout=RESULT_TIMEOUT)
+            except queue.Empty:
+                # Results are put before child processes exit. If a shard has
+                # exited and no result is left, it crashed without putting one.
+                for shard, process in list(running.items()):
+                    if process.exitcode is not None and results.empty():
+                        debug.warning("Shard #{0} exited with code {1} without a result.".format(shard, process.exitcode))
+                        del running[shard]
+                        failed.append(shard)
+                continue
+            del running[shard]
+            num_operations += shard_operations
+            total_coverage.merge(covered)
+            total_stats.merge(stats)
+            if not passed:
+                failed.append(shard)
+        for process in processes:
+            process.join()
+
+        for shard in sorted(failed):
+            debug.info(1, "Shard #{0} with seed {1} failed in {2}".format(shard,
+                                                                         seeds[shard],
+                                                                         self.shard_path(shard)))
+        if failed:
+            debug.error("Simulation failed! {0} of {1} shards failed.".format(len(failed), OPTS.num_shards), -1)
+        debug.info(1, "Simulation successful. {0} operations in {1} shards.".format(num_operations, OPTS.num_shards))
+        self.report_coverage(total_coverage)
+        self.report_stats(total_stats)
+
+        print_time("Simulation", datetime.datetime.now(), start_time)
+
+
+    def simulate_shard(self, shard, seed, results):
+        """ Simulate a shard in a child process and put its result to the queue. """
+
+        # Options are changed only in this process
+        parent_path = OPTS.temp_path
+        path = self.shard_path(shard)
+        OPTS.temp_path = path
+        OPTS.sim_size = OPTS.sim_size // OPTS.num_shards + (shard < OPTS.sim_size % OPTS.num_shards)
+        OPTS.num_shards = 1
+        OPTS.seed = seed
+
+        passed = False
+        data = None
+        try:
+            self.sim_cache = sim_cache(self.cache_config, seed)
+            self.data = data = test_data(self.sim_cache, self.cache_config, seed)
+
+            os.makedirs(path, exist_ok=True)
+            # Copy the files prepared for all shards
+            for file in os.listdir(parent_path):
+                if os.path.isfile(parent_path + file):
+                    copyfile(parent_path + file, path + file)
+
+            if OPTS.sim_tool == "amaranth":
+                self.sim = amaranth_sim(self.cache_config, self.name, self.sim_cache)
+                self.simulate_amaranth()
+            else:
+                self.simulate()
+            passed = True
+        # Failures are reported by debug.error
+        except AssertionError:
+            pass
+        # Other exceptions fail the shard instead of stopping the child
+        # process before it puts its result
+        except Exception:
+            debug.warning("Shard #{0} raised an exception:\n{1}".format(shard, traceback.format_exc()))
+        finally:
+            # The parent waits for a result from each shard; therefore, empty
+            # results are put if the test data couldn't be made
+            if data is None:
+                results.put((shard, False, 0, [], miss_stats(self.cache_config).summary()))
+            else:
+                results.put((shard,
+                             passed,
+                             data.num_operations,
+                             data.coverage.covered(),
+                             data.stats.summary()))
+
+
+    def shard_path(self, shard):
+        """ Return the temp path of a shard. """
+
+        return "{0}shard{1}/".format(OPTS.temp_path, shard)
+
+
     def synthesize(self):
         """
         Save required files and synthesize the design by running an EDA tool's
@@ -100,11 +294,11 @@ class verification:
         start_time = datetime.datetime.now()
 
         # Convert SRAM modules to blackbox
-        debug.info(1, "Converting OpenRAM modules to blackbox...")
-        self.convert_to_blacbox(OPTS.temp_path + OPTS.tag_array_name + ".v")
-        self.convert_to_blacbox(OPTS.temp_path + OPTS.data_array_name + ".v")
-        if OPTS.replacement_policy.has_sram_array():
-            self.convert_to_blacbox(OPTS.temp_path + OPTS.use_array_name + ".v")
+        # Blackbox modules of behavioral SRAMs are already written
+        if OPTS.sram_model != "behavioral":
+            debug.info(1, "Converting OpenRAM modules to blackbox...")
+            for array_name in self.array_names():
+                self.convert_to_blacbox(OPTS.temp_path + array_name + ".v")
 
         # Run FuseSoc for synthesis
         debug.info(1, "Running FuseSoC for synthesis...")
@@ -129,7 +323,14 @@ class verification:
         debug.info(1, "Copying the cache design file to the temp subfolder")
         copyfile(OPTS.output_path + self.name + ".v", cache_path)
 
-        if OPTS.run_openram:
+        if OPTS.sram_model == "behavioral":
+            # Write behavioral SRAM modules instead of running OpenRAM
+            for array_name in self.array_names():
+                debug.info(1, "Writing the behavioral SRAM module of {}...".format(array_name))
+                sram = sram_verilog(OPTS.output_path + array_name + "_config.py")
+                sram.sram_write(OPTS.temp_path + array_name + ".v")
+                sram.blackbox_write(OPTS.temp_path + array_name + "_bb.v")
+        elif OPTS.run_openram:
             # Copy the configuration files
             debug.info(1, "Copying the config files to the temp subfolder")
             self.copy_config_file(OPTS.data_array_name + "_config.py", OPTS.temp_path)
@@ -154,6 +355,16 @@ class verification:
             debug.info(1, "Skipping to run OpenRAM")
 
 
+    def array_names(self):
+        """ Return the module names of internal SRAM arrays. """
+
+        names = [OPTS.tag_array_name, OPTS.data_array_name]
+        # Random replacement policy doesn't need a separate SRAM array
+        if OPTS.replacement_policy.has_sram_array():
+            names.append(OPTS.use_array_name)
+        return names
+
+
     def run_openram(self, config_path):
         """ Run OpenRAM to generate Verilog modules. """
 
@@ -173,8 +384,11 @@ class verification:
                     os.remove(file_path)
 
 
-    def run_fusesoc(self, library_name, core_name, path, is_sim):
-        """ Run FuseSoC for simulation or synthesis. """
+    def run_fusesoc(self, library_name, core_name, path, is_sim, log_path=None):
+        """
+        Run FuseSoC for simulation or synthesis.
+        If log_path is given, the output of the run is saved to it.
+        """
 
         fusesoc_library_command = "fusesoc library add {0} {1}".format(library_name,
                                                                        path)
@@ -192,12 +406,20 @@ class verification:
                 stderr=self.stderr) != 0:
             debug.error("FuseSoC failed to add library!", -1)
 
+        # Icarus picks the waveform format from the environment
+        env = dict(os.environ, IVERILOG_DUMPER=OPTS.dump_format)
+
         # Run the library for simulation or synthesis
-        if call(fusesoc_run_command,
-                cwd=path,
-                shell=True,
-                stdout=self.stdout,
-                stderr=self.stderr) != 0:
+        log_file = open(log_path, "w") if log_path else self.stdout
+        result = call(fusesoc_run_command,
+                      cwd=path,
+                      env=env,
+                      shell=True,
+                      stdout=log_file,
+                      stderr=self.stderr)
+        if log_path:
+            log_file.close()
+        if result != 0:
             debug.error("FuseSoC failed to run!", -1)
 
         # Delete the temporary CONF file.
@@ -269,16 +491,51 @@ class verification:
         debug.info(1, "Synthesis successful.")
 
 
-    def check_sim_result(self, path, file_name):
-        """ Read the log file of the simulation. """
+    def check_sim_result(self, log_path):
+        """ Read the log file of the simulation and return True if it passed. """
 
-        # Result of the simulation is supposed to be at the end of the log file
-        with open("{0}build/{1}/sim-icarus/{2}".format(path,
-                                                       self.core.core_name.replace(":", "_"),
-                                                       file_name)) as f:
+        # Result of the simulation is printed at the end of the simulation.
+        # Simulators may print more lines after it.
+        with open(log_path) as f:
             for line in f:
-                pass
-            if line.rstrip() == self.tb.success_message:
-                debug.info(1, "Simulation successful.")
-            else:
-                debug.error("Simulation failed!", -1)
\ No newline at end of file
+                if line.rstrip() == self.tb.success_message:
+                    return True
+        return False
+
+
+    def report_coverage(self, coverage):
+        """ Report the functional coverage of the simulation. """
+
+        debug.info(1, "Functional coverage: {}".format(coverage.report()))
+        for bin in coverage.uncovered():
+            debug.info(2, "Uncovered bin: {}".format(bin))
+
+
+    def report_stats(self, stats):
+        """ Report the hit and miss statistics of the simulation. """
+
+        debug.info(1, "Miss statistics: {}".format(stats.report()))
+        debug.info(2, "Conflict misses of sets:")
+        for line in stats.heatmap():
+            debug.info(2, line)
+
+
+    def write_replay_config(self):
+        """
+        Write a config file which replays the failed simulation with the same
+        test data and DRAM image.
+        """
+
+        replay_path = OPTS.temp_path + "replay_config.py"
+        with open(replay_path, "w") as file:
+            for option in REPLAY_OPTIONS:
+                value = getattr(OPTS, option)
+                # Policies are written as they are given in config files
+                if option.endswith("_policy") and value is not None:
+                    value = str(value).replace("_", "-")
+                file.write("{0} = {1!r}\n".format(option, value))
+            file.write("simulate = True\n")
+            file.write("keep_temp = True\n")
+            file.write("output_path = {!r}\n".format(OPTS.output_path + "replay/"))
+
+        debug.info(0, "Replay the simulation with: python3 $OPENCACHE_HOME/opencache.py {}".format(replay_path))
\ No newline at end of file